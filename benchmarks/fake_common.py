@@ -0,0 +1,49 @@
+import random
+import asyncio
+import argparse
+
+def base_parser(description: str, port: int) -> argparse.ArgumentParser:
+    """
+    Command line options shared by the fake servers.
+    """
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=port)
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="Mean added latency per request")
+    parser.add_argument("--jitter-ms", type=float, default=10.0, help="Uniform jitter around the latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests answered with 500")
+    parser.add_argument("--payload-kb", type=float, default=2.0, help="Size of the generated text payloads")
+    return parser
+
+class FaultInjector:
+    """
+    Adds latency and random failures to the fake endpoints.
+    """
+
+    def __init__(self, latency_ms: float, jitter_ms: float, error_rate: float):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+
+    async def delay(self):
+        latency = max(0.0, self.latency_ms + random.uniform(-self.jitter_ms, self.jitter_ms))
+        await asyncio.sleep(latency / 1000)
+
+    def should_fail(self) -> bool:
+        return random.random() < self.error_rate
+
+def filler_text(size_kb: float, seed: str = None) -> str:
+    """
+    Random words of about size_kb. Texts with different seeds share few words,
+    so the backend does not treat them as near duplicates.
+    """
+    rng = random.Random(seed)
+    stems = ("implement", "validate", "endpoint", "database", "migration", "login", "report", "cache")
+    words = [f"{rng.choice(stems)}{rng.randrange(100000)}" for _ in range(32)] if seed is not None else stems
+    text = []
+    length = 0
+    while length < size_kb * 1024:
+        word = rng.choice(words)
+        text.append(word)
+        length += len(word) + 1
+    return " ".join(text)
@@ -0,0 +1,88 @@
+"""
+Local stand-in for the Jira REST API endpoints used by the backend.
+
+    python benchmarks/fake_jira.py --port 9001 --latency-ms 80 --error-rate 0.01
+"""
+import functools
+import itertools
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+from fake_common import base_parser, FaultInjector, filler_text
+
+def create_app(faults: FaultInjector, payload_kb: float, projects: int = 50) -> FastAPI:
+    app = FastAPI(title="Fake Jira")
+    # One description per issue, identical texts would all be served as similarity reuses
+    description = functools.lru_cache(maxsize=4096)(lambda key: filler_text(payload_kb, seed=key))
+    issue_ids = itertools.count(100000)
+
+    @app.middleware("http")
+    async def inject_faults(request: Request, call_next):
+        await faults.delay()
+        if faults.should_fail():
+            return JSONResponse({"errorMessages": ["Injected failure"]}, status_code=500)
+        return await call_next(request)
+
+    @app.get("/rest/api/2/myself")
+    async def myself():
+        return {"accountId": "bench", "displayName": "Benchmark User"}
+
+    @app.get("/rest/api/2/project")
+    async def project_list():
+        return [{"id": str(idx), "key": f"P{idx}", "name": f"Project {idx}"} for idx in range(projects)]
+
+    def issue(key):
+        return {"key": key, "fields": {"summary": f"Summary of {key}. ", "description": description(key)}}
+
+    @app.get("/rest/api/2/issue/{story_id}")
+    async def get_issue(story_id: str):
+        return issue(story_id)
+
+    @app.get("/rest/api/2/issue/{story_id}/comment")
+    async def get_comments(story_id: str):
+        return {"comments": [{"body": "Remember the audit log."}]}
+
+    @app.get("/rest/api/2/issue/createmeta/{project_key}/issuetypes")
+    async def createmeta_issue_types(project_key: str):
+        return {"issueTypes": [{"id": "10001", "name": "Story", "subtask": False},
+                               {"id": "10003", "name": "Sub-task", "subtask": True}]}
+
+    @app.get("/rest/api/2/issue/createmeta/{project_key}/issuetypes/{issue_type_id}")
+    async def createmeta_fields(project_key: str, issue_type_id: str):
+        return {"fields": [{"fieldId": field_id, "required": required, "hasDefaultValue": False}
+                           for field_id, required in (("summary", True), ("issuetype", True),
+                                                      ("parent", True), ("project", True),
+                                                      ("timetracking", False))]}
+
+    @app.post("/rest/api/2/issue/", status_code=201)
+    @app.post("/rest/api/2/issue", status_code=201)
+    async def create_issue(request: Request):
+        await request.json()
+        issue_id = next(issue_ids)
+        return {"id": str(issue_id), "key": f"SUB-{issue_id}"}
+
+    @app.post("/rest/api/2/issue/bulk", status_code=201)
+    async def bulk_create(request: Request):
+        body = await request.json()
+        issues = []
+        for _ in body.get("issueUpdates", []):
+            issue_id = next(issue_ids)
+            issues.append({"id": str(issue_id), "key": f"SUB-{issue_id}"})
+        return {"issues": issues, "errors": []}
+
+    @app.get("/rest/api/2/search")
+    async def search(jql: str = "", startAt: int = 0, maxResults: int = 50):
+        total = 60
+        page_size = min(maxResults, 50)
+        keys = [f"BENCH-{idx}" for idx in range(startAt, min(startAt + page_size, total))]
+        return {"startAt": startAt, "maxResults": page_size, "total": total,
+                "issues": [issue(key) for key in keys]}
+
+    return app
+
+if __name__ == "__main__":
+    args = base_parser("Fake Jira server", 9001).parse_args()
+    faults = FaultInjector(args.latency_ms, args.jitter_ms, args.error_rate)
+    uvicorn.run(create_app(faults, args.payload_kb), host=args.host, port=args.port, log_level="warning")
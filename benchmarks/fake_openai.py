@@ -0,0 +1,91 @@
+"""
+Local stand-in for the OpenAI chat completions API, with streaming support.
+
+    python benchmarks/fake_openai.py --port 9002 --latency-ms 1500
+"""
+import re
+import json
+import time
+import random
+import asyncio
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from fake_common import base_parser, FaultInjector, filler_text
+
+# Packed prompts put each story under a "Story ID:" line and ask for an object keyed by ID
+PACKED_STORY_ID = re.compile(r"^Story ID: (\S+)$", re.MULTILINE)
+
+def estimate_list(subtasks: int, payload_kb: float = 0.0) -> list:
+    # The payload is spread over the subtask descriptions
+    padding = payload_kb / subtasks if subtasks else 0.0
+    return [
+        {"subtask": f"Benchmark subtask {idx}" + (f": {filler_text(padding)}" if padding else ""),
+         "estimation": random.randint(1, 5)}
+        for idx in range(subtasks)
+    ]
+
+def estimate_text(subtasks: int, payload_kb: float = 0.0) -> str:
+    return json.dumps(estimate_list(subtasks, payload_kb), indent=4)
+
+def create_app(faults: FaultInjector, subtasks: int = 6, payload_kb: float = 0.0) -> FastAPI:
+    app = FastAPI(title="Fake OpenAI")
+
+    @app.get("/v1/models")
+    async def models():
+        return {"object": "list", "data": [{"id": "gpt-3.5-turbo", "object": "model"}]}
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        if faults.should_fail():
+            await faults.delay()
+            return JSONResponse({"error": {"message": "Injected failure", "type": "server_error"}},
+                                status_code=500)
+
+        prompt = "\n".join(str(m.get("content", "")) for m in body.get("messages", []))
+        story_ids = PACKED_STORY_ID.findall(prompt)
+        if story_ids:
+            text = json.dumps({story_id: estimate_list(subtasks, payload_kb) for story_id in story_ids}, indent=4)
+        elif body.get("response_format", {}).get("type") in ("json_object", "json_schema"):
+            text = json.dumps({"subtasks": estimate_list(subtasks, payload_kb)})
+        else:
+            text = estimate_text(subtasks, payload_kb)
+
+        prompt_tokens = len(prompt) // 4
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": len(text) // 4,
+                 "total_tokens": prompt_tokens + len(text) // 4}
+        base = {"id": "chatcmpl-bench", "created": int(time.time()), "model": body.get("model")}
+
+        if not body.get("stream"):
+            await faults.delay()
+            return {**base, "object": "chat.completion", "usage": usage,
+                    "choices": [{"index": 0, "finish_reason": "stop",
+                                 "message": {"role": "assistant", "content": text}}]}
+
+        async def events():
+            # Spread the latency over the chunks, like a model generating tokens
+            pieces = [text[i:i + 16] for i in range(0, len(text), 16)]
+            for piece in pieces:
+                await asyncio.sleep(faults.latency_ms / 1000 / len(pieces))
+                chunk = {**base, "object": "chat.completion.chunk",
+                         "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}]}
+                yield f"data: {json.dumps(chunk)}\n\n"
+            if body.get("stream_options", {}).get("include_usage"):
+                yield f"data: {json.dumps({**base, 'object': 'chat.completion.chunk', 'choices': [], 'usage': usage})}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return app
+
+if __name__ == "__main__":
+    parser = base_parser("Fake OpenAI server", 9002)
+    parser.add_argument("--subtasks", type=int, default=6, help="Subtasks per generated estimate")
+    # Answers stay short unless a payload size is asked for
+    parser.set_defaults(payload_kb=0.0)
+    args = parser.parse_args()
+    faults = FaultInjector(args.latency_ms, args.jitter_ms, args.error_rate)
+    uvicorn.run(create_app(faults, args.subtasks, args.payload_kb), host=args.host, port=args.port, log_level="warning")
@@ -0,0 +1,110 @@
+"""
+Load driver for the backend endpoints, reports latency percentiles and throughput.
+
+    python benchmarks/load_driver.py --base-url http://127.0.0.1:8000 \\
+        --jira-url http://127.0.0.1:9001 --concurrency 1,8,32 --requests 200
+"""
+import time
+import asyncio
+import argparse
+import itertools
+
+import httpx
+
+SUCCESS_STATUSES = (200, 201, 202, 207)
+
+def percentile(values, share):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(share * (len(ordered) - 1))))
+    return ordered[index]
+
+def build_request(endpoint, counter, args):
+    """
+    Returns (method, path, params, json body) for one request to an endpoint.
+    """
+    story_id = f"BENCH-{next(counter) % args.stories}"
+    params = {"refresh": "true"} if args.refresh else {}
+
+    if endpoint == "story_id":
+        return "POST", "/story_id", params, {"story_id": story_id}
+    if endpoint == "create_subtasks":
+        subtasks = [{"subtask": f"Benchmark subtask {idx}", "estimation": 1} for idx in range(args.subtasks)]
+        return "POST", "/create_subtasks", {}, {"status": 200, "story_id": story_id, "subtasks": subtasks}
+    if endpoint == "jira_authenticate":
+        return "POST", "/jira_authenticate", {}, None
+    raise ValueError(f"Unknown endpoint {endpoint}")
+
+async def run_level(client, endpoint, concurrency, args, headers, counter):
+    remaining = itertools.count()
+    latencies = []
+    errors = 0
+
+    async def worker():
+        nonlocal errors
+        while next(remaining) < args.requests:
+            method, path, params, body = build_request(endpoint, counter, args)
+            start = time.perf_counter()
+            try:
+                response = await client.request(method, path, params=params, json=body, headers=headers)
+                ok = response.status_code < 400 and response.json().get("status") in SUCCESS_STATUSES
+            except (httpx.HTTPError, ValueError):
+                ok = False
+            latencies.append(time.perf_counter() - start)
+            errors += 0 if ok else 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    return {
+        "endpoint": endpoint,
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+    }
+
+def print_table(results):
+    header = f"{'endpoint':<20}{'conc':>6}{'reqs':>7}{'errors':>8}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        print(f"{r['endpoint']:<20}{r['concurrency']:>6}{r['requests']:>7}{r['errors']:>8}"
+              f"{r['rps']:>10.1f}{r['p50_ms']:>10.1f}{r['p95_ms']:>10.1f}{r['p99_ms']:>10.1f}")
+
+async def run(args):
+    headers = {"username": "bench", "api-token": "bench-token", "jira-url": args.jira_url}
+    limits = httpx.Limits(max_connections=max(args.concurrency), max_keepalive_connections=max(args.concurrency))
+    results = []
+    # Shared across levels, so a level does not replay the story ids cached by the previous one
+    counter = itertools.count()
+
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=args.timeout) as client:
+        for endpoint in args.endpoints:
+            for concurrency in args.concurrency:
+                results.append(await run_level(client, endpoint, concurrency, args, headers, counter))
+
+    print_table(results)
+    return results
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Backend load driver")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--jira-url", default="http://127.0.0.1:9001")
+    parser.add_argument("--endpoints", type=lambda v: v.split(","),
+                        default=["jira_authenticate", "story_id", "create_subtasks"])
+    parser.add_argument("--concurrency", type=lambda v: [int(c) for c in v.split(",")], default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=100, help="Requests per endpoint and concurrency level")
+    parser.add_argument("--stories", type=int, default=1000, help="Number of distinct story ids to cycle through")
+    parser.add_argument("--subtasks", type=int, default=10, help="Subtasks per /create_subtasks request")
+    parser.add_argument("--refresh", action="store_true", help="Bypass the estimate cache")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    asyncio.run(run(parse_args()))
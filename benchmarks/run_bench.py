@@ -0,0 +1,83 @@
+"""
+Starts the fake Jira and OpenAI servers and the backend, then runs the load driver.
+
+    python benchmarks/run_bench.py --jira-latency-ms 80 --llm-latency-ms 1500 --concurrency 1,8,32
+
+Arguments not listed below are passed to the load driver.
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import subprocess
+
+import httpx
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+
+def wait_until_up(url, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(url, timeout=1.0)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up within {timeout}s")
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline backend benchmark")
+    parser.add_argument("--jira-port", type=int, default=9001)
+    parser.add_argument("--llm-port", type=int, default=9002)
+    parser.add_argument("--app-port", type=int, default=8000)
+    parser.add_argument("--jira-latency-ms", type=float, default=50.0)
+    parser.add_argument("--jira-error-rate", type=float, default=0.0)
+    parser.add_argument("--jira-payload-kb", type=float, default=2.0)
+    parser.add_argument("--llm-payload-kb", type=float, default=0.0)
+    parser.add_argument("--llm-latency-ms", type=float, default=1000.0)
+    parser.add_argument("--llm-error-rate", type=float, default=0.0)
+    parser.add_argument("--workers", type=int, default=1, help="Backend worker processes")
+    args, driver_args = parser.parse_known_args()
+
+    jira_url = f"http://127.0.0.1:{args.jira_port}"
+    llm_url = f"http://127.0.0.1:{args.llm_port}"
+    app_url = f"http://127.0.0.1:{args.app_port}"
+
+    env = dict(os.environ,
+               OPENAI_API_KEY="bench",
+               OPENAI_BASE_URL=f"{llm_url}/v1",
+               DATA_DIR=tempfile.mkdtemp(prefix="jira_bench_"),
+               PORT=str(args.app_port),
+               WEB_CONCURRENCY=str(args.workers))
+
+    processes = [
+        subprocess.Popen([sys.executable, "fake_jira.py", "--port", str(args.jira_port),
+                          "--latency-ms", str(args.jira_latency_ms), "--error-rate", str(args.jira_error_rate),
+                          "--payload-kb", str(args.jira_payload_kb)], cwd=BENCH_DIR),
+        subprocess.Popen([sys.executable, "fake_openai.py", "--port", str(args.llm_port),
+                          "--latency-ms", str(args.llm_latency_ms), "--error-rate", str(args.llm_error_rate),
+                          "--payload-kb", str(args.llm_payload_kb)],
+                         cwd=BENCH_DIR),
+        subprocess.Popen([sys.executable, "-m", "src.server"], cwd=ROOT_DIR, env=env,
+                         stdout=subprocess.DEVNULL),
+    ]
+
+    try:
+        wait_until_up(f"{jira_url}/rest/api/2/myself")
+        wait_until_up(f"{llm_url}/v1/models")
+        wait_until_up(f"{app_url}/health")
+
+        sys.path.insert(0, BENCH_DIR)
+        import asyncio
+        from load_driver import run, parse_args
+        asyncio.run(run(parse_args(["--base-url", app_url, "--jira-url", jira_url] + driver_args)))
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait()
+
+if __name__ == "__main__":
+    main()
@@ -1,54 +1,82 @@
+import os
+import re
+import asyncio
+
 import gradio as gr
-import requests
+import httpx
+
+# URL of the FastAPI backend
+BACKEND_URL = os.getenv("BACKEND_URL", "http://127.0.0.1:8000").rstrip("/")
+# Gradio events processed at the same time, each waits on the backend most of the time
+GRADIO_CONCURRENCY = int(os.getenv("GRADIO_CONCURRENCY", "16"))
+# Stories of the batch tab estimated at the same time
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "4"))
+BACKEND_TIMEOUT = float(os.getenv("BACKEND_TIMEOUT", "120"))
+
+# One pooled keep-alive client for every call to the backend
+_client = None
+
+def get_client() -> httpx.AsyncClient:
+    """
+    Returns the shared async HTTP client, created on first use.
+    """
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            base_url=BACKEND_URL,
+            timeout=httpx.Timeout(BACKEND_TIMEOUT, connect=5.0),
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+        )
+    return _client
 
-# Base URL for your FastAPI application
-BASE_URL = "http://127.0.0.1:8000"  # Replace with the actual URL where your FastAPI app is running
+def jira_headers(username, api_token, jira_url):
+    # FastAPI reads the api_token / jira_url header parameters from hyphenated headers
+    return {
+        "username": username,
+        "api-token": api_token,
+        "jira-url": jira_url
+    }
 
 # Health Check Function
-def check_health():
+async def check_health():
     try:
-        response = requests.get(f"{BASE_URL}/health")
+        response = await get_client().get("/health")
         return response.json()
     except Exception as e:
         return {"status": 500, "message": str(e)}
 
 # Get Prompt Template Function
-def get_prompt_template():
+async def get_prompt_template():
     try:
-        response = requests.get(f"{BASE_URL}/prompt_template")
+        response = await get_client().get("/prompt_template")
         return response.json()
     except Exception as e:
         return {"status": 500, "message": str(e)}
 
 # Jira Authentication Function
-def jira_authenticate(username, api_token, jira_url):
-    headers = {
-        "username": username,
-        "api-token": api_token,
-        "jira-url": jira_url
-    }
+async def jira_authenticate(username, api_token, jira_url):
     try:
-        response = requests.post(f"{BASE_URL}/jira_authenticate", headers=headers)
+        response = await get_client().post("/jira_authenticate", headers=jira_headers(username, api_token, jira_url))
         return response.json()
     except Exception as e:
         return {"status": 500, "message": str(e)}
 
-def estimate_story_ui(story_id, username, api_token, jira_url, prompt_template=None):
+async def fetch_estimate(story_id, username, api_token, jira_url, prompt_template=None):
     """
-    Fetch the story estimate and display subtasks in an editable table.
+    Calls the backend for one story estimate.
     """
-    headers = {
-        "username": username,
-        "api-token": api_token,
-        "jira-url": jira_url
-    }
-    data = {"story_id": story_id}
     params = {"prompt_template": prompt_template} if prompt_template else {}
+    response = await get_client().post("/story_id", headers=jira_headers(username, api_token, jira_url),
+                                       json={"story_id": story_id}, params=params)
+    return response.json()
 
+async def estimate_story_ui(story_id, username, api_token, jira_url, prompt_template=None):
+    """
+    Fetch the story estimate and display subtasks in an editable table.
+    """
     try:
         # Call FastAPI to get story estimate
-        response = requests.post(f"{BASE_URL}/story_id", headers=headers, json=data, params=params)
-        result = response.json()
+        result = await fetch_estimate(story_id, username, api_token, jira_url, prompt_template)
 
         if result.get("status") == 200:
             # Extract subtasks and format them for display
@@ -78,7 +106,7 @@ def estimate_story_ui(story_id, username, api_token, jira_url, prompt_template=N
             None  # No state to pass
         )
 
-def create_subtasks_ui(updated_table, original_response, username, api_token, jira_url):
+async def create_subtasks_ui(updated_table, original_response, username, api_token, jira_url):
     """
     Update subtasks in the original JSON and send them to FastAPI's /create_subtasks endpoint.
     """
@@ -102,18 +130,11 @@ def create_subtasks_ui(updated_table, original_response, username, api_token, ji
         "subtasks": original_response.get("subtasks")
     }
 
-    headers = {
-        "username": username,
-        "api-token": api_token,
-        "jira-url": jira_url
-    }
-
     try:
         # Call FastAPI to create subtasks
-        response = requests.post(f"{BASE_URL}/create_subtasks", headers=headers, json=payload)
-        result = response.json()
+        result = await create_subtasks_for_story(payload, username, api_token, jira_url)
 
-        if result.get("status") == 200:
+        if result.get("status") in (200, 207):
             return f"Subtasks status update : {result.get('message', 'Success')}"
         else:
             return f"Error: {result.get('message', 'Unknown error')}"
@@ -122,18 +143,81 @@ def create_subtasks_ui(updated_table, original_response, username, api_token, ji
         return f"Error: {str(e)}"
 
 # Create Subtasks Function
-def create_subtasks_for_story(story_estimate, username, api_token, jira_url):
-    headers = {
-        "username": username,
-        "api_token": api_token,
-        "jira_url": jira_url
-    }
+async def create_subtasks_for_story(story_estimate, username, api_token, jira_url):
     try:
-        response = requests.post(f"{BASE_URL}/create_subtasks", headers=headers, json=story_estimate)
+        response = await get_client().post("/create_subtasks", headers=jira_headers(username, api_token, jira_url),
+                                           json=story_estimate)
         return response.json()
     except Exception as e:
         return {"status": 500, "message": str(e)}
 
+BATCH_HEADERS = ["Story ID", "Status", "Subtasks", "Total Estimation", "Message"]
+
+def parse_story_ids(text):
+    """
+    Splits story IDs separated by commas, spaces or new lines, dropping duplicates.
+    """
+    return list(dict.fromkeys(part.strip().upper() for part in re.split(r"[\s,;]+", text or "") if part.strip()))
+
+def batch_row(story_id, result):
+    if result.get("status") != 200:
+        return [story_id, "failed", 0, 0, result.get("message", "Unknown error")]
+    subtasks = result.get("subtasks") or []
+    total = sum(subtask.get("estimation") or 0 for subtask in subtasks)
+    return [story_id, "done", len(subtasks), total, result.get("message") or ""]
+
+async def estimate_batch_ui(story_ids_text, username, api_token, jira_url, prompt_template=None):
+    """
+    Estimate many stories at once, filling the table as each estimate arrives.
+    """
+    story_ids = parse_story_ids(story_ids_text)
+    if not story_ids:
+        yield gr.update(value=[]), "Error: Enter at least one story ID.", {}
+        return
+
+    rows = {story_id: [story_id, "pending", "", "", ""] for story_id in story_ids}
+    results = {}
+    yield gr.update(value=list(rows.values())), f"Estimating {len(story_ids)} stories...", results
+
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+    async def estimate(story_id):
+        async with semaphore:
+            try:
+                return story_id, await fetch_estimate(story_id, username, api_token, jira_url, prompt_template)
+            except Exception as e:
+                return story_id, {"status": 500, "message": str(e)}
+
+    for finished in asyncio.as_completed([estimate(story_id) for story_id in story_ids]):
+        story_id, result = await finished
+        results[story_id] = result
+        rows[story_id] = batch_row(story_id, result)
+        yield (gr.update(value=list(rows.values())),
+               f"Estimated {len(results)} of {len(story_ids)} stories", results)
+
+    failed = sum(1 for result in results.values() if result.get("status") != 200)
+    message = f"Estimated {len(story_ids) - failed} of {len(story_ids)} stories"
+    yield gr.update(value=list(rows.values())), message + (f", {failed} failed" if failed else ""), results
+
+async def create_batch_subtasks_ui(results, username, api_token, jira_url):
+    """
+    Creates the subtasks of every successfully estimated story of the batch.
+    """
+    estimates = [result for result in (results or {}).values() if result.get("status") == 200]
+    if not estimates:
+        return "Error: No estimated stories to create subtasks for."
+
+    responses = await asyncio.gather(*(
+        create_subtasks_for_story({key: estimate.get(key) for key in ("status", "story_id", "description", "subtasks")},
+                                  username, api_token, jira_url)
+        for estimate in estimates
+    ))
+    failed = [estimate["story_id"] for estimate, response in zip(estimates, responses)
+              if response.get("status") not in (200, 207)]
+    if failed:
+        return f"Subtasks created for {len(estimates) - len(failed)} stories, failed for {', '.join(failed)}"
+    return f"Subtasks created for {len(estimates)} stories"
+
 def update_row_selection(table_data):
     """
     Update the row selection options based on the current table data.
@@ -247,6 +331,42 @@ def main():
                 outputs=output_message
             )
 
+        # Batch estimation, rows are filled in as the estimates arrive
+        with gr.Tab("Batch Estimate"):
+            batch_story_ids = gr.Textbox(label="Story IDs", lines=4,
+                                         placeholder="Enter Jira Story IDs separated by commas or new lines")
+            batch_username = gr.Textbox(label="Username", placeholder="Enter your Jira username")
+            batch_api_token = gr.Textbox(label="API Token", placeholder="Enter your Jira API token")
+            batch_jira_url = gr.Textbox(label="Jira URL", placeholder="Enter your Jira instance URL")
+            batch_prompt_template = gr.Textbox(label="Prompt Template (Optional)",
+                                               placeholder="Enter a prompt template if needed")
+
+            batch_button = gr.Button("Estimate Stories")
+            batch_save_button = gr.Button("Create Subtasks in JIRA")
+
+            batch_table = gr.Dataframe(
+                headers=BATCH_HEADERS,
+                datatype=["str", "str", "number", "number", "str"],
+                interactive=False,
+                label="Story Estimates"
+            )
+            batch_message = gr.Textbox(label="Message", interactive=False)
+            batch_state = gr.State()
+
+            batch_button.click(
+                estimate_batch_ui,
+                inputs=[batch_story_ids, batch_username, batch_api_token, batch_jira_url, batch_prompt_template],
+                outputs=[batch_table, batch_message, batch_state]
+            )
+
+            batch_save_button.click(
+                create_batch_subtasks_ui,
+                inputs=[batch_state, batch_username, batch_api_token, batch_jira_url],
+                outputs=batch_message
+            )
+
+    # Handlers are async, so slow estimates of one user do not hold up the others
+    demo.queue(default_concurrency_limit=GRADIO_CONCURRENCY)
     return demo
 
 # Run the Gradio app
@@ -4,23 +4,112 @@ load_dotenv()
 import yaml
 from yaml.loader import SafeLoader
 
-from typing import Annotated
+import re
+import json
+import time
+import uuid
+import asyncio
+from typing import Annotated, Optional
+from contextlib import asynccontextmanager
 
 from fastapi import FastAPI, Request, Header, Query
+from fastapi.routing import APIRoute
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse, PlainTextResponse
 
-from src.data_models import Story, StoryDesc, StoryEstimate
+from src.data_models import Story, StoryDesc, StoryEstimate, BatchEstimateRequest, BatchEstimate, EstimateJob
 
 from src.constants import Constants
 
-from src.logger import setup_logger
+from src.logger import setup_logger, request_id_var
 
-from src.jira_handler import JiraHandler
+from src.jira_handler import JiraHandler, story_info_flight, story_estimate_flight, llm_pool
+
+from src.http_client import get_client, close_clients
+
+from src.rate_limiter import limiter_stats
+
+from src.metrics import render_metrics, REQUESTS, REQUEST_ERRORS, REQUEST_LATENCY
+
+from src.estimate_cache import estimate_cache
+
+from src.estimate_parser import parse_stats
+
+from src.prompt_registry import prompt_registry, PromptTemplateError
+
+from src.job_queue import job_queue, QueueFullError
+
+from src.auto_estimator import (auto_estimator, verify_webhook, parse_issue_event, allowed_jira_url,
+                                WebhookBacklogFullError)
+
+from src.similarity_index import similarity_index
+
+from src.usage_ledger import usage_ledger
+
+from src.compaction import count_tokens
+
+from src.process_stats import process_stats
 
 LOGGER = setup_logger(__name__)
 
-with open(Constants.PROMPT_PATH.value, 'r') as f:
-    prompt_template_default = f.read()
+async def run_estimate_job(request: dict) -> dict:
+    """
+    Runs one queued estimation job
+    """
+    jira_handler = JiraHandler(request["username"], request["api_token"], request["jira_url"])
+
+    if not await jira_handler.check_health():
+        return {"status": 400, "story_id": request["story_id"], "message": "Failed to connect to JIRA"}
+
+    return await jira_handler.get_story_estimate(request["story_id"], request.get("prompt_template"),
+                                                 request.get("refresh", False), request.get("enrich", False),
+                                                 request.get("template_name"))
+
+async def run_auto_estimate(jira_url: str, story_id: str, fields: dict) -> str:
+    """
+    Estimates a story reported by a Jira webhook, no credentials are needed
+    since the payload carries the story text
+    """
+    return await JiraHandler("", "", jira_url).auto_estimate(story_id, fields)
+
+async def warmup():
+    """
+    Creates the LLM clients, loads the prompt templates, tokenizer and
+    similarity index and opens the Jira connections of WARMUP_JIRA_URLS, so
+    the first requests of a worker do not pay for it
+    """
+    await llm_pool.start()
+    await asyncio.to_thread(prompt_registry.names)
+    await asyncio.to_thread(count_tokens, "warmup")
+    await asyncio.to_thread(similarity_index.stats)
+
+    for jira_url in filter(None, (url.strip() for url in Constants.WARMUP_JIRA_URLS.split(","))):
+        try:
+            await get_client(jira_url).get("/status")
+        except Exception as e:
+            LOGGER.warning("Warmup of the Jira connection to %s failed: %s", jira_url, e)
+
+@asynccontextmanager
+async def lifespan(fast_app: FastAPI):
+    """
+    Application lifespan, runs the estimation job workers and releases the
+    pooled Jira connections on shutdown
+    """
+    warmup_seconds = None
+    if Constants.WARMUP_ENABLED:
+        start = time.perf_counter()
+        await warmup()
+        warmup_seconds = time.perf_counter() - start
+
+    await usage_ledger.start()
+    await job_queue.start(run_estimate_job)
+    auto_estimator.start(run_auto_estimate)
+    process_stats.mark_ready(warmup_seconds)
+    yield
+    await auto_estimator.stop()
+    await job_queue.stop(drain_timeout=Constants.GRACEFUL_TIMEOUT)
+    await usage_ledger.stop()
+    await close_clients()
 
 # Installed libraries
 def get_app() -> FastAPI:
@@ -30,12 +119,49 @@ def get_app() -> FastAPI:
     try:
         fast_app = FastAPI(
                 title="Jira Copilot Backend",
-                description="A simple FastAPI backend for Mr. Agile application.")
+                description="A simple FastAPI backend for Mr. Agile application.",
+                lifespan=lifespan)
         return fast_app
     except Exception as e:
         LOGGER.error('exception occured in get_app() - {0}'.format(e))
 
+# Responses serialise "status" first, which spares decoding the whole body
+BODY_STATUS_PREFIX = re.compile(rb'\{"status":(\d{3})[,}]')
+
+class BodyStatusRoute(APIRoute):
+    """
+    Route that records the "status" of a JSON response body, the endpoints report failures there with HTTP 200
+    """
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def status_recording_handler(request: Request):
+            response = await handler(request)
+            if response.media_type == "application/json" and hasattr(response, "body"):
+                status = body_status(response.body)
+                if status is not None:
+                    request.scope["body_status"] = status
+            return response
+
+        return status_recording_handler
+
+def body_status(body: bytes) -> Optional[int]:
+    """
+    Returns the integer "status" of a JSON object body, None when it has none
+    """
+    match = BODY_STATUS_PREFIX.match(body)
+    if match:
+        return int(match.group(1))
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        return None
+    status = payload.get("status") if isinstance(payload, dict) else None
+    return status if isinstance(status, int) and not isinstance(status, bool) else None
+
 app = get_app()
+app.router.route_class = BodyStatusRoute
 
 app.add_middleware(
     CORSMiddleware,
@@ -45,6 +171,42 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    """
+    Counts requests and errors and times them per endpoint, labelled with the body status where there is one
+    """
+    start = time.perf_counter()
+    try:
+        response = await call_next(request)
+    except Exception:
+        route = request.scope.get("route")
+        REQUEST_ERRORS.inc(method=request.method, endpoint=route.path if route else "unmatched")
+        raise
+
+    route = request.scope.get("route")
+    endpoint = route.path if route else "unmatched"
+    status = request.scope.get("body_status", response.status_code)
+    REQUEST_LATENCY.observe(time.perf_counter() - start, method=request.method, endpoint=endpoint)
+    REQUESTS.inc(method=request.method, endpoint=endpoint, status=status)
+    if status >= 400:
+        REQUEST_ERRORS.inc(method=request.method, endpoint=endpoint)
+    return response
+
+@app.middleware("http")
+async def assign_request_id(request: Request, call_next):
+    """
+    Tags the log records of a request with its X-Request-ID, generating one when absent
+    """
+    request_id = request.headers.get("x-request-id") or uuid.uuid4().hex
+    token = request_id_var.set(request_id)
+    try:
+        response = await call_next(request)
+    finally:
+        request_id_var.reset(token)
+    response.headers["X-Request-ID"] = request_id
+    return response
+
 @app.get("/health", tags=["health"])
 async def health_check(request: Request):
     """
@@ -52,13 +214,75 @@ async def health_check(request: Request):
     """
     return {"status": 200}
 
+@app.get("/stats", tags=["health"])
+async def get_stats(request: Request):
+    """
+    Cache and performance counters
+    """
+    # The SQLite counts can wait on the write lock of another worker
+    estimate_cache_stats, auto_estimate_stats = await asyncio.gather(
+        asyncio.to_thread(estimate_cache.stats), asyncio.to_thread(auto_estimator.stats))
+    return {"status": 200,
+            "estimate_cache": estimate_cache_stats,
+            "estimate_parser": parse_stats.stats(),
+            "jobs": job_queue.stats(),
+            "coalescing": {"story_info": story_info_flight.stats(),
+                           "story_estimate": story_estimate_flight.stats()},
+            "jira_rate_limits": limiter_stats(),
+            "llm_providers": llm_pool.stats(),
+            "auto_estimates": auto_estimate_stats,
+            "similarity_index": similarity_index.stats(),
+            "usage_ledger": usage_ledger.stats(),
+            "process": process_stats.stats()}
+
+@app.get("/metrics", tags=["health"], response_class=PlainTextResponse)
+async def get_metrics():
+    """
+    Prometheus metrics endpoint
+    """
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+@app.get("/usage", tags=["health"])
+async def get_usage(username: Annotated[str, Header()],
+                    api_token: Annotated[str, Header()], jira_url: Annotated[str, Header()]):
+    """
+    Today's LLM token and cost usage of the caller and the configured budgets
+    """
+    jira_handler = JiraHandler(username, api_token, jira_url)
+
+    if not await jira_handler.check_health():
+        return {"status": 400,
+                "message": "Failed to connect to JIRA"}
+
+    return {"status": 200,
+            "usage": usage_ledger.tenant_usage(jira_handler.tenant())}
+
 @app.get("/prompt_template", tags=["Estimation"])
 async def get_prompt_template(request: Request):
     """
-    Health check endpoint
+    Default prompt template endpoint
+    """
+    template = prompt_registry.get()
+    return {"status": 200,
+            "name": template.name,
+            "prompt_template": template.text,
+            "templates": prompt_registry.names()}
+
+@app.get("/prompt_template/{name}", tags=["Estimation"])
+async def get_named_prompt_template(name: str):
     """
+    Named prompt template endpoint, the name can be passed as template_name to the estimate endpoints
+    """
+    try:
+        template = prompt_registry.get(name)
+    except PromptTemplateError as e:
+        return {"status": 404,
+                "message": str(e)}
+
     return {"status": 200,
-            "prompt_template": prompt_template_default}
+            "name": template.name,
+            "prompt_template": template.text,
+            "fixed_tokens": template.fixed_tokens}
 
 @app.post("/jira_authenticate", tags=["Authentication"],
           summary="Jira authentication endpoint")
@@ -70,7 +294,7 @@ async def jira_authenticate(username: Annotated[str, Header()],
 
     jira_handler = JiraHandler(username, api_token, jira_url)
     
-    if jira_handler.check_health():
+    if await jira_handler.check_health():
         response = {
             "status": 200,
             "message": "Successfully connected to JIRA"
@@ -88,41 +312,187 @@ async def jira_authenticate(username: Annotated[str, Header()],
           summary="Estimate story subtasks with story id")
 async def estimate_story(story_info: Story, username: Annotated[str, Header()],
                          api_token: Annotated[str, Header()], jira_url: Annotated[str, Header()],
-                         prompt_template: Annotated[str | None, Query()] = None):
+                         prompt_template: Annotated[str | None, Query()] = None,
+                         refresh: Annotated[bool, Query()] = False,
+                         enrich: Annotated[bool, Query()] = False,
+                         template_name: Annotated[str | None, Query()] = None):
     """
     Story estimation endpoint
     """
 
     jira_handler = JiraHandler(username, api_token, jira_url)
     
-    if not jira_handler.check_health():
+    if not await jira_handler.check_health():
         response = {
             "status": 400,
             "message": "Failed to connect to JIRA"
         }
         return response
     
-    result = jira_handler.get_story_estimate(story_info.story_id, prompt_template)
+    result = await jira_handler.get_story_estimate(story_info.story_id, prompt_template, refresh, enrich,
+                                                   template_name)
 
     return StoryEstimate(**result)
 
+@app.post("/story_id/stream", tags=["Estimation"],
+          summary="Stream story subtasks as the LLM generates them")
+async def estimate_story_stream(story_info: Story, username: Annotated[str, Header()],
+                                api_token: Annotated[str, Header()], jira_url: Annotated[str, Header()],
+                                prompt_template: Annotated[str | None, Query()] = None,
+                                refresh: Annotated[bool, Query()] = False,
+                                enrich: Annotated[bool, Query()] = False,
+                                template_name: Annotated[str | None, Query()] = None):
+    """
+    Streaming story estimation endpoint, emits one JSON object per line (NDJSON)
+    """
+
+    jira_handler = JiraHandler(username, api_token, jira_url)
+    
+    if not await jira_handler.check_health():
+        response = {
+            "status": 400,
+            "message": "Failed to connect to JIRA"
+        }
+        return response
+
+    async def events():
+        async for event in jira_handler.stream_story_estimate(story_info.story_id, prompt_template,
+                                                                  refresh, enrich, template_name):
+            yield json.dumps(event) + "\n"
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+@app.post("/estimate/batch", tags=["Estimation"],
+          summary="Estimate many stories selected by JQL or story ids")
+async def estimate_batch(batch_info: BatchEstimateRequest, username: Annotated[str, Header()],
+                         api_token: Annotated[str, Header()], jira_url: Annotated[str, Header()],
+                         prompt_template: Annotated[str | None, Query()] = None,
+                         refresh: Annotated[bool, Query()] = False,
+                         template_name: Annotated[str | None, Query()] = None):
+    """
+    Batch story estimation endpoint
+    """
+    if bool(batch_info.jql) == bool(batch_info.story_ids):
+        response = {
+            "status": 400,
+            "message": "Provide either a JQL query or a list of story ids"
+        }
+        return response
+
+    jira_handler = JiraHandler(username, api_token, jira_url)
+
+    if not await jira_handler.check_health():
+        response = {
+            "status": 400,
+            "message": "Failed to connect to JIRA"
+        }
+        return response
+
+    result = await jira_handler.get_batch_estimate(batch_info.jql, batch_info.story_ids,
+                                                   prompt_template, batch_info.concurrency, refresh,
+                                                   template_name, batch_info.pack)
+
+    return BatchEstimate(**result)
+
+@app.post("/webhooks/jira", tags=["Estimation"],
+          summary="Jira issue webhook, re-estimates stories whose summary or description changed")
+async def jira_webhook(request: Request, x_hub_signature: Annotated[str | None, Header()] = None,
+                       secret: Annotated[str | None, Query()] = None):
+    """
+    Receives jira:issue_created and jira:issue_updated events. The estimate
+    runs in the background once the story stops changing, and is served by
+    /story_id afterwards
+    """
+    body = await request.body()
+    if not verify_webhook(body, Constants.WEBHOOK_SECRET, x_hub_signature, secret):
+        LOGGER.warning("Rejected Jira webhook with an invalid signature")
+        return {"status": 401, "message": "Invalid webhook signature"}
+
+    try:
+        event = parse_issue_event(json.loads(body))
+    except (ValueError, AttributeError):
+        return {"status": 400, "message": "Invalid webhook payload"}
+
+    if event is None:
+        return {"status": 200, "message": "Event ignored"}
+
+    jira_url, story_id, fields = event
+    # The URL comes from the payload, only configured Jira instances may spend LLM calls
+    if not allowed_jira_url(jira_url, Constants.WEBHOOK_ALLOWED_JIRA_URLS):
+        LOGGER.warning("Rejected Jira webhook for %s, not in WEBHOOK_ALLOWED_JIRA_URLS", jira_url)
+        return {"status": 403, "message": "Jira URL not allowed"}
+
+    try:
+        auto_estimator.schedule(jira_url, story_id, fields)
+    except WebhookBacklogFullError as e:
+        return {"status": 429, "message": str(e)}
+    return {"status": 202, "story_id": story_id, "message": "Estimate scheduled"}
+
+@app.post("/jobs/estimate", tags=["Estimation"],
+          summary="Queue a story estimation job")
+async def submit_estimate_job(story_info: Story, username: Annotated[str, Header()],
+                              api_token: Annotated[str, Header()], jira_url: Annotated[str, Header()],
+                              prompt_template: Annotated[str | None, Query()] = None,
+                              refresh: Annotated[bool, Query()] = False,
+                              enrich: Annotated[bool, Query()] = False,
+                              template_name: Annotated[str | None, Query()] = None):
+    """
+    Queues a story estimation and returns its job id at once, poll GET /jobs/{job_id} for the result
+    """
+    jira_handler = JiraHandler(username, api_token, jira_url)
+
+    if not await jira_handler.check_health():
+        return EstimateJob(status=400, message="Failed to connect to JIRA")
+
+    try:
+        job_id = job_queue.submit({
+            "username": username,
+            "jira_url": jira_url,
+            "story_id": story_info.story_id,
+            "prompt_template": prompt_template,
+            "refresh": refresh,
+            "enrich": enrich,
+            "template_name": template_name,
+        }, secret=api_token, auth_hash=jira_handler.credentials_hash())
+    except QueueFullError as e:
+        return EstimateJob(status=429, message=str(e))
+
+    return EstimateJob(status=202, job_id=job_id, state="queued")
+
+@app.get("/jobs/{job_id}", tags=["Estimation"],
+         summary="State and result of an estimation job")
+async def get_estimate_job(job_id: str, username: Annotated[str, Header()], api_token: Annotated[str, Header()],
+                           jira_url: Annotated[str, Header()]):
+    """
+    Estimation job status endpoint, only answered for the credentials the job was submitted with
+    """
+    credentials_hash = JiraHandler(username, api_token, jira_url).credentials_hash()
+    job = await asyncio.to_thread(job_queue.get, job_id, credentials_hash)
+
+    if job is None:
+        return EstimateJob(status=404, job_id=job_id, message="Job not found")
+
+    return EstimateJob(status=200, job_id=job_id, state=job["state"], result=job["result"])
+
 @app.post("/create_subtasks", tags=["Estimation"],
           summary="Creation of subtasks in JIRA for the given story id")
 async def create_subtasks_for_story(story_info: StoryEstimate, username: Annotated[str, Header()],
-                         api_token: Annotated[str, Header()], jira_url: Annotated[str, Header()]):
+                         api_token: Annotated[str, Header()], jira_url: Annotated[str, Header()],
+                         idempotency_key: Annotated[Optional[str], Header()] = None):
     """
-    Story estimation endpoint
+    Creates the subtasks of an estimate that do not exist yet under the story.
+    Requests retried with the same Idempotency-Key header get the stored result.
     """
     jira_handler = JiraHandler(username, api_token, jira_url)
 
-    if not jira_handler.check_health():
+    if not await jira_handler.check_health():
         response = {
             "status": 400,
             "message": "Failed to connect to JIRA"
         }
         return response
 
-    response = jira_handler.create_tasks_from_estimate(story_info.dict())
+    response = await jira_handler.create_tasks_from_estimate(story_info.dict(), idempotency_key)
     
     return response
 
@@ -0,0 +1,202 @@
+import hmac
+import json
+import time
+import asyncio
+import hashlib
+import threading
+from urllib.parse import urlsplit
+
+from src.constants import Constants
+from src.logger import setup_logger, request_id_var
+from src.utilities import connect_sqlite
+
+LOGGER = setup_logger(__name__)
+
+ISSUE_EVENTS = ("jira:issue_created", "jira:issue_updated")
+
+# Fields whose edits change the estimate, other edits are ignored without scheduling anything
+ESTIMATED_FIELDS = ("summary", "description")
+
+def verify_webhook(body: bytes, secret: str, signature: str = None, token: str = None) -> bool:
+    """
+    Checks a webhook request against the configured secret, either through
+    the X-Hub-Signature HMAC Jira sends for webhooks registered with a
+    secret, or a ?secret= token in the webhook URL. Without a configured
+    secret every request is rejected.
+    """
+    if not secret:
+        return False
+    if signature:
+        expected = "sha256=" + hmac.new(secret.encode("utf-8"), body, hashlib.sha256).hexdigest()
+        return hmac.compare_digest(expected, signature)
+    return token is not None and hmac.compare_digest(secret, token)
+
+def allowed_jira_url(jira_url: str, allowlist: str) -> bool:
+    """
+    Checks a Jira URL taken from a webhook payload against the comma
+    separated allowlist, an empty allowlist allows nothing.
+    """
+    allowed = {url.strip().rstrip("/").lower() for url in allowlist.split(",") if url.strip()}
+    return jira_url.strip().rstrip("/").lower() in allowed
+
+class WebhookBacklogFullError(Exception):
+    """
+    Raised when max_pending stories are already waiting for their estimate.
+    """
+
+def parse_issue_event(payload: dict):
+    """
+    Extracts (jira_url, story_id, fields) from a Jira issue webhook payload.
+
+    Returns:
+        tuple | None: None for other events, subtasks and updates that did
+        not touch the summary or the description.
+    """
+    if payload.get("webhookEvent") not in ISSUE_EVENTS:
+        return None
+
+    issue = payload.get("issue") or {}
+    fields = issue.get("fields") or {}
+    if not issue.get("key") or not issue.get("self") or (fields.get("issuetype") or {}).get("subtask"):
+        return None
+
+    changelog = payload.get("changelog")
+    if changelog and not any(item.get("field") in ESTIMATED_FIELDS for item in changelog.get("items", [])):
+        return None
+
+    # The issue self link is the REST URL of the issue, its origin is the Jira URL
+    url = urlsplit(issue["self"])
+    return f"{url.scheme}://{url.netloc}", issue["key"].upper(), fields
+
+class AutoEstimator:
+    """
+    Estimates stories in the background when Jira reports edits to them.
+
+    Bursts of events for the same story are debounced, the handler runs once
+    the story has been quiet for `debounce` seconds. Results are kept in
+    SQLite per (jira_url, story) with the content hash they were made for,
+    so unchanged stories are not sent to the LLM again and /story_id can
+    answer from the stored estimate.
+    """
+
+    def __init__(self, db_path: str, debounce: float, concurrency: int, max_pending: int):
+        self.db_path = db_path
+        self.debounce = debounce
+        self.concurrency = concurrency
+        self.max_pending = max_pending
+
+        self._conn = None
+        self._lock = threading.Lock()
+        self._handler = None
+        self._semaphore = None
+        self._pending = {}
+        self._timers = {}
+        self._stats = {"received": 0, "debounced": 0, "estimated": 0, "unchanged": 0, "failed": 0, "rejected": 0}
+
+    def _db(self):
+        if self._conn is None:
+            self._conn = connect_sqlite(self.db_path)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS story_estimates ("
+                "jira_url TEXT NOT NULL, story_id TEXT NOT NULL, content_hash TEXT NOT NULL, "
+                "result TEXT NOT NULL, updated_at REAL NOT NULL, PRIMARY KEY (jira_url, story_id))"
+            )
+        return self._conn
+
+    def _execute(self, sql, params=()):
+        with self._lock:
+            return self._db().execute(sql, params).fetchall()
+
+    @staticmethod
+    def _normalize_url(jira_url: str) -> str:
+        return jira_url.strip().rstrip("/")
+
+    def start(self, handler):
+        """
+        Registers the handler estimating a story.
+
+        Args:
+            handler (callable): Coroutine function taking (jira_url, story_id,
+                fields) and returning "estimated", "unchanged" or "failed".
+        """
+        self._handler = handler
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+
+    async def stop(self):
+        """
+        Cancels the pending timers, stories still being debounced are dropped.
+        """
+        timers = list(self._timers.values())
+        for task in timers:
+            task.cancel()
+        await asyncio.gather(*timers, return_exceptions=True)
+        self._timers.clear()
+        self._pending.clear()
+
+    def schedule(self, jira_url: str, story_id: str, fields: dict):
+        """
+        Schedules the estimate of a story, replacing any pending one.
+
+        Raises:
+            WebhookBacklogFullError: When max_pending other stories are waiting.
+        """
+        if self._handler is None:
+            raise RuntimeError("Auto estimator is not started")
+
+        key = (self._normalize_url(jira_url), story_id.upper())
+        if key not in self._pending and len(self._pending) >= self.max_pending:
+            self._stats["rejected"] += 1
+            raise WebhookBacklogFullError(f"Too many stories waiting for an estimate ({self.max_pending})")
+        self._stats["received"] += 1
+        self._pending[key] = fields
+
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+            self._stats["debounced"] += 1
+        self._timers[key] = asyncio.create_task(self._run_after_debounce(key))
+
+    async def _run_after_debounce(self, key):
+        await asyncio.sleep(self.debounce)
+        # Past this point the estimate is not cancelled by newer events, they schedule another run
+        self._timers.pop(key, None)
+        fields = self._pending.pop(key)
+        request_id_var.set(f"webhook-{key[1]}")
+
+        async with self._semaphore:
+            try:
+                outcome = await self._handler(key[0], key[1], fields)
+            except Exception as e:
+                LOGGER.error("Auto estimate of %s failed: %s", key[1], e)
+                outcome = "failed"
+        self._stats[outcome] += 1
+
+    def get(self, jira_url: str, story_id: str):
+        """
+        Returns the (content_hash, result) stored for a story, or None.
+        """
+        rows = self._execute("SELECT content_hash, result FROM story_estimates WHERE jira_url = ? AND story_id = ?",
+                             (self._normalize_url(jira_url), story_id.upper()))
+        if not rows:
+            return None
+        return rows[0][0], json.loads(rows[0][1])
+
+    def set(self, jira_url: str, story_id: str, content_hash: str, result: dict):
+        self._execute(
+            "INSERT OR REPLACE INTO story_estimates (jira_url, story_id, content_hash, result, updated_at) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (self._normalize_url(jira_url), story_id.upper(), content_hash, json.dumps(result), time.time())
+        )
+
+    def stats(self) -> dict:
+        stats = dict(self._stats)
+        stats["pending"] = len(self._timers)
+        stats["stored"] = self._execute("SELECT COUNT(*) FROM story_estimates")[0][0]
+        return stats
+
+auto_estimator = AutoEstimator(
+    db_path=Constants.AUTO_ESTIMATE_DB,
+    debounce=Constants.WEBHOOK_DEBOUNCE,
+    concurrency=Constants.WEBHOOK_CONCURRENCY,
+    max_pending=Constants.WEBHOOK_MAX_PENDING,
+)
@@ -0,0 +1,156 @@
+import json
+import time
+import threading
+from collections import OrderedDict
+
+from src.utilities import connect_sqlite
+
+_MISSING = object()
+
+class TTLCache:
+    """
+    Small in-memory cache where every entry carries its own time-to-live.
+    Oldest entries are evicted first once max_entries is reached.
+    """
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+
+    def get(self, key, default=None):
+        """
+        Returns the cached value for key, or default when missing or expired.
+        """
+        item = self._data.get(key)
+        if item is None:
+            return default
+
+        expires_at, value = item
+        if expires_at < time.monotonic():
+            self._data.pop(key, None)
+            return default
+
+        return value
+
+    def set(self, key, value, ttl: float):
+        """
+        Stores value under key for ttl seconds.
+        """
+        self._data.pop(key, None)
+        self._data[key] = (time.monotonic() + ttl, value)
+
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        item = self._data.pop(key, None)
+        return default if item is None else item[1]
+
+    def clear(self):
+        self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+class SharedTTLCache:
+    """
+    TTL cache shared by the worker processes of a host through a SQLite
+    table in WAL mode, so an entry set by one worker is a hit in the others.
+    Values must be JSON serialisable.
+
+    Entries read from SQLite are also kept in process memory for at most
+    local_ttl seconds, hot keys skip the database while removals made by
+    another worker are seen within that time.
+    """
+
+    def __init__(self, db_path: str, namespace: str, max_entries: int = 10000, local_ttl: float = 2.0):
+        self.db_path = db_path
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self.local_ttl = local_ttl
+
+        self._local = TTLCache(max_entries=max_entries)
+        self._lock = threading.Lock()
+        self._conn = None
+        self._writes = 0
+
+    def _db(self):
+        # Opened lazily so importing the module never touches the disk
+        if self._conn is None:
+            self._conn = connect_sqlite(self.db_path)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS shared_cache ("
+                "namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, "
+                "expires_at REAL NOT NULL, PRIMARY KEY (namespace, key))"
+            )
+        return self._conn
+
+    @staticmethod
+    def _encode_key(key) -> str:
+        return json.dumps(key)
+
+    def get(self, key, default=None):
+        """
+        Returns the cached value for key, or default when missing or expired.
+        """
+        value = self._local.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+
+        now = time.time()
+        with self._lock:
+            row = self._db().execute(
+                "SELECT value, expires_at FROM shared_cache WHERE namespace = ? AND key = ?",
+                (self.namespace, self._encode_key(key))
+            ).fetchone()
+        if row is None or row[1] <= now:
+            return default
+
+        value = json.loads(row[0])
+        self._local.set(key, value, min(self.local_ttl, row[1] - now))
+        return value
+
+    def set(self, key, value, ttl: float):
+        """
+        Stores value under key for ttl seconds.
+        """
+        now = time.time()
+        self._local.set(key, value, min(self.local_ttl, ttl))
+        with self._lock:
+            self._db().execute(
+                "INSERT OR REPLACE INTO shared_cache (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)",
+                (self.namespace, self._encode_key(key), json.dumps(value), now + ttl)
+            )
+
+            self._writes += 1
+            if self._writes % 100 == 0:
+                self._evict(now)
+
+    def _evict(self, now):
+        db = self._db()
+        db.execute("DELETE FROM shared_cache WHERE namespace = ? AND expires_at <= ?", (self.namespace, now))
+        db.execute(
+            "DELETE FROM shared_cache WHERE namespace = ? AND key IN ("
+            "SELECT key FROM shared_cache WHERE namespace = ? ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+            (self.namespace, self.namespace, self.max_entries)
+        )
+
+    def pop(self, key, default=None):
+        value = self.get(key, default)
+        self._local.pop(key)
+        with self._lock:
+            self._db().execute("DELETE FROM shared_cache WHERE namespace = ? AND key = ?",
+                               (self.namespace, self._encode_key(key)))
+        return value
+
+    def clear(self):
+        self._local.clear()
+        with self._lock:
+            self._db().execute("DELETE FROM shared_cache WHERE namespace = ?", (self.namespace,))
+
+    def __len__(self):
+        with self._lock:
+            return self._db().execute(
+                "SELECT COUNT(*) FROM shared_cache WHERE namespace = ? AND expires_at > ?",
+                (self.namespace, time.time())
+            ).fetchone()[0]
@@ -0,0 +1,133 @@
+import re
+
+try:
+    import tiktoken
+except ImportError:  # optional, a regex approximation is used otherwise
+    tiktoken = None
+
+from src.constants import Constants
+from src.logger import setup_logger
+
+LOGGER = setup_logger(__name__)
+
+BLOCK = re.compile(r"\{(code|noformat)(?::[^}]*)?\}(.*?)\{\1\}|```[^\n]*\n(.*?)```", re.DOTALL)
+HEADING = re.compile(r"^h[1-6]\.\s*", re.MULTILINE)
+COLOR = re.compile(r"\{color(?::[^}]*)?\}")
+MACRO = re.compile(r"\{(panel|quote|expand|info|note|warning|tip)(?::[^}]*)?\}")
+LINK = re.compile(r"\[([^|\]\n]+)\|[^\]\n]+\]")
+BARE_LINK = re.compile(r"\[(https?://[^\]\s]+)\]")
+IMAGE = re.compile(r"![^!\s][^!\n]*!")
+EMPHASIS = re.compile(r"(?<![\w*_])([*_+-])(\S(?:[^\n]*?\S)?)\1(?![\w*_])")
+TABLE_SEPARATOR = re.compile(r"\s*\|\|?\s*")
+RULE = re.compile(r"^-{4,}\s*$", re.MULTILINE)
+SPACES = re.compile(r"[ \t]+")
+WORD_PIECE = re.compile(r"\w+|[^\w\s]")
+
+BLOCK_MARKERS = ("[code]", "[/code]")
+
+_encoding = None
+_encoding_failed = False
+
+def _get_encoding():
+    global _encoding, _encoding_failed
+    if _encoding is None and tiktoken is not None and not _encoding_failed:
+        try:
+            _encoding = tiktoken.get_encoding(Constants.TOKENIZER_ENCODING)
+        except Exception as e:
+            # The encoding file is downloaded on first use, do not retry it on every request
+            _encoding_failed = True
+            LOGGER.warning("Could not load the %s encoding, token counts are approximated: %s",
+                           Constants.TOKENIZER_ENCODING, e)
+    return _encoding
+
+def count_tokens(text):
+    """
+    Counts tokens with the local tiktoken encoding, or approximates them by
+    words and punctuation when tiktoken or its encoding is not available.
+    """
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return len(WORD_PIECE.findall(text))
+
+def _collapse_block(match):
+    body = (match.group(2) if match.group(2) is not None else match.group(3)).strip("\n")
+    lines = body.splitlines()
+    keep = Constants.COMPACTION_BLOCK_LINES
+
+    if len(lines) > 2 * keep:
+        lines = lines[:keep] + [f"... ({len(lines) - 2 * keep} lines omitted) ..."] + lines[-keep:]
+
+    return "\n{0}\n{1}\n{2}\n".format(BLOCK_MARKERS[0], "\n".join(lines), BLOCK_MARKERS[1])
+
+def _strip_markup(text):
+    text = COLOR.sub("", text)
+    text = MACRO.sub("", text)
+    text = IMAGE.sub("", text)
+    text = LINK.sub(r"\1", text)
+    text = BARE_LINK.sub(r"\1", text)
+    text = HEADING.sub("", text)
+    text = RULE.sub("", text)
+    text = EMPHASIS.sub(r"\2", text)
+
+    lines = []
+    for line in text.splitlines():
+        if line.lstrip().startswith("|"):
+            line = " | ".join(cell for cell in TABLE_SEPARATOR.split(line.strip()) if cell)
+        lines.append(SPACES.sub(" ", line).strip())
+    return lines
+
+def _dedupe(lines):
+    seen = set()
+    result = []
+    for line in lines:
+        key = line.lower()
+        if not line:
+            # Keep single blank lines as paragraph breaks
+            if result and result[-1]:
+                result.append(line)
+            continue
+        if key in seen and line not in BLOCK_MARKERS:
+            continue
+        seen.add(key)
+        result.append(line)
+    return result
+
+def _trim(text, token_budget):
+    encoding = _get_encoding()
+    if encoding is not None:
+        tokens = encoding.encode(text, disallowed_special=())
+        return encoding.decode(tokens[:token_budget]) + "\n[truncated]"
+
+    pieces = list(WORD_PIECE.finditer(text))
+    return text[:pieces[token_budget - 1].end()] + "\n[truncated]"
+
+def compact_description(text, token_budget=None):
+    """
+    Shrinks a story description before it is rendered into the prompt: Jira
+    wiki markup is stripped, code and log blocks are collapsed to their first
+    and last lines, repeated lines are dropped and the result is trimmed to
+    the token budget.
+
+    Args:
+        text (str): The story text.
+        token_budget (int): Maximum number of tokens to keep.
+
+    Returns:
+        tuple: (compacted text, report with tokens before and after).
+    """
+    if token_budget is None:
+        token_budget = Constants.COMPACTION_TOKEN_BUDGET
+
+    tokens_before = count_tokens(text)
+
+    compacted = BLOCK.sub(_collapse_block, text)
+    compacted = "\n".join(_dedupe(_strip_markup(compacted))).strip()
+
+    if count_tokens(compacted) > token_budget:
+        compacted = _trim(compacted, token_budget)
+
+    report = {"tokens_before": tokens_before, "tokens_after": count_tokens(compacted)}
+    LOGGER.info("Compacted story text from %d to %d tokens", report["tokens_before"], report["tokens_after"])
+
+    return compacted, report
@@ -1,7 +1,139 @@
 import os
-from enum import Enum
 
-class Constants(Enum):
+class Constants:
+    # Plain class attributes read from the environment once at import, one name per setting
 
-    PROMPT_PATH = os.path.join("config", "prompt_v1.txt")
-    
\ No newline at end of file
+    PROMPT_DIR = os.getenv("PROMPT_DIR", "config")
+    DEFAULT_PROMPT_TEMPLATE = os.getenv("DEFAULT_PROMPT_TEMPLATE", "prompt_v1")
+    PROMPT_RELOAD_INTERVAL = float(os.getenv("PROMPT_RELOAD_INTERVAL", "2"))
+    DATA_DIR = os.getenv("DATA_DIR", "data")
+    # Seconds a SQLite store waits for the write lock held by another worker process
+    SQLITE_BUSY_TIMEOUT = float(os.getenv("SQLITE_BUSY_TIMEOUT", "15"))
+
+    # Pooled Jira HTTP client settings (one client per Jira base URL)
+    JIRA_POOL_MAX_CONNECTIONS = int(os.getenv("JIRA_POOL_MAX_CONNECTIONS", "100"))
+    JIRA_POOL_MAX_KEEPALIVE = int(os.getenv("JIRA_POOL_MAX_KEEPALIVE", "20"))
+    JIRA_KEEPALIVE_EXPIRY = float(os.getenv("JIRA_KEEPALIVE_EXPIRY", "60"))
+    JIRA_CONNECT_TIMEOUT = float(os.getenv("JIRA_CONNECT_TIMEOUT", "5"))
+    JIRA_READ_TIMEOUT = float(os.getenv("JIRA_READ_TIMEOUT", "30"))
+    JIRA_MAX_CLIENTS = int(os.getenv("JIRA_MAX_CLIENTS", "256"))
+
+    # Credential verification cache, failures are kept for a shorter time
+    AUTH_CACHE_TTL = float(os.getenv("AUTH_CACHE_TTL", "300"))
+    AUTH_CACHE_NEGATIVE_TTL = float(os.getenv("AUTH_CACHE_NEGATIVE_TTL", "30"))
+    AUTH_CACHE_MAX_ENTRIES = int(os.getenv("AUTH_CACHE_MAX_ENTRIES", "10000"))
+
+    # Subtask creation, Jira accepts at most 50 issues per bulk request
+    JIRA_BULK_CREATE_LIMIT = int(os.getenv("JIRA_BULK_CREATE_LIMIT", "50"))
+    JIRA_CREATE_CONCURRENCY = int(os.getenv("JIRA_CREATE_CONCURRENCY", "5"))
+    # Per-project subtask issue type and create screen metadata
+    PROJECT_METADATA_TTL = float(os.getenv("PROJECT_METADATA_TTL", "3600"))
+    PROJECT_METADATA_NEGATIVE_TTL = float(os.getenv("PROJECT_METADATA_NEGATIVE_TTL", "60"))
+    PROJECT_METADATA_MAX_ENTRIES = int(os.getenv("PROJECT_METADATA_MAX_ENTRIES", "1000"))
+    # Stored results of subtask creations sent with an Idempotency-Key header
+    IDEMPOTENCY_DB = os.path.join(DATA_DIR, "idempotency.db")
+    IDEMPOTENCY_TTL = float(os.getenv("IDEMPOTENCY_TTL", str(24 * 3600)))
+
+    # Batch estimation
+    JIRA_SEARCH_PAGE_SIZE = int(os.getenv("JIRA_SEARCH_PAGE_SIZE", "100"))
+    BATCH_MAX_STORIES = int(os.getenv("BATCH_MAX_STORIES", "500"))
+    BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "8"))
+    BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "32"))
+    # Packed batch estimation, several stories per LLM request within a prompt token budget
+    BATCH_PACKING_ENABLED = os.getenv("BATCH_PACKING_ENABLED", "false").lower() == "true"
+    PACK_TOKEN_BUDGET = int(os.getenv("PACK_TOKEN_BUDGET", "3000"))
+    PACK_MAX_STORIES = int(os.getenv("PACK_MAX_STORIES", "8"))
+
+    # Worker threads available to the synchronous LLM client
+    LLM_MAX_WORKERS = int(os.getenv("LLM_MAX_WORKERS", "64"))
+
+    # LLM providers in priority order as "kind[:model]", kinds: openai, azure, anthropic, gemini
+    LLM_PROVIDERS = os.getenv("LLM_PROVIDERS", "openai")
+    # A hedged request goes to the next provider once the first is slower than this latency percentile
+    LLM_HEDGE_ENABLED = os.getenv("LLM_HEDGE_ENABLED", "true").lower() == "true"
+    LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "95"))
+    LLM_HEDGE_DEFAULT_DELAY = float(os.getenv("LLM_HEDGE_DEFAULT_DELAY", "10"))
+    LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+    LLM_LATENCY_WINDOW = int(os.getenv("LLM_LATENCY_WINDOW", "200"))
+    # Consecutive failures that take a provider out of rotation, and for how long (seconds)
+    LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "3"))
+    LLM_BREAKER_COOLDOWN = float(os.getenv("LLM_BREAKER_COOLDOWN", "30"))
+
+    # LLM estimate cache, in-memory LRU backed by SQLite
+    ESTIMATE_CACHE_DB = os.path.join(DATA_DIR, "estimate_cache.db")
+    ESTIMATE_CACHE_TTL = float(os.getenv("ESTIMATE_CACHE_TTL", str(7 * 24 * 3600)))
+    ESTIMATE_CACHE_MEMORY_ENTRIES = int(os.getenv("ESTIMATE_CACHE_MEMORY_ENTRIES", "1024"))
+    ESTIMATE_CACHE_MAX_ENTRIES = int(os.getenv("ESTIMATE_CACHE_MAX_ENTRIES", "100000"))
+
+    # Estimate output: "text" (prompt format only), "json_object" or "json_schema"
+    ESTIMATE_OUTPUT_MODE = os.getenv("ESTIMATE_OUTPUT_MODE", "text")
+    ESTIMATE_MAX_REPAIR_RETRIES = int(os.getenv("ESTIMATE_MAX_REPAIR_RETRIES", "1"))
+
+    # Optional story enrichment with comments, linked issues and parent epic
+    ENRICH_MAX_COMMENTS = int(os.getenv("ENRICH_MAX_COMMENTS", "5"))
+    ENRICH_MAX_COMMENT_CHARS = int(os.getenv("ENRICH_MAX_COMMENT_CHARS", "500"))
+
+    # Similarity index over past estimates: near duplicates reuse an estimate, close stories become examples
+    SIMILARITY_ENABLED = os.getenv("SIMILARITY_ENABLED", "true").lower() == "true"
+    SIMILARITY_DB = os.path.join(DATA_DIR, "similarity_index.db")
+    SIMILARITY_NUM_PERM = int(os.getenv("SIMILARITY_NUM_PERM", "64"))
+    SIMILARITY_REUSE_THRESHOLD = float(os.getenv("SIMILARITY_REUSE_THRESHOLD", "0.85"))
+    SIMILARITY_FEW_SHOT_K = int(os.getenv("SIMILARITY_FEW_SHOT_K", "2"))
+    SIMILARITY_FEW_SHOT_MIN = float(os.getenv("SIMILARITY_FEW_SHOT_MIN", "0.2"))
+    SIMILARITY_EXAMPLE_CHARS = int(os.getenv("SIMILARITY_EXAMPLE_CHARS", "600"))
+
+    # Story text compaction before prompt rendering
+    COMPACTION_ENABLED = os.getenv("COMPACTION_ENABLED", "true").lower() == "true"
+    COMPACTION_TOKEN_BUDGET = int(os.getenv("COMPACTION_TOKEN_BUDGET", "1500"))
+    COMPACTION_BLOCK_LINES = int(os.getenv("COMPACTION_BLOCK_LINES", "5"))
+    TOKENIZER_ENCODING = os.getenv("TOKENIZER_ENCODING", "cl100k_base")
+
+    # Background estimation jobs
+    JOB_DB = os.path.join(DATA_DIR, "jobs.db")
+    JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+    JOB_MAX_QUEUE = int(os.getenv("JOB_MAX_QUEUE", "1000"))
+    JOB_RETENTION = float(os.getenv("JOB_RETENTION", str(24 * 3600)))
+    # Fernet key encrypting the Jira API tokens of queued jobs, random per process when empty
+    JOB_SECRET_KEY = os.getenv("JOB_SECRET_KEY", "")
+
+    # Jira webhook auto-estimation, edits to a story within WEBHOOK_DEBOUNCE seconds are estimated once
+    AUTO_ESTIMATE_DB = os.path.join(DATA_DIR, "auto_estimates.db")
+    WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+    WEBHOOK_DEBOUNCE = float(os.getenv("WEBHOOK_DEBOUNCE", "10"))
+    WEBHOOK_CONCURRENCY = int(os.getenv("WEBHOOK_CONCURRENCY", "4"))
+    # Webhooks are rejected without a secret, and for Jira URLs missing from this comma separated list
+    WEBHOOK_ALLOWED_JIRA_URLS = os.getenv("WEBHOOK_ALLOWED_JIRA_URLS", "")
+    WEBHOOK_MAX_PENDING = int(os.getenv("WEBHOOK_MAX_PENDING", "1000"))
+
+    # LLM usage ledger, flushed to SQLite in batches, and per-tenant (jira_url, username) limits, 0 disables a limit
+    USAGE_DB = os.path.join(DATA_DIR, "usage.db")
+    USAGE_FLUSH_INTERVAL = float(os.getenv("USAGE_FLUSH_INTERVAL", "5"))
+    USAGE_FLUSH_SIZE = int(os.getenv("USAGE_FLUSH_SIZE", "500"))
+    TENANT_DAILY_TOKEN_BUDGET = int(os.getenv("TENANT_DAILY_TOKEN_BUDGET", "0"))
+    TENANT_DAILY_COST_BUDGET = float(os.getenv("TENANT_DAILY_COST_BUDGET", "0"))
+    TENANT_LLM_CALLS_PER_MINUTE = int(os.getenv("TENANT_LLM_CALLS_PER_MINUTE", "0"))
+
+    # Production server (python -m src.server): worker processes, drain time on shutdown and start-up warmup
+    HOST = os.getenv("HOST", "0.0.0.0")
+    PORT = int(os.getenv("PORT", "8000"))
+    WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
+    GRACEFUL_TIMEOUT = float(os.getenv("GRACEFUL_TIMEOUT", "30"))
+    WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "false").lower() == "true"
+    # Comma separated Jira URLs whose connection pools are opened during warmup
+    WARMUP_JIRA_URLS = os.getenv("WARMUP_JIRA_URLS", "")
+    # Caches shared by the worker processes of a host, entries stay in process memory for SHARED_CACHE_LOCAL_TTL seconds
+    SHARED_CACHE_DB = os.path.join(DATA_DIR, "shared_cache.db")
+    SHARED_CACHE_LOCAL_TTL = float(os.getenv("SHARED_CACHE_LOCAL_TTL", "2"))
+    # How often the similarity index picks up stories added by other workers (seconds)
+    SIMILARITY_REFRESH_INTERVAL = float(os.getenv("SIMILARITY_REFRESH_INTERVAL", "1"))
+
+    # Per-tenant Jira rate limiting (requests per second) and retries
+    JIRA_RATE_LIMIT = float(os.getenv("JIRA_RATE_LIMIT", "20"))
+    JIRA_RATE_BURST = float(os.getenv("JIRA_RATE_BURST", "40"))
+    JIRA_RATE_MIN = float(os.getenv("JIRA_RATE_MIN", "1"))
+    JIRA_RATE_MAX = float(os.getenv("JIRA_RATE_MAX", "100"))
+    JIRA_RATE_INCREASE = float(os.getenv("JIRA_RATE_INCREASE", "0.1"))
+    JIRA_MAX_RETRIES = int(os.getenv("JIRA_MAX_RETRIES", "3"))
+    JIRA_BACKOFF_BASE = float(os.getenv("JIRA_BACKOFF_BASE", "0.5"))
+    JIRA_BACKOFF_MAX = float(os.getenv("JIRA_BACKOFF_MAX", "30"))
+    JIRA_MAX_LIMITERS = int(os.getenv("JIRA_MAX_LIMITERS", "1024"))
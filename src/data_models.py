@@ -17,4 +17,29 @@ class StoryEstimate(BaseModel):
     status : int
     story_id : str
     description : Optional[str] = None
-    subtasks : Optional[List] = None
\ No newline at end of file
+    subtasks : Optional[List] = None
+    message : Optional[str] = None
+    compaction : Optional[dict] = None
+    precomputed : Optional[bool] = None
+    similar_story : Optional[dict] = None
+    usage : Optional[dict] = None
+
+class BatchEstimateRequest(BaseModel):
+    jql : Optional[str] = None
+    story_ids : Optional[List[str]] = None
+    concurrency : Optional[int] = None
+    pack : Optional[bool] = None
+
+class BatchEstimate(BaseModel):
+    status : int
+    message : Optional[str] = None
+    estimates : List[StoryEstimate] = []
+    packing : Optional[dict] = None
+    usage : Optional[dict] = None
+
+class EstimateJob(BaseModel):
+    status : int
+    job_id : Optional[str] = None
+    state : Optional[str] = None
+    result : Optional[StoryEstimate] = None
+    message : Optional[str] = None
\ No newline at end of file
@@ -0,0 +1,142 @@
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+from src.constants import Constants
+from src.logger import setup_logger
+from src.utilities import connect_sqlite
+from src.metrics import CACHE_REQUESTS
+
+LOGGER = setup_logger(__name__)
+
+class EstimateCache:
+    """
+    Content-addressed cache of raw LLM estimate responses.
+
+    Entries are keyed by a hash of (model, rendered prompt). Lookups go to an
+    in-memory LRU first, then to a SQLite table that survives restarts. Both
+    tiers honour the TTL, the SQLite tier is trimmed to max_entries.
+    """
+
+    def __init__(self, db_path: str, ttl: float, memory_entries: int, max_entries: int):
+        self.db_path = db_path
+        self.ttl = ttl
+        self.memory_entries = memory_entries
+        self.max_entries = max_entries
+
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+        self._writes = 0
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "bypassed": 0}
+
+    @staticmethod
+    def make_key(model: str, prompt: str) -> str:
+        return hashlib.sha256(f"{model}\0{prompt}".encode("utf-8")).hexdigest()
+
+    def _db(self):
+        # Opened lazily so importing the module never touches the disk
+        if self._conn is None:
+            self._conn = connect_sqlite(self.db_path)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS estimates ("
+                "key TEXT PRIMARY KEY, response TEXT NOT NULL, "
+                "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_estimates_accessed ON estimates (accessed_at)")
+        return self._conn
+
+    def _remember(self, key, created_at, response):
+        self._memory[key] = (created_at, response)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, key: str):
+        """
+        Returns the cached response for key, or None on a miss.
+        """
+        now = time.time()
+
+        with self._lock:
+            item = self._memory.get(key)
+            if item is not None and now - item[0] < self.ttl:
+                self._memory.move_to_end(key)
+                self._stats["memory_hits"] += 1
+                CACHE_REQUESTS.inc(cache="estimate", result="memory_hit")
+                return item[1]
+
+            row = self._db().execute(
+                "SELECT response, created_at FROM estimates WHERE key = ?", (key,)
+            ).fetchone()
+
+            if row is not None and now - row[1] < self.ttl:
+                self._db().execute("UPDATE estimates SET accessed_at = ? WHERE key = ?", (now, key))
+                self._remember(key, row[1], row[0])
+                self._stats["disk_hits"] += 1
+                CACHE_REQUESTS.inc(cache="estimate", result="disk_hit")
+                return row[0]
+
+            self._memory.pop(key, None)
+            self._stats["misses"] += 1
+            CACHE_REQUESTS.inc(cache="estimate", result="miss")
+            return None
+
+    def set(self, key: str, response: str):
+        """
+        Stores a response in both tiers.
+        """
+        now = time.time()
+
+        with self._lock:
+            self._remember(key, now, response)
+            self._db().execute(
+                "INSERT OR REPLACE INTO estimates (key, response, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, response, now, now)
+            )
+
+            self._writes += 1
+            if self._writes % 100 == 0:
+                self._evict(now)
+
+    def delete(self, key: str):
+        """
+        Removes an entry from both tiers, used for entries that no longer parse.
+        """
+        with self._lock:
+            self._memory.pop(key, None)
+            self._db().execute("DELETE FROM estimates WHERE key = ?", (key,))
+
+    def record_bypass(self):
+        with self._lock:
+            self._stats["bypassed"] += 1
+
+    def _evict(self, now):
+        db = self._db()
+        db.execute("DELETE FROM estimates WHERE created_at < ?", (now - self.ttl,))
+        db.execute(
+            "DELETE FROM estimates WHERE key IN ("
+            "SELECT key FROM estimates ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,)
+        )
+        LOGGER.debug("Estimate cache eviction done")
+
+    def stats(self) -> dict:
+        """
+        Returns hit/miss counters and the size of each tier.
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+            stats["hit_ratio"] = (stats["memory_hits"] + stats["disk_hits"]) / lookups if lookups else 0.0
+            stats["memory_entries"] = len(self._memory)
+            stats["disk_entries"] = self._db().execute("SELECT COUNT(*) FROM estimates").fetchone()[0]
+        return stats
+
+estimate_cache = EstimateCache(
+    db_path=Constants.ESTIMATE_CACHE_DB,
+    ttl=Constants.ESTIMATE_CACHE_TTL,
+    memory_entries=Constants.ESTIMATE_CACHE_MEMORY_ENTRIES,
+    max_entries=Constants.ESTIMATE_CACHE_MAX_ENTRIES,
+)
@@ -0,0 +1,196 @@
+import re
+import ast
+import math
+import json
+import threading
+
+try:
+    import orjson
+except ImportError:  # optional, the standard library parser is used otherwise
+    orjson = None
+
+from pydantic import ValidationError
+
+from src.data_models import Subtask
+from src.logger import setup_logger
+
+LOGGER = setup_logger(__name__)
+
+CODE_FENCE = re.compile(r"```(?:json|python)?\s*(.*?)```", re.DOTALL)
+TRAILING_COMMA = re.compile(r",\s*([}\]])")
+
+class EstimateParseError(ValueError):
+    """
+    Raised when an LLM response cannot be turned into a list of subtasks.
+    """
+
+def _loads(text):
+    if orjson is not None:
+        return orjson.loads(text)
+    return json.loads(text)
+
+def subtasks_json_schema() -> dict:
+    """
+    Returns the JSON schema used for structured output, built from the Subtask model.
+    """
+    item_schema = Subtask.model_json_schema()
+    item_schema["additionalProperties"] = False
+    return {
+        "name": "story_estimate",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {"subtasks": {"type": "array", "items": item_schema}},
+            "required": ["subtasks"],
+            "additionalProperties": False,
+        },
+    }
+
+def validate_subtask(item):
+    """
+    Validates one subtask object against the Subtask model.
+
+    Raises:
+        EstimateParseError: When the object is not a valid subtask.
+    """
+    if not isinstance(item, dict):
+        raise EstimateParseError(f"Subtask is not an object: {item!r}")
+    # Fractional days are rounded up to the integer estimation of Subtask
+    if isinstance(item.get("estimation"), float):
+        item = {**item, "estimation": math.ceil(item["estimation"])}
+    try:
+        return Subtask(**item).dict()
+    except ValidationError as e:
+        raise EstimateParseError(f"Invalid subtask {item!r}: {e}") from e
+
+def _validate(value):
+    # Structured outputs come wrapped in an object, take its list
+    if isinstance(value, dict):
+        value = value.get("subtasks", next((v for v in value.values() if isinstance(v, list)), None))
+
+    if not isinstance(value, list):
+        raise EstimateParseError("Estimate is not a list of subtasks")
+
+    return [validate_subtask(item) for item in value]
+
+def _repair(text):
+    """
+    Cheap local fixes for common LLM formatting slips: code fences, prose
+    around the array and trailing commas.
+    """
+    fenced = CODE_FENCE.search(text)
+    if fenced:
+        text = fenced.group(1)
+
+    start, end = text.find("["), text.rfind("]")
+    obj_start, obj_end = text.find("{"), text.rfind("}")
+    if start != -1 and end > start and (obj_start == -1 or start < obj_start):
+        text = text[start:end + 1]
+    elif obj_start != -1 and obj_end > obj_start:
+        text = text[obj_start:obj_end + 1]
+
+    return TRAILING_COMMA.sub(r"\1", text).strip()
+
+def parse_estimate(text):
+    """
+    Parses an LLM estimate response into validated subtasks without evaluating code.
+
+    Args:
+        text (str): The raw LLM response.
+
+    Returns:
+        tuple: (subtasks, repaired) where repaired tells whether local repair was needed.
+
+    Raises:
+        EstimateParseError: When the response cannot be parsed even after repair.
+    """
+    if not text:
+        raise EstimateParseError("Empty estimate response")
+
+    try:
+        return _validate(_loads(text)), False
+    except (ValueError, TypeError):
+        pass
+
+    repaired = _repair(text)
+    try:
+        return _validate(_loads(repaired)), True
+    except EstimateParseError:
+        raise
+    except (ValueError, TypeError):
+        pass
+
+    # Python-style literals (single quotes, True/False) are read safely
+    try:
+        return _validate(ast.literal_eval(repaired)), True
+    except (ValueError, SyntaxError, TypeError, MemoryError, RecursionError) as e:
+        raise EstimateParseError(f"Could not parse estimate: {e}") from e
+
+def parse_packed_estimate(text, story_ids):
+    """
+    Parses the answer to a packed prompt, a JSON object mapping story IDs to
+    their subtasks. Stories whose entry is missing or invalid are left out,
+    so the caller can estimate them on their own.
+
+    Args:
+        text (str): The raw LLM response.
+        story_ids (list): IDs of the stories in the prompt.
+
+    Returns:
+        dict: Upper-cased story ID -> validated subtasks.
+
+    Raises:
+        EstimateParseError: When the response is not an object at all.
+    """
+    if not text:
+        raise EstimateParseError("Empty estimate response")
+
+    try:
+        value = _loads(text)
+    except (ValueError, TypeError):
+        repaired = _repair(text)
+        try:
+            value = _loads(repaired)
+        except (ValueError, TypeError):
+            try:
+                value = ast.literal_eval(repaired)
+            except (ValueError, SyntaxError, TypeError, MemoryError, RecursionError) as e:
+                raise EstimateParseError(f"Could not parse packed estimate: {e}") from e
+
+    if not isinstance(value, dict):
+        raise EstimateParseError("Packed estimate is not an object keyed by story ID")
+
+    entries = {str(key).strip().upper(): entry for key, entry in value.items()}
+    estimates = {}
+    for story_id in story_ids:
+        entry = entries.get(story_id.upper())
+        if entry is None:
+            continue
+        try:
+            estimates[story_id.upper()] = _validate(entry)
+        except EstimateParseError as e:
+            LOGGER.warning("Invalid packed estimate for %s: %s", story_id, e)
+    return estimates
+
+class ParseStats:
+    """
+    Counters for estimate parsing outcomes and repair re-prompts.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = {"parsed": 0, "repaired": 0, "reprompted": 0, "failed": 0, "retries": 0}
+
+    def record(self, outcome: str, retries: int = 0):
+        with self._lock:
+            self._counts[outcome] += 1
+            self._counts["retries"] += retries
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._counts)
+        total = stats["parsed"] + stats["repaired"] + stats["reprompted"] + stats["failed"]
+        stats["success_rate"] = (total - stats["failed"]) / total if total else 0.0
+        return stats
+
+parse_stats = ParseStats()
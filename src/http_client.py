@@ -0,0 +1,98 @@
+import asyncio
+from collections import OrderedDict
+
+import httpx
+
+from src.constants import Constants
+from src.logger import setup_logger
+
+LOGGER = setup_logger(__name__)
+
+# One pooled keep-alive client per Jira base URL, shared by every request,
+# least recently used first and at most JIRA_MAX_CLIENTS
+_clients = OrderedDict()
+
+# Evicted clients waiting for their in-flight requests before being closed
+_retired = {}
+_closing = set()
+
+def _normalize_base_url(base_url: str) -> str:
+    return base_url.strip().rstrip("/")
+
+def _retire_grace() -> float:
+    # Longest a request started on an evicted client can still be running, retries included
+    attempt = Constants.JIRA_CONNECT_TIMEOUT + Constants.JIRA_READ_TIMEOUT + Constants.JIRA_BACKOFF_MAX
+    return attempt * (Constants.JIRA_MAX_RETRIES + 1)
+
+def _close_retired(key: str, client: httpx.AsyncClient):
+    if _retired.pop(client, None) is None:
+        return
+    task = asyncio.ensure_future(client.aclose())
+    _closing.add(task)
+    task.add_done_callback(_closing.discard)
+    LOGGER.info("Closed evicted HTTP client for %s", key)
+
+def _evict(key: str, client: httpx.AsyncClient):
+    """
+    Drops a client from the pool and closes it after the retire grace period.
+    """
+    LOGGER.info("Evicting pooled HTTP client for %s", key)
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        # Outside an event loop no request is using the client, its connections are dropped with it
+        return
+    _retired[client] = loop.call_later(_retire_grace(), _close_retired, key, client)
+
+def get_client(base_url: str) -> httpx.AsyncClient:
+    """
+    Returns the shared async HTTP client for the given Jira base URL,
+    creating it on first use and evicting the least recently used client
+    beyond JIRA_MAX_CLIENTS.
+
+    Args:
+        base_url (str): The Jira instance URL.
+
+    Returns:
+        httpx.AsyncClient: Pooled client with keep-alive connections.
+    """
+    key = _normalize_base_url(base_url)
+    client = _clients.get(key)
+
+    if client is not None and not client.is_closed:
+        _clients.move_to_end(key)
+    else:
+        limits = httpx.Limits(
+            max_connections=Constants.JIRA_POOL_MAX_CONNECTIONS,
+            max_keepalive_connections=Constants.JIRA_POOL_MAX_KEEPALIVE,
+            keepalive_expiry=Constants.JIRA_KEEPALIVE_EXPIRY,
+        )
+        timeout = httpx.Timeout(
+            Constants.JIRA_READ_TIMEOUT,
+            connect=Constants.JIRA_CONNECT_TIMEOUT,
+        )
+        client = httpx.AsyncClient(base_url=key, limits=limits, timeout=timeout)
+        _clients[key] = client
+        _clients.move_to_end(key)
+        LOGGER.info("Created pooled HTTP client for %s", key)
+        while len(_clients) > Constants.JIRA_MAX_CLIENTS:
+            _evict(*_clients.popitem(last=False))
+
+    return client
+
+async def close_clients():
+    """
+    Closes every pooled client, and the evicted ones still waiting, used on
+    application shutdown.
+    """
+    for key, client in list(_clients.items()):
+        await client.aclose()
+        LOGGER.info("Closed pooled HTTP client for %s", key)
+    _clients.clear()
+
+    for client, handle in list(_retired.items()):
+        handle.cancel()
+        await client.aclose()
+    _retired.clear()
+    if _closing:
+        await asyncio.gather(*_closing, return_exceptions=True)
@@ -0,0 +1,78 @@
+import json
+import time
+import hashlib
+import threading
+
+from src.constants import Constants
+from src.logger import setup_logger
+from src.utilities import connect_sqlite
+
+LOGGER = setup_logger(__name__)
+
+class IdempotencyStore:
+    """
+    Stores the results of write requests sent with an idempotency key, so a
+    retried request gets the first result back instead of writing again.
+
+    Entries are scoped by the caller's credentials and remember a fingerprint
+    of the request body, a key reused for a different request is rejected.
+    """
+
+    def __init__(self, db_path: str, ttl: float):
+        self.db_path = db_path
+        self.ttl = ttl
+
+        self._lock = threading.Lock()
+        self._conn = None
+        self._writes = 0
+
+    @staticmethod
+    def make_key(scope, idempotency_key: str) -> str:
+        return hashlib.sha256("\0".join([*scope, idempotency_key]).encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def fingerprint(request: dict) -> str:
+        return hashlib.sha256(json.dumps(request, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+    def _db(self):
+        # Opened lazily so importing the module never touches the disk
+        if self._conn is None:
+            self._conn = connect_sqlite(self.db_path)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS idempotent_results ("
+                "key TEXT PRIMARY KEY, fingerprint TEXT NOT NULL, "
+                "result TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+        return self._conn
+
+    def get(self, key: str):
+        """
+        Returns the (fingerprint, result) stored under key, or None.
+        """
+        with self._lock:
+            row = self._db().execute(
+                "SELECT fingerprint, result, created_at FROM idempotent_results WHERE key = ?", (key,)
+            ).fetchone()
+
+        if row is None or time.time() - row[2] >= self.ttl:
+            return None
+        return row[0], json.loads(row[1])
+
+    def set(self, key: str, fingerprint: str, result: dict):
+        now = time.time()
+
+        with self._lock:
+            self._db().execute(
+                "INSERT OR REPLACE INTO idempotent_results (key, fingerprint, result, created_at) VALUES (?, ?, ?, ?)",
+                (key, fingerprint, json.dumps(result), now)
+            )
+
+            self._writes += 1
+            if self._writes % 100 == 0:
+                self._db().execute("DELETE FROM idempotent_results WHERE created_at < ?", (now - self.ttl,))
+                LOGGER.debug("Idempotency store eviction done")
+
+idempotency_store = IdempotencyStore(
+    db_path=Constants.IDEMPOTENCY_DB,
+    ttl=Constants.IDEMPOTENCY_TTL,
+)
@@ -0,0 +1,78 @@
+from src.constants import Constants
+from src.cache import TTLCache
+
+# Fields the backend always sets when creating a subtask
+SUBTASK_FIELDS = {"project", "parent", "summary", "description", "issuetype", "timetracking"}
+
+# Preferred names when a project has more than one subtask issue type
+SUBTASK_TYPE_NAMES = ("sub-task", "subtask")
+
+class ProjectMetadata:
+    """
+    What the backend needs to know about a Jira project to create subtasks:
+    the subtask issue type, the required fields of its create screen and
+    whether time tracking can be set on create.
+    """
+
+    def __init__(self, project_key: str, subtask_type: dict = None, fields: dict = None):
+        self.project_key = project_key
+        self.subtask_type_id = subtask_type.get("id") if subtask_type else None
+        self.subtask_type_name = subtask_type.get("name") if subtask_type else None
+        # None when the create screen fields could not be read
+        self.fields = fields
+        self.required_fields = sorted(
+            field_id for field_id, field in (fields or {}).items()
+            if field.get("required") and not field.get("hasDefaultValue")
+        )
+
+    @property
+    def timetracking(self) -> bool:
+        return bool(self.fields) and "timetracking" in self.fields
+
+    @property
+    def missing_required_fields(self):
+        """
+        Required fields without a default that the backend does not fill in.
+        """
+        return [field_id for field_id in self.required_fields if field_id not in SUBTASK_FIELDS]
+
+    def issuetype(self) -> dict:
+        if self.subtask_type_id:
+            return {"id": self.subtask_type_id}
+        # Unknown project layout, let Jira resolve the default subtask type by name
+        return {"name": "Sub-task"}
+
+    def to_dict(self):
+        return {
+            "project_key": self.project_key,
+            "subtask_type_id": self.subtask_type_id,
+            "subtask_type_name": self.subtask_type_name,
+            "required_fields": self.required_fields,
+            "timetracking": self.timetracking,
+        }
+
+def pick_subtask_type(issue_types):
+    """
+    Returns the subtask issue type among the given Jira issue types, or None.
+    """
+    subtask_types = [t for t in issue_types if t.get("subtask") or t.get("hierarchyLevel") == -1]
+    for name in SUBTASK_TYPE_NAMES:
+        for issue_type in subtask_types:
+            if issue_type.get("name", "").lower() == name:
+                return issue_type
+    return subtask_types[0] if subtask_types else None
+
+def fields_by_id(fields):
+    """
+    Normalises the create screen fields of the paginated createmeta API (a
+    list with fieldId) and of the legacy expanded one (a dict) to a dict.
+    """
+    if isinstance(fields, dict):
+        return fields
+    return {field.get("fieldId") or field.get("key"): field for field in fields or []}
+
+def project_key_of(story_id: str) -> str:
+    return story_id.rsplit("-", 1)[0].upper()
+
+# (jira_url, project key) -> ProjectMetadata
+project_metadata_cache = TTLCache(max_entries=Constants.PROJECT_METADATA_MAX_ENTRIES)
@@ -1,18 +1,194 @@
-import requests
-from requests.auth import HTTPBasicAuth
 import json
+import asyncio
+import sqlite3
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+import httpx
 import yaml
 from yaml.loader import SafeLoader
-from grollm import OpenAI_Grollm
+from src.llm import LLMProviderPool
 
 from src.logger import setup_logger
 LOGGER = setup_logger(__name__)
 
 from src.constants import Constants
-ol = OpenAI_Grollm()
+from src.http_client import get_client
+from src.rate_limiter import get_limiter, parse_retry_after, backoff_delay
+from src.cache import SharedTTLCache
+from src.estimate_cache import estimate_cache
+from src.stream_parser import SubtaskStreamParser
+from src.llm_stream import stream_prompt
+from src.compaction import compact_description, count_tokens
+from src.prompt_registry import prompt_registry, PromptTemplateError
+from src.singleflight import SingleFlight
+from src.idempotency import idempotency_store
+from src.auto_estimator import auto_estimator
+from src.similarity_index import similarity_index
+from src.usage_ledger import (usage_ledger, UsageRecorder, TenantBudgetExceeded, current_usage,
+                              empty_usage)
+from src.issue_metadata import (ProjectMetadata, pick_subtask_type, fields_by_id, project_key_of,
+                                project_metadata_cache)
+from src.metrics import stage, timed_stage, CACHE_REQUESTS
+from src.estimate_parser import (parse_estimate, parse_packed_estimate, parse_stats, subtasks_json_schema,
+                                  EstimateParseError)
+# grollm is synchronous, LLM calls run on this pool to keep the event loop free.
+# The clients are created on first use (or by the start-up warmup)
+llm_executor = ThreadPoolExecutor(max_workers=Constants.LLM_MAX_WORKERS, thread_name_prefix="llm")
+llm_pool = LLMProviderPool.from_config(Constants.LLM_PROVIDERS, llm_executor, lazy=True)
 
-with open(Constants.PROMPT_PATH.value, 'r') as f:
-    prompt_template_default = f.read()
+@timed_stage("llm_call")
+async def send_prompt(prompt, **kwargs):
+    """
+    Sends a prompt to the LLM provider pool without blocking the event loop.
+    """
+    return await llm_pool.send_prompt(prompt, **kwargs)
+
+async def llm_stream_chunks(prompt, **kwargs):
+    """
+    Streams the completion of a prompt from the first streaming capable
+    provider, or yields the whole pooled response at once when none is in
+    rotation.
+    """
+    await llm_pool.start()
+    provider = llm_pool.streaming_provider()
+    if provider is None:
+        yield await send_prompt(prompt, **kwargs)
+        return
+    async for chunk in stream_prompt(provider.client, prompt, **kwargs):
+        yield chunk
+
+STRUCTURED_OUTPUT_SUFFIX = (
+    "\nReturn only a JSON object of the form "
+    '{"subtasks": [{"subtask": <description>, "estimation": <days as integer>}]}'
+)
+
+REPAIR_INSTRUCTION = (
+    "Your previous answer could not be parsed ({error}). "
+    "Reply with only the JSON list of subtasks, without any other text."
+)
+
+def output_mode_kwargs():
+    """
+    Returns the provider arguments of the configured estimate output mode.
+    """
+    mode = Constants.ESTIMATE_OUTPUT_MODE
+    if mode == "json_schema":
+        return {"response_format": {"type": "json_schema", "json_schema": subtasks_json_schema()}}
+    if mode == "json_object":
+        return {"response_format": {"type": "json_object"}}
+    return {}
+
+def render_prompt(prompt_template, description):
+    """
+    Renders the estimate prompt from a compiled template, adding the JSON
+    instructions in structured output mode.
+    """
+    prompt = prompt_template.render(description)
+    if output_mode_kwargs():
+        prompt += STRUCTURED_OUTPUT_SUFFIX
+    return prompt
+
+FEW_SHOT_HEADER = "\n***\nFor reference, estimates given to similar past stories:\n"
+
+def few_shot_examples(neighbours):
+    """
+    Formats past stories and their subtasks as prompt examples.
+    """
+    max_chars = Constants.SIMILARITY_EXAMPLE_CHARS
+    examples = [
+        f"Story: {neighbour['description'][:max_chars]}\nSubtasks: {json.dumps(neighbour['subtasks'])}"
+        for neighbour in neighbours
+    ]
+    return FEW_SHOT_HEADER + "\n\n".join(examples)
+
+PACKED_OUTPUT_INSTRUCTION = (
+    "\n***\nThe description above holds several stories, each starting with a \"Story ID:\" line. "
+    "Estimate every story on its own and return only a JSON object mapping each story ID to its list of "
+    'subtasks, e.g. {"ABC-1": [{"subtask": <description>, "estimation": <days as integer>}]}'
+)
+
+# Tokens of the "Story ID:" line and separator added per packed story
+PACKED_STORY_OVERHEAD = 12
+
+def pack_stories(pending, fixed_tokens, token_budget, max_stories):
+    """
+    Groups stories in order so that each group's prompt stays within the
+    token budget. A story that does not fit with any other is alone in its group.
+
+    Args:
+        pending (list): (story_dict, story_query, cache_key) tuples.
+        fixed_tokens (int): Tokens of the template and packing instructions.
+        token_budget (int): Maximum prompt tokens of a packed request.
+        max_stories (int): Maximum stories in one request.
+
+    Returns:
+        list: Lists of the tuples, one per request.
+    """
+    groups = []
+    current, current_tokens = [], fixed_tokens
+    for item in pending:
+        tokens = count_tokens(item[1]) + PACKED_STORY_OVERHEAD
+        if current and (current_tokens + tokens > token_budget or len(current) >= max_stories):
+            groups.append(current)
+            current, current_tokens = [], fixed_tokens
+        current.append(item)
+        current_tokens += tokens
+    if current:
+        groups.append(current)
+    return groups
+
+async def generate_subtasks(prompt):
+    """
+    Asks the LLM for the subtasks of a rendered prompt. Responses go through the
+    safe parser with local repair, the model is re-prompted only when that fails
+    and at most ESTIMATE_MAX_REPAIR_RETRIES times.
+
+    Args:
+        prompt (str): The rendered prompt.
+
+    Returns:
+        list: Validated subtask dictionaries.
+
+    Raises:
+        EstimateParseError: When no valid estimate was produced.
+    """
+    kwargs = output_mode_kwargs()
+    max_retries = Constants.ESTIMATE_MAX_REPAIR_RETRIES
+    messages = prompt
+
+    for attempt in range(max_retries + 1):
+        response = await send_prompt(messages, validator=parse_estimate, **kwargs)
+
+        try:
+            with stage("parse"):
+                subtasks, repaired = parse_estimate(response)
+        except EstimateParseError as e:
+            LOGGER.warning("Estimate parse failed on attempt %d: %s", attempt + 1, e)
+            if attempt == max_retries:
+                parse_stats.record("failed", attempt)
+                raise
+            messages = [
+                {"role": "system", "content": "You are a helpful assistant."},
+                {"role": "user", "content": prompt},
+                {"role": "assistant", "content": response},
+                {"role": "user", "content": REPAIR_INSTRUCTION.format(error=e)},
+            ]
+            continue
+
+        outcome = "reprompted" if attempt else ("repaired" if repaired else "parsed")
+        parse_stats.record(outcome, attempt)
+        return subtasks
+
+# Concurrent identical story fetches and estimates share one in-flight call
+story_info_flight = SingleFlight()
+story_estimate_flight = SingleFlight()
+project_metadata_flight = SingleFlight()
+subtask_creation_flight = SingleFlight()
+
+# (jira_url, username, token hash) -> verification result, shared by the worker processes
+auth_cache = SharedTTLCache(Constants.SHARED_CACHE_DB, "auth",
+                            max_entries=Constants.AUTH_CACHE_MAX_ENTRIES,
+                            local_ttl=Constants.SHARED_CACHE_LOCAL_TTL)
 
 class JiraHandler:
 
@@ -21,174 +197,1244 @@ class JiraHandler:
         self.username = username
         self.api_token = api_token
         self.jira_url = jira_url
+        self.auth = httpx.BasicAuth(username, api_token)
 
-    def check_health(self):
+    async def _request(self, method, path, **kwargs):
+        """
+        Sends a request to Jira through the shared pooled client of this Jira URL.
+        Every call first takes a token from the tenant's rate limiter. 429 and 503
+        answers slow the limiter down, and idempotent requests are retried with
+        jittered exponential backoff or after the Retry-After delay.
 
-        response = requests.get(f'{self.jira_url}/rest/api/2/project', auth=HTTPBasicAuth(self.username, self.api_token)).json()
+        Args:
+            method (str): HTTP method.
+            path (str): API path relative to the Jira base URL.
 
-        if response:
+        Returns:
+            httpx.Response: The Jira response.
+        """
+        client = get_client(self.jira_url)
+        limiter = get_limiter(self.jira_url)
+        idempotent = method.upper() in ("GET", "HEAD", "OPTIONS")
+        max_retries = Constants.JIRA_MAX_RETRIES if idempotent else 0
 
-            LOGGER.info("Connected to JIRA")
-            project_list = []
-            for pr in response:
-                project_list.append(pr['name'])
+        for attempt in range(max_retries + 1):
+            await limiter.acquire()
 
-            LOGGER.info(f"Projects fetched: {project_list}")
-            return True
-        else:
-            LOGGER.error("Failed to connect to JIRA")
+            try:
+                response = await client.request(method, path, auth=self.auth, **kwargs)
+            except httpx.TransportError as e:
+                if attempt == max_retries:
+                    raise
+                delay = backoff_delay(attempt)
+                LOGGER.warning("JIRA request %s %s failed (%s), retrying in %.2fs", method, path, e, delay)
+                await asyncio.sleep(delay)
+                continue
+
+            if response.status_code not in (429, 503):
+                limiter.on_success()
+                return response
+
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            limiter.on_throttle(retry_after)
+
+            if attempt == max_retries:
+                return response
+
+            delay = retry_after if retry_after is not None else backoff_delay(attempt)
+            LOGGER.warning("JIRA answered %s to %s %s, retrying in %.2fs", response.status_code, method, path, delay)
+            await asyncio.sleep(delay)
+
+    def _auth_cache_key(self):
+        token_hash = hashlib.sha256(self.api_token.encode("utf-8")).hexdigest()
+        return (self.jira_url.strip().rstrip("/"), self.username, token_hash)
+
+    def credentials_hash(self):
+        """
+        Identifies the caller's Jira credentials without keeping the token.
+        """
+        return hashlib.sha256("\0".join(self._auth_cache_key()).encode("utf-8")).hexdigest()
+
+    @timed_stage("auth_check")
+    async def check_health(self):
+        """
+        Verifies the Jira credentials with the lightweight /myself probe.
+        Results are cached per (jira_url, username, token hash), so repeated
+        calls skip the network until the entry expires.
+
+        Returns:
+            bool: True when the credentials are valid.
+        """
+        cache_key = self._auth_cache_key()
+        cached = await asyncio.to_thread(auth_cache.get, cache_key)
+        CACHE_REQUESTS.inc(cache="auth", result="miss" if cached is None else "hit")
+        if cached is not None:
+            LOGGER.debug("JIRA credential check served from cache")
+            return cached
+
+        try:
+            response = await self._request("GET", "/rest/api/2/myself")
+            healthy = response.status_code == 200
+        except httpx.HTTPError as e:
+            LOGGER.error("Error connecting to JIRA: %s", e)
+            # Network errors say nothing about the credentials, do not cache them
             return False
 
-    def get_story_info(self, story_id):
+        if healthy:
+            LOGGER.info("Connected to JIRA")
+            await asyncio.to_thread(auth_cache.set, cache_key, True, Constants.AUTH_CACHE_TTL)
+        else:
+            LOGGER.error("Failed to connect to JIRA, Status code: %s", response.status_code)
+            # Only a client error is a verdict on the credentials, 429 and 5xx are transient
+            if 400 <= response.status_code < 500 and response.status_code != 429:
+                await asyncio.to_thread(auth_cache.set, cache_key, False, Constants.AUTH_CACHE_NEGATIVE_TTL)
+
+        return healthy
+
+    def _flight_key(self, *parts):
+        # Username is part of the key, users may not see the same issues
+        return (self.jira_url.strip().rstrip("/"), self.username) + parts
+
+    async def get_story_info(self, story_id, enrich=False):
         """
         Fetches the summary and description of a Jira story by its ID.
+        Only the fields used for estimation are requested from Jira, and
+        concurrent fetches of the same story share one request.
         
         Args:
             story_id (str): The ID of the Jira story.
+            enrich (bool): Also gather comments, linked issues and the parent
+                epic summary as extra prompt context. Comments are fetched
+                concurrently with the issue itself.
         
         Returns:
-            dict: A dictionary containing the story's description.
+            dict: A dictionary containing the story's description, and its
+            context when enriched.
         """
+        return await story_info_flight.do(self._flight_key(story_id.upper(), enrich),
+                                          lambda: self._fetch_story_info(story_id, enrich))
+
+    @timed_stage("issue_fetch")
+    async def _fetch_story_info(self, story_id, enrich):
+        fields = "summary,description"
+        if enrich:
+            fields += ",issuelinks,parent"
+
         try:
-            url = f'{self.jira_url}/rest/api/2/issue/{story_id}'
+            issue_request = self._request("GET", f"/rest/api/2/issue/{story_id}", params={"fields": fields})
 
-            response = requests.get(url, auth=HTTPBasicAuth(self.username, self.api_token))
+            if enrich:
+                response, comments = await asyncio.gather(issue_request, self._get_comments(story_id))
+            else:
+                response, comments = await issue_request, []
 
             if response.status_code == 200:
                 issue_data = response.json()
 
-                story_summary = issue_data['fields'].get('summary', '')
-                story_description = issue_data['fields'].get('description', '')
-
-                LOGGER.info(f"Fetched story info for {story_id}")
+                LOGGER.info("Fetched story info for %s", story_id)
 
-                return {
+                story_dict = {
                     "status": 200,
                     "story_id": story_id,
-                    "description": story_summary + story_description 
+                    "description": self._story_description(issue_data['fields'])
                 }
+                if enrich:
+                    story_dict["context"] = self._story_context(issue_data['fields'], comments)
+                return story_dict
             else:
-                LOGGER.error(f"Failed to fetch story info for {story_id}, Status code: {response.status_code}")
+                LOGGER.error("Failed to fetch story info for %s, Status code: %s", story_id, response.status_code)
                 return {
                     "status": 400,
                     "story_id": story_id
                 }
         
-        except requests.exceptions.RequestException as e:
-            LOGGER.error(f"Error fetching story info: {e}")
+        except (httpx.HTTPError, ValueError) as e:
+            LOGGER.error("Error fetching story info: %s", e)
             return {
                 "status" : 500,
                 "story_id": story_id
             }
+
+    async def _get_comments(self, story_id):
+        """
+        Fetches the most recent comment bodies of a story, empty on failure.
+        """
+        try:
+            response = await self._request("GET", f"/rest/api/2/issue/{story_id}/comment", params={
+                "maxResults": Constants.ENRICH_MAX_COMMENTS,
+                "orderBy": "-created",
+            })
+            if response.status_code != 200:
+                LOGGER.warning("Failed to fetch comments for %s, Status code: %s", story_id, response.status_code)
+                return []
+            return [comment.get("body") or "" for comment in response.json().get("comments", [])]
+        except (httpx.HTTPError, ValueError) as e:
+            LOGGER.warning("Error fetching comments for %s: %s", story_id, e)
+            return []
+
+    @staticmethod
+    def _story_context(fields, comments):
+        """
+        Builds the extra prompt context from the parent epic, linked issues and comments.
+        """
+        max_chars = Constants.ENRICH_MAX_COMMENT_CHARS
+        lines = []
+
+        parent = fields.get("parent") or {}
+        parent_summary = (parent.get("fields") or {}).get("summary")
+        if parent_summary:
+            lines.append(f"Parent epic: {parent_summary}")
+
+        links = []
+        for link in fields.get("issuelinks") or []:
+            if "outwardIssue" in link:
+                relation, linked = link.get("type", {}).get("outward", "relates to"), link["outwardIssue"]
+            else:
+                relation, linked = link.get("type", {}).get("inward", "relates to"), link.get("inwardIssue", {})
+            summary = (linked.get("fields") or {}).get("summary")
+            if summary:
+                links.append(f"- {relation} {linked.get('key', '')}: {summary}")
+        if links:
+            lines.append("Linked issues:")
+            lines.extend(links)
+
+        comments = [comment.strip()[:max_chars] for comment in comments if comment and comment.strip()]
+        if comments:
+            lines.append("Comments:")
+            lines.extend(f"- {comment}" for comment in comments)
+
+        return "\n".join(lines)
+
+    @staticmethod
+    def _story_query(story_dict):
+        """
+        Returns the text that replaces {STORY_QUERY}: the description plus any
+        enrichment context, compacted to the token budget when compaction is
+        enabled. The token counts before and after are kept on story_dict.
+        """
+        story_query = story_dict["description"]
+        if story_dict.get("context"):
+            story_query = f"{story_query}\n\nAdditional context:\n{story_dict['context']}"
+
+        if Constants.COMPACTION_ENABLED:
+            story_query, story_dict["compaction"] = compact_description(story_query)
+
+        return story_query
+
+    @staticmethod
+    def _story_description(fields):
+        story_summary = fields.get('summary') or ''
+        story_description = fields.get('description') or ''
+        return story_summary + story_description
+
+    async def search_stories(self, jql):
+        """
+        Fetches the summary and description of every story matching a JQL query.
+        The first page tells the total, the remaining pages are fetched concurrently.
+
+        Args:
+            jql (str): The JQL query.
+
+        Returns:
+            list: Story dictionaries in the same shape as get_story_info.
+
+        Raises:
+            httpx.HTTPError: When Jira rejects the query or cannot be reached.
+        """
+        async def fetch_page(start_at, page_size):
+            response = await self._request("GET", "/rest/api/2/search", params={
+                "jql": jql,
+                "fields": "summary,description",
+                "startAt": start_at,
+                "maxResults": page_size,
+                "validateQuery": "warn",
+            })
+            response.raise_for_status()
+            return response.json()
+
+        first_page = await fetch_page(0, Constants.JIRA_SEARCH_PAGE_SIZE)
+        issues = list(first_page.get("issues", []))
+
+        # Jira may cap the page size below the requested one, page by what it returned
+        page_size = first_page.get("maxResults") or len(issues)
+        total = min(first_page.get("total", len(issues)), Constants.BATCH_MAX_STORIES)
+
+        if page_size and len(issues) < total:
+            pages = await asyncio.gather(*(fetch_page(start_at, page_size)
+                                           for start_at in range(len(issues), total, page_size)))
+            for page in pages:
+                issues.extend(page.get("issues", []))
+
+        LOGGER.info("Fetched %d stories for JQL: %s", len(issues), jql)
+
+        return [
+            {
+                "status": 200,
+                "story_id": issue["key"],
+                "description": self._story_description(issue.get("fields", {}))
+            }
+            for issue in issues[:total]
+        ]
+
+    async def search_stories_by_id(self, story_ids):
+        """
+        Fetches the summary and description of the given stories through JQL search.
+
+        Args:
+            story_ids (list): The IDs of the Jira stories.
+
+        Returns:
+            list: Story dictionaries in the order of story_ids, stories Jira did
+            not return are marked with status 404.
+        """
+        chunk_size = Constants.JIRA_SEARCH_PAGE_SIZE
+        chunks = [story_ids[i:i + chunk_size] for i in range(0, len(story_ids), chunk_size)]
+
+        results = await asyncio.gather(*(
+            self.search_stories("key in ({0})".format(",".join(f'"{story_id}"' for story_id in chunk)))
+            for chunk in chunks
+        ))
+
+        found = {story["story_id"].upper(): story for chunk in results for story in chunk}
+
+        return [
+            {**found[story_id.upper()], "story_id": story_id} if story_id.upper() in found
+            else {"status": 404, "story_id": story_id, "message": f"Story {story_id} not found"}
+            for story_id in story_ids
+        ]
+
+    async def _lookup_estimate(self, story_dict, prompt_template, refresh=False):
+        """
+        Renders the prompt of a story and serves its estimate from the cache
+        or from a near duplicate past story when possible.
+
+        Returns:
+            tuple: (story_query, prompt, cache_key, examples, served), examples
+            are the similar past stories to show the LLM when not served.
+        """
+        with stage("prompt_render"):
+            story_query = self._story_query(story_dict)
+            prompt = render_prompt(prompt_template, story_query)
+        LOGGER.debug("Prompt text : %s", prompt)
+
+        cache_key = estimate_cache.make_key(llm_pool.model, prompt)
+
+        if refresh:
+            estimate_cache.record_bypass()
+            estimate = None
+        else:
+            estimate = await asyncio.to_thread(estimate_cache.get, cache_key)
+
+        if estimate is not None:
+            try:
+                with stage("parse"):
+                    story_dict["subtasks"], _ = parse_estimate(estimate)
+                LOGGER.info("Estimate for %s served from cache", story_dict["story_id"])
+                return story_query, prompt, cache_key, [], True
+            except EstimateParseError as e:
+                # Entries cached before validation was stricter, estimate the story again
+                LOGGER.warning("Dropped cached estimate for %s: %s", story_dict["story_id"], e)
+                await asyncio.to_thread(estimate_cache.delete, cache_key)
+
+        neighbours = []
+        if Constants.SIMILARITY_ENABLED:
+            with stage("similarity_lookup"):
+                neighbours = await asyncio.to_thread(similarity_index.query, self.jira_url,
+                                                     story_dict["description"], Constants.SIMILARITY_FEW_SHOT_K,
+                                                     exclude_story_id=story_dict["story_id"],
+                                                     variant=self._estimate_variant(prompt_template))
+
+        if neighbours and not refresh and neighbours[0]["similarity"] >= Constants.SIMILARITY_REUSE_THRESHOLD:
+            nearest = neighbours[0]
+            LOGGER.info("Estimate for %s reused from similar story %s", story_dict["story_id"], nearest["story_id"])
+            similarity_index.record("reused")
+            story_dict["subtasks"] = nearest["subtasks"]
+            story_dict["similar_story"] = {"story_id": nearest["story_id"],
+                                           "similarity": round(nearest["similarity"], 3)}
+            return story_query, prompt, cache_key, [], True
+
+        examples = [n for n in neighbours if n["similarity"] >= Constants.SIMILARITY_FEW_SHOT_MIN]
+        return story_query, prompt, cache_key, examples, False
+
+    async def _store_estimate(self, story_dict, cache_key, prompt_template):
+        # Only estimates that parsed are worth serving again. The writes can wait on
+        # other workers, they run off the event loop and a failed one does not fail
+        # the estimate that was already paid for.
+        try:
+            await asyncio.to_thread(estimate_cache.set, cache_key, json.dumps(story_dict["subtasks"]))
+        except sqlite3.Error as e:
+            LOGGER.warning("Could not cache the estimate of %s: %s", story_dict["story_id"], e)
+        if Constants.SIMILARITY_ENABLED:
+            try:
+                await asyncio.to_thread(similarity_index.add, self.jira_url, story_dict["story_id"],
+                                        story_dict["description"], story_dict["subtasks"],
+                                        variant=self._estimate_variant(prompt_template))
+            except sqlite3.Error as e:
+                LOGGER.warning("Could not add %s to the similarity index: %s", story_dict["story_id"], e)
+
+    @staticmethod
+    def _estimate_variant(prompt_template):
+        # Estimates are only reused or shown as examples for the same template and model
+        content = "\0".join((llm_pool.model, prompt_template.text))
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()[:16]
+
+    async def _estimate_story(self, story_dict, prompt_template, refresh=False):
+        """
+        Renders the prompt for a fetched story and asks the LLM for its subtasks.
+        Responses are cached by (model, prompt), refresh forces a fresh LLM call.
+        A near duplicate of a past story reuses its estimate, otherwise the
+        closest past stories are added to the prompt as examples.
+
+        Args:
+            story_dict (dict): Story dictionary returned by get_story_info.
+            prompt_template (CompiledTemplate): The resolved prompt template.
+            refresh (bool): Skip the estimate cache lookup and the similarity reuse.
+
+        Returns:
+            dict: The story dictionary with its subtasks.
+        """
+        story_dict["usage"] = empty_usage()
+        try:
+            _, prompt, cache_key, examples, served = await self._lookup_estimate(story_dict, prompt_template, refresh)
+        except Exception as e:
+            LOGGER.error("Error generating estimate: %s", e)
+            story_dict["status"] = 500
+            return story_dict
+        if served:
+            return story_dict
+        return await self._generate_estimate(story_dict, prompt_template, prompt, cache_key, examples)
+
+    async def _generate_estimate(self, story_dict, prompt_template, prompt, cache_key, examples):
+        """
+        Asks the LLM for the subtasks of a story that the cache and the
+        similarity index could not serve, and stores the estimate.
+
+        Args:
+            story_dict (dict): Story dictionary returned by get_story_info.
+            prompt_template (CompiledTemplate): The resolved prompt template.
+            prompt (str): The rendered prompt from _lookup_estimate.
+            cache_key (str): The estimate cache key of the prompt.
+            examples (list): Similar past stories to add to the prompt.
+
+        Returns:
+            dict: The story dictionary with its subtasks.
+        """
+        story_dict["usage"] = empty_usage()
+        try:
+            try:
+                usage_ledger.check(self.tenant())
+            except TenantBudgetExceeded as e:
+                return self._over_budget(story_dict, examples, str(e))
+
+            if examples:
+                similarity_index.record("few_shot")
+                prompt += few_shot_examples(examples)
+
+            recorder = UsageRecorder(self.tenant(), story_dict["story_id"], parent=current_usage.get())
+            token = current_usage.set(recorder)
+            try:
+                story_dict["subtasks"] = await generate_subtasks(prompt)
+            finally:
+                current_usage.reset(token)
+                story_dict["usage"] = recorder.summary()
+
+            await self._store_estimate(story_dict, cache_key, prompt_template)
+            return story_dict
         
-    def get_story_estimate(self, story_id, prompt_template):
-        
-        LOGGER.debug(f"Prompt template received : {prompt_template}")
+        except Exception as e:
+            LOGGER.error("Error generating estimate: %s", e)
+            story_dict["status"] = 500
+            return story_dict
 
-        if prompt_template is None:
-            LOGGER.debug("Utilizing the default Prompt template")
-            prompt_template = prompt_template_default
+    def tenant(self):
+        """
+        Returns the (jira_url, username) key LLM usage is accounted under.
+        """
+        return (self.jira_url.strip().rstrip("/"), self.username or "")
 
-        if "{STORY_QUERY}" not in prompt_template:
-            LOGGER.error("Incorrect prompt template sent, {STORY_QUERY} keyword not found in prompt template")
-            story_dict["status"] = 400
-            story_dict["message"] = "Incorrect prompt template sent, {STORY_QUERY} keyword not found in prompt template"
+    @staticmethod
+    def _over_budget(story_dict, examples, reason):
+        """
+        Answers an estimate the tenant may not spend an LLM call on: with the
+        estimate of the most similar past story when there is one, else with 429.
+        """
+        if examples:
+            nearest = examples[0]
+            LOGGER.info("%s, estimate for %s degraded to similar story %s",
+                        reason, story_dict["story_id"], nearest["story_id"])
+            story_dict["subtasks"] = nearest["subtasks"]
+            story_dict["similar_story"] = {"story_id": nearest["story_id"],
+                                           "similarity": round(nearest["similarity"], 3)}
+            story_dict["message"] = f"{reason}, estimate reused from similar story {nearest['story_id']}"
             return story_dict
+
+        LOGGER.warning("%s, estimate for %s rejected", reason, story_dict["story_id"])
+        story_dict["status"] = 429
+        story_dict["message"] = reason
+        return story_dict
+
+    async def _estimate_packed(self, group, prompt_template):
+        """
+        Estimates several stories with one LLM request. The stories are put
+        in the template one after the other, each under its ID, and the model
+        answers with subtasks keyed by story ID.
+
+        Args:
+            group (list): (story_dict, story_query, cache_key) tuples.
+            prompt_template (CompiledTemplate): The resolved prompt template.
+
+        Returns:
+            list: The story dictionaries that did not get a valid estimate.
+        """
+        story_query = "\n\n".join(f"Story ID: {story_dict['story_id']}\n{query}" for story_dict, query, _ in group)
+        with stage("prompt_render"):
+            prompt = prompt_template.render(story_query) + PACKED_OUTPUT_INSTRUCTION
+        kwargs = {"response_format": {"type": "json_object"}} if output_mode_kwargs() else {}
+
+        try:
+            usage_ledger.check(self.tenant())
+        except TenantBudgetExceeded:
+            # Each story then gets the single-story budget handling
+            return [story_dict for story_dict, _, _ in group]
+
+        recorder = UsageRecorder(self.tenant(), parent=current_usage.get())
+        token = current_usage.set(recorder)
+        try:
+            story_ids = [story_dict["story_id"] for story_dict, _, _ in group]
+
+            def validate(text):
+                if not parse_packed_estimate(text, story_ids):
+                    raise EstimateParseError("The answer estimates none of the packed stories")
+
+            response = await send_prompt(prompt, validator=validate, **kwargs)
+            with stage("parse"):
+                estimates = parse_packed_estimate(response, story_ids)
+        except Exception as e:
+            LOGGER.warning("Packed estimate of %d stories failed: %s", len(group), e)
+            estimates = {}
+        finally:
+            current_usage.reset(token)
+
+        # The call is paid by the stories it answered, the others are estimated on their own
+        answered = sum(1 for story_dict, _, _ in group if estimates.get(story_dict["story_id"].upper()))
+        leftovers = []
+        for story_dict, _, cache_key in group:
+            subtasks = estimates.get(story_dict["story_id"].upper())
+            if subtasks:
+                story_dict["subtasks"] = subtasks
+                story_dict["usage"] = recorder.summary(share=answered)
+                await self._store_estimate(story_dict, cache_key, prompt_template)
+            else:
+                leftovers.append(story_dict)
+        return leftovers
+
+    @staticmethod
+    def _resolve_prompt_template(prompt_template, template_name=None):
+        """
+        Returns the compiled template of a request: the custom text when given,
+        else the named registry template, else the default one.
+
+        Raises:
+            PromptTemplateError: For unknown names or templates without {STORY_QUERY}.
+        """
+        LOGGER.debug("Prompt template received : %s", prompt_template)
+
+        if prompt_template is None and template_name is None:
+            LOGGER.debug("Utilizing the default Prompt template")
+
+        try:
+            return prompt_registry.resolve(prompt_template, template_name)
+        except PromptTemplateError as e:
+            LOGGER.error(str(e))
+            raise
+
+    async def get_story_estimate(self, story_id, prompt_template, refresh=False, enrich=False,
+                                 template_name=None):
+
+        try:
+            prompt_template = self._resolve_prompt_template(prompt_template, template_name)
+        except PromptTemplateError as e:
+            return {
+                "status": 400,
+                "story_id": story_id,
+                "message": str(e)
+            }
+
+        await llm_pool.start()
+        # Identical concurrent requests (story, template, model, options) share one estimate
+        template_hash = hashlib.sha256(prompt_template.text.encode("utf-8")).hexdigest()
+        key = self._flight_key(story_id.upper(), template_hash, llm_pool.model, refresh, enrich)
+
+        return await story_estimate_flight.do(
+            key, lambda: self._get_story_estimate(story_id, prompt_template, refresh, enrich))
+
+    async def _get_story_estimate(self, story_id, prompt_template, refresh, enrich):
                     
-        story_dict = self.get_story_info(story_id)
+        story_dict = await self.get_story_info(story_id, enrich)
+
+        if story_dict["status"] != 200:
+            return story_dict
+
+        if not refresh and not enrich:
+            stored = await asyncio.to_thread(auto_estimator.get, self.jira_url, story_id)
+            if stored is not None and stored[0] == self._content_hash(prompt_template, story_dict["description"]):
+                LOGGER.info("Estimate for %s served from the webhook precomputed estimates", story_id)
+                return {**stored[1], "story_id": story_id, "precomputed": True, "usage": empty_usage()}
+
+        return await self._estimate_story(story_dict, prompt_template, refresh)
+
+    @staticmethod
+    def _content_hash(prompt_template, description):
+        """
+        Identifies what an estimate depends on: model, template and story text.
+        """
+        content = "\0".join((llm_pool.model, prompt_template.text, description))
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+    async def auto_estimate(self, story_id, fields):
+        """
+        Estimates a story from the fields of a Jira webhook event with the
+        default template and stores the result. Nothing is sent to the LLM
+        when the summary and description did not change since the last one.
+
+        Args:
+            story_id (str): The ID of the Jira story.
+            fields (dict): Issue fields from the webhook payload.
+
+        Returns:
+            str: "estimated", "unchanged" or "failed".
+        """
+        await llm_pool.start()
+        prompt_template = self._resolve_prompt_template(None)
+        story_dict = {"status": 200, "story_id": story_id, "description": self._story_description(fields)}
+        content_hash = self._content_hash(prompt_template, story_dict["description"])
+
+        stored = await asyncio.to_thread(auto_estimator.get, self.jira_url, story_id)
+        if stored is not None and stored[0] == content_hash:
+            LOGGER.info("Story %s unchanged, keeping its stored estimate", story_id)
+            return "unchanged"
 
-        if story_dict["status"] == 200:
+        result = await self._estimate_story(story_dict, prompt_template)
+        if result["status"] != 200:
+            return "failed"
 
-            prompt = prompt_template.replace("{STORY_QUERY}", story_dict["description"])
-            LOGGER.debug(f"Prompt text : {prompt}")
+        await asyncio.to_thread(auto_estimator.set, self.jira_url, story_id, content_hash, result)
+        LOGGER.info("Stored webhook estimate for %s", story_id)
+        return "estimated"
+
+    async def stream_story_estimate(self, story_id, prompt_template, refresh=False, enrich=False,
+                                    template_name=None):
+        """
+        Estimates a story, yielding each subtask as soon as the LLM has
+        finished generating it.
+
+        Args:
+            story_id (str): The ID of the Jira story.
+            prompt_template (str): Optional custom prompt template.
+            refresh (bool): Skip the estimate cache lookup and the similarity reuse.
+            enrich (bool): Add comments, linked issues and the parent epic to the prompt.
+            template_name (str): Registry template used when no custom template is given.
 
+        Yields:
+            dict: A "story" event, then one "subtask" event per subtask and
+            a final "done" event, or an "error" event.
+        """
+        try:
+            prompt_template = self._resolve_prompt_template(prompt_template, template_name)
+        except PromptTemplateError as e:
+            yield {"type": "error", "status": 400, "story_id": story_id, "message": str(e)}
+            return
+
+        await llm_pool.start()
+        story_dict = await self.get_story_info(story_id, enrich)
+
+        if story_dict["status"] != 200:
+            yield {"type": "error", "message": "Failed to fetch story from JIRA", **story_dict}
+            return
+
+        yield {"type": "story", **story_dict}
+
+        # Same prompt, cache key and similarity reuse as POST /story_id
+        _, prompt, cache_key, examples, served = await self._lookup_estimate(story_dict, prompt_template, refresh)
+
+        usage = empty_usage()
+        if not served:
             try:
+                usage_ledger.check(self.tenant())
+            except TenantBudgetExceeded as e:
+                story_dict = self._over_budget(story_dict, examples, str(e))
+                if story_dict["status"] != 200:
+                    yield {"type": "error", "status": story_dict["status"], "story_id": story_id,
+                           "message": story_dict["message"]}
+                    return
+                served = True
+
+        if not served:
+            if examples:
+                similarity_index.record("few_shot")
+                prompt += few_shot_examples(examples)
+            # Not reset, a generator may be resumed in another context and the
+            # variable dies with the request anyway
+            recorder = UsageRecorder(self.tenant(), story_id)
+            current_usage.set(recorder)
 
-                estimate = ol.send_prompt(prompt)
-                story_dict["subtasks"] = eval(estimate)
+        parser = SubtaskStreamParser()
+        subtasks = []
+
+        try:
+            if served:
+                for subtask in story_dict["subtasks"]:
+                    subtasks.append(subtask)
+                    yield {"type": "subtask", **subtask}
+            else:
+                async for chunk in llm_stream_chunks(prompt, **output_mode_kwargs()):
+                    for subtask in parser.feed(chunk):
+                        subtasks.append(subtask)
+                        yield {"type": "subtask", **subtask}
+
+                # Stored like the non-streaming estimates, so POST /story_id can serve it as well
+                if parser.done and subtasks and not parser.invalid:
+                    story_dict["subtasks"] = subtasks
+                    await self._store_estimate(story_dict, cache_key, prompt_template)
+                usage = recorder.summary()
+
+        except Exception as e:
+            LOGGER.error("Error streaming estimate: %s", e)
+            yield {"type": "error", "status": 500, "story_id": story_id,
+                   "message": "Error generating estimate"}
+            return
+
+        if not served and (not parser.done or not subtasks):
+            LOGGER.error("Streamed estimate for %s contained no subtask list", story_id)
+            yield {"type": "error", "status": 500, "story_id": story_id,
+                   "message": "Error generating estimate", "usage": usage}
+            return
+
+        done = {"type": "done", "status": 200, "story_id": story_id,
+                "description": story_dict["description"], "subtasks": subtasks, "usage": usage}
+        for field in ("similar_story", "message"):
+            if field in story_dict:
+                done[field] = story_dict[field]
+        yield done
+
+    async def get_batch_estimate(self, jql=None, story_ids=None, prompt_template=None, concurrency=None,
+                                 refresh=False, template_name=None, pack=None):
+        """
+        Estimates many stories at once. Descriptions are fetched with paginated
+        searches and the LLM calls run with bounded concurrency.
+
+        Args:
+            jql (str): JQL query selecting the stories.
+            story_ids (list): Explicit story IDs, used when no JQL is given.
+            prompt_template (str): Optional custom prompt template.
+            concurrency (int): Maximum number of LLM calls in flight.
+            refresh (bool): Skip the estimate cache lookup.
+            template_name (str): Registry template used when no custom template is given.
+            pack (bool): Estimate several stories per LLM request, BATCH_PACKING_ENABLED when None.
+
+        Returns:
+            dict: Overall status and one story estimate per story.
+        """
+        try:
+            prompt_template = self._resolve_prompt_template(prompt_template, template_name)
+        except PromptTemplateError as e:
+            return {"status": 400, "message": str(e)}
+
+        await llm_pool.start()
+        try:
+            if jql:
+                stories = await self.search_stories(jql)
+            else:
+                stories = await self.search_stories_by_id(story_ids[:Constants.BATCH_MAX_STORIES])
+        except httpx.HTTPError as e:
+            LOGGER.error("Error searching stories for batch estimate: %s", e)
+            return {"status": 400, "message": "Failed to fetch stories from JIRA"}
+
+        concurrency = min(concurrency or Constants.BATCH_CONCURRENCY,
+                          Constants.BATCH_MAX_CONCURRENCY)
+        semaphore = asyncio.Semaphore(max(concurrency, 1))
+
+        async def estimate(story_dict):
+            if story_dict["status"] != 200:
                 return story_dict
-            
+            async with semaphore:
+                return await self._estimate_story(story_dict, prompt_template, refresh)
+
+        packing = None
+        if pack is None:
+            pack = Constants.BATCH_PACKING_ENABLED
+
+        # Story recorders add to this one, packed calls are counted once
+        usage = UsageRecorder(self.tenant())
+        token = current_usage.set(usage)
+        try:
+            if pack:
+                packing = await self._estimate_batch_packed(stories, prompt_template, refresh, semaphore)
+                estimates = stories
+            else:
+                estimates = await asyncio.gather(*(estimate(story_dict) for story_dict in stories))
+        finally:
+            current_usage.reset(token)
+
+        LOGGER.info("Batch estimated %d stories with concurrency %d", len(estimates), concurrency)
+
+        result = {"status": 200,
+                  "message": f"Estimated {sum(1 for e in estimates if e['status'] == 200)} of {len(estimates)} stories",
+                  "estimates": estimates,
+                  "usage": usage.summary()}
+        if packing is not None:
+            result["packing"] = packing
+        return result
+
+    async def _estimate_batch_packed(self, stories, prompt_template, refresh, semaphore):
+        """
+        Estimates the stories of a batch in packed LLM requests. Stories served
+        by the cache or a near duplicate are left out, the others are grouped
+        up to PACK_TOKEN_BUDGET prompt tokens. Stories missing from a packed
+        answer, and stories too long to share a request, get a single-story call.
+        The story dictionaries are updated in place.
+
+        Returns:
+            dict: Number of packed requests, stories answered by them and fallbacks.
+        """
+        pending = []
+        # Prompt and examples of each pending story, reused by its single-story call
+        lookups = {}
+        for story_dict in stories:
+            if story_dict["status"] != 200:
+                continue
+            story_dict["usage"] = empty_usage()
+            try:
+                story_query, prompt, cache_key, examples, served = await self._lookup_estimate(
+                    story_dict, prompt_template, refresh)
             except Exception as e:
-                LOGGER.error(f"Error generating estimate: {e}")
+                LOGGER.warning("Estimate lookup for %s failed: %s", story_dict["story_id"], e)
                 story_dict["status"] = 500
-                return story_dict
+                continue
+            if not served:
+                pending.append((story_dict, story_query, cache_key))
+                lookups[id(story_dict)] = (prompt, cache_key, examples)
+
+        groups = pack_stories(pending, prompt_template.fixed_tokens + count_tokens(PACKED_OUTPUT_INSTRUCTION),
+                              Constants.PACK_TOKEN_BUDGET, Constants.PACK_MAX_STORIES)
+        packed_groups = [group for group in groups if len(group) > 1]
+        singles = [group[0][0] for group in groups if len(group) == 1]
+
+        async def run_packed(group):
+            async with semaphore:
+                return await self._estimate_packed(group, prompt_template)
+
+        async def run_single(story_dict):
+            async with semaphore:
+                return await self._generate_estimate(story_dict, prompt_template, *lookups[id(story_dict)])
+
+        leftovers = await asyncio.gather(*(run_packed(group) for group in packed_groups))
+        fallbacks = [story_dict for group in leftovers for story_dict in group]
+        await asyncio.gather(*(run_single(story_dict) for story_dict in singles + fallbacks))
+
+        packed_stories = sum(len(group) for group in packed_groups) - len(fallbacks)
+        LOGGER.info("Packed %d stories into %d requests, %d single-story calls",
+                    packed_stories, len(packed_groups), len(singles) + len(fallbacks))
+        return {"packed_requests": len(packed_groups), "packed_stories": packed_stories,
+                "single_requests": len(singles), "fallbacks": len(fallbacks)}
+
+    def _metadata_cache_key(self, project_key):
+        return (self.jira_url.strip().rstrip("/"), project_key)
+
+    async def get_project_metadata(self, project_key):
+        """
+        Returns the subtask issue type, required create fields and time
+        tracking availability of a project. Results are cached per Jira URL
+        and project for PROJECT_METADATA_TTL seconds and refreshed lazily.
+
+        Args:
+            project_key (str): The Jira project key.
 
-    def create_subtask(self, story_id, subtask_summary, subtask_estimate):
+        Returns:
+            ProjectMetadata: The project metadata, empty when Jira could not be read.
+        """
+        cache_key = self._metadata_cache_key(project_key)
+        metadata = project_metadata_cache.get(cache_key)
+        if metadata is not None:
+            CACHE_REQUESTS.inc(cache="project_metadata", result="hit")
+            return metadata
+
+        CACHE_REQUESTS.inc(cache="project_metadata", result="miss")
+        return await project_metadata_flight.do(cache_key, lambda: self._fetch_project_metadata(project_key))
+
+    async def _fetch_project_metadata(self, project_key):
+        try:
+            # Paginated createmeta first, then the legacy expanded createmeta of older Jira servers,
+            # then the global issue type list when create metadata is not readable at all
+            for fetch in (self._fetch_createmeta, self._fetch_legacy_createmeta, self._fetch_issue_types):
+                metadata = await fetch(project_key)
+                if metadata is not None:
+                    break
+        except (httpx.HTTPError, ValueError) as e:
+            LOGGER.error("Error fetching create metadata of project %s: %s", project_key, e)
+            return ProjectMetadata(project_key)
+
+        if metadata is None:
+            LOGGER.warning("No create metadata available for project %s", project_key)
+            metadata = ProjectMetadata(project_key)
+            project_metadata_cache.set(self._metadata_cache_key(project_key), metadata,
+                                       Constants.PROJECT_METADATA_NEGATIVE_TTL)
+            return metadata
+
+        if metadata.missing_required_fields:
+            LOGGER.warning("Subtasks of project %s require fields that are not filled in: %s",
+                           project_key, ", ".join(metadata.missing_required_fields))
+
+        project_metadata_cache.set(self._metadata_cache_key(project_key), metadata,
+                                   Constants.PROJECT_METADATA_TTL)
+        LOGGER.info("Loaded create metadata of project %s", project_key)
+        return metadata
+
+    async def _fetch_createmeta(self, project_key):
+        path = f"/rest/api/2/issue/createmeta/{project_key}/issuetypes"
+        response = await self._request("GET", path, params={"maxResults": 100})
+        if response.status_code != 200:
+            return None
+
+        body = response.json()
+        subtask_type = pick_subtask_type(body.get("issueTypes", body.get("values", [])))
+        if subtask_type is None:
+            return ProjectMetadata(project_key)
+
+        response = await self._request("GET", f"{path}/{subtask_type['id']}", params={"maxResults": 200})
+        if response.status_code != 200:
+            return ProjectMetadata(project_key, subtask_type)
+
+        body = response.json()
+        return ProjectMetadata(project_key, subtask_type, fields_by_id(body.get("fields", body.get("values"))))
+
+    async def _fetch_legacy_createmeta(self, project_key):
+        params = {"projectKeys": project_key, "expand": "projects.issuetypes.fields"}
+        response = await self._request("GET", "/rest/api/2/issue/createmeta", params=params)
+        if response.status_code != 200:
+            return None
+
+        projects = response.json().get("projects", [])
+        if not projects:
+            return None
+
+        subtask_type = pick_subtask_type(projects[0].get("issuetypes", []))
+        fields = fields_by_id(subtask_type.get("fields")) if subtask_type else None
+        return ProjectMetadata(project_key, subtask_type, fields)
+
+    async def _fetch_issue_types(self, project_key):
+        response = await self._request("GET", "/rest/api/2/issuetype")
+        if response.status_code != 200:
+            return None
+        return ProjectMetadata(project_key, pick_subtask_type(response.json()))
+
+    @staticmethod
+    def _original_estimate(subtask_estimate):
+        # The prompt asks for estimates in days
+        try:
+            days = float(subtask_estimate)
+        except (TypeError, ValueError):
+            return None
+        return f"{days:g}d" if days > 0 else None
+
+    def _subtask_fields(self, story_id, subtask_summary, subtask_estimate, metadata):
+        """
+        Builds the Jira fields of a subtask under the given story ID, using the
+        subtask type of the project and its original estimate when time
+        tracking is on the create screen.
+        """
+        fields = {
+            "project": {
+                "key": metadata.project_key
+            },
+            "parent": {
+                "key": story_id
+            },
+            "summary": subtask_summary,
+            "description": "Don't forget to do this too.",
+            "issuetype": metadata.issuetype(),
+        }
+
+        original_estimate = self._original_estimate(subtask_estimate)
+        if metadata.timetracking and original_estimate:
+            fields["timetracking"] = {
+                "originalEstimate": original_estimate
+            }
+        return fields
+
+    async def create_subtask(self, story_id, subtask_summary, subtask_estimate, metadata=None):
         """
         Creates a subtask in Jira under the given story ID.
         
         Args:
             story_id (str): The ID of the parent story.
             subtask_summary (str): Summary of the subtask.
-            subtask_estimate (int): Estimate (in minutes) for the subtask.
+            subtask_estimate (int): Estimate (in days) for the subtask.
+            metadata (ProjectMetadata): Create metadata of the project, looked up when not given.
         
         Returns:
-            dict: A dictionary containing the subtask creation status.
+            dict: A dictionary containing the subtask creation status and the created key.
         """
-        url = f"{self.jira_url}/rest/api/2/issue/"
-        headers = {
-            "Content-Type": "application/json"
+        if metadata is None:
+            metadata = await self.get_project_metadata(project_key_of(story_id))
+
+        # Payload for creating a subtask
+        payload = {
+            "fields": self._subtask_fields(story_id, subtask_summary, subtask_estimate, metadata)
         }
 
+        try:
+            response = await self._request("POST", "/rest/api/2/issue/", json=payload)
 
+            if response.status_code == 201:
+                LOGGER.info("Subtask '%s' created successfully under story %s", subtask_summary, story_id)
+                return {"status": 201, "key": response.json().get("key"),
+                        "message": "Subtask created successfully"}
+            else:
+                LOGGER.error("Failed to create subtask '%s', Status code: %s", subtask_summary, response.status_code)
+                return {"status": response.status_code, "key": None, "message": "Failed to create subtask"}
 
-        # Payload for creating a subtask
+        except (httpx.HTTPError, ValueError) as e:
+            LOGGER.error("Error creating subtask '%s': %s", subtask_summary, e)
+            return {"status": 500, "key": None, "message": "An error occurred during subtask creation"}
+
+    async def _bulk_create_subtasks(self, story_id, subtasks, metadata):
+        """
+        Creates a chunk of subtasks with a single call to Jira's bulk endpoint.
+
+        Args:
+            story_id (str): The ID of the parent story.
+            subtasks (list): (summary, estimate) tuples, at most the bulk limit.
+            metadata (ProjectMetadata): Create metadata of the project.
+
+        Returns:
+            list | None: One creation status per subtask, in order, or None when
+            the bulk endpoint is not available on this Jira instance.
+        """
         payload = {
-            "fields": {
-                "project": {
-                    "key": story_id.split("-")[0]  # Replace with your Jira project key
-                },
-                "parent": {
-                    "key": story_id
-                },
-                "summary": subtask_summary,
-                "description": "Don't forget to do this too.",
-                "issuetype": {
-                    "id": "10325"
-                },
-                # "timetracking": {
-                #     "originalEstimate": f"{subtask_estimate}m"  # Estimate in minutes
-                # }
-            }
+            "issueUpdates": [
+                {"fields": self._subtask_fields(story_id, summary, estimate, metadata)}
+                for summary, estimate in subtasks
+            ]
         }
 
         try:
-            response = requests.post(url, headers=headers, data=json.dumps(payload), auth=HTTPBasicAuth(self.username, self.api_token))
+            response = await self._request("POST", "/rest/api/2/issue/bulk", json=payload)
+        except httpx.HTTPError as e:
+            LOGGER.error("Error bulk creating subtasks for story %s: %s", story_id, e)
+            return [{"status": 500, "key": None, "message": "An error occurred during subtask creation"}
+                    for _ in subtasks]
 
-            if response.status_code == 201:
-                LOGGER.info(f"Subtask '{subtask_summary}' created successfully under story {story_id}")
-                return {"status": 201, "message": "Subtask created successfully"}
+        if response.status_code in (404, 405):
+            LOGGER.info("Bulk issue creation not available, falling back to individual creates")
+            return None
+
+        try:
+            body = response.json()
+        except ValueError:
+            body = {}
+
+        created = list(body.get("issues", []))
+        errors = {error.get("failedElementNumber"): error for error in body.get("errors", [])}
+
+        if response.status_code not in (200, 201) and not errors:
+            LOGGER.error("Failed to bulk create subtasks for story %s, Status code: %s", story_id, response.status_code)
+            return [{"status": response.status_code, "key": None, "message": "Failed to create subtask"}
+                    for _ in subtasks]
+
+        # Jira lists created issues in request order, skipping the failed elements
+        results = []
+        for idx, (summary, _) in enumerate(subtasks):
+            if idx in errors or not created:
+                error = errors.get(idx, {})
+                LOGGER.error("Failed to create subtask '%s': %s", summary, error.get('elementErrors'))
+                results.append({"status": error.get("status", 400), "key": None,
+                                "message": "Failed to create subtask"})
             else:
-                LOGGER.error(f"Failed to create subtask '{subtask_summary}', Status code: {response.status_code}")
-                return {"status": response.status_code, "message": "Failed to create subtask"}
+                results.append({"status": 201, "key": created.pop(0).get("key"),
+                                "message": "Subtask created successfully"})
+        return results
 
-        except requests.exceptions.RequestException as e:
-            LOGGER.error(f"Error creating subtask '{subtask_summary}': {e}")
-            return {"status": 500, "message": "An error occurred during subtask creation"}
+    @staticmethod
+    def _normalize_summary(summary):
+        return " ".join(str(summary).split()).casefold().rstrip(".")
 
-    def create_tasks_from_estimate(self, story_estimate_dict):
+    async def _existing_subtasks(self, story_id):
         """
-        Creates subtasks based on the AI-generated estimate and assigns them in Jira.
-        
+        Reads the subtasks already under a story with a single request.
+
+        Returns:
+            dict | None: Normalized summary -> subtask key, or None when the
+            story could not be read.
+        """
+        try:
+            response = await self._request("GET", f"/rest/api/2/issue/{story_id}", params={"fields": "subtasks"})
+            if response.status_code != 200:
+                LOGGER.warning("Could not read existing subtasks of story %s, Status code: %s", story_id, response.status_code)
+                return None
+            existing = response.json().get("fields", {}).get("subtasks") or []
+        except (httpx.HTTPError, ValueError) as e:
+            LOGGER.warning("Could not read existing subtasks of story %s: %s", story_id, e)
+            return None
+
+        return {self._normalize_summary(subtask.get("fields", {}).get("summary", "")): subtask.get("key")
+                for subtask in existing}
+
+    async def create_tasks_from_estimate(self, story_estimate_dict, idempotency_key=None):
+        """
+        Creates the missing subtasks of an estimate in Jira. With an
+        idempotency key the result is stored, and a retried request with the
+        same key and body gets the stored result back without calling Jira.
+
         Args:
-            story_id (str): The ID of the Jira story.
+            story_estimate_dict (dict): The story estimate with its subtasks.
+            idempotency_key (str): Optional client supplied key of the request.
+
+        Returns:
+            dict: Overall status and one creation result per subtask.
+        """
+        if not idempotency_key:
+            return await self._create_tasks_from_estimate(story_estimate_dict)
+
+        key = idempotency_store.make_key(self._auth_cache_key(), idempotency_key)
+        fingerprint = idempotency_store.fingerprint({"story_id": story_estimate_dict.get("story_id"),
+                                                     "subtasks": story_estimate_dict.get("subtasks")})
+
+        stored = await asyncio.to_thread(idempotency_store.get, key)
+        if stored is not None:
+            stored_fingerprint, result = stored
+            if stored_fingerprint != fingerprint:
+                return {"status": 422,
+                        "message": "Idempotency key was already used for a different request"}
+            LOGGER.info("Replaying stored subtask creation result for story %s", story_estimate_dict.get("story_id"))
+            return {**result, "replayed": True}
+
+        async def create_and_store():
+            result = await self._create_tasks_from_estimate(story_estimate_dict)
+            # Failed attempts are not stored so that a retry can still succeed
+            if result["status"] < 500:
+                try:
+                    await asyncio.to_thread(idempotency_store.set, key, fingerprint, result)
+                except sqlite3.Error as e:
+                    LOGGER.warning("Could not store the subtask creation result for replay: %s", e)
+            return result
+
+        # Concurrent retries of the same request wait for the first one
+        return await subtask_creation_flight.do((key, fingerprint), create_and_store)
+
+    @timed_stage("subtask_creation")
+    async def _create_tasks_from_estimate(self, story_estimate_dict):
+        """
+        Creates subtasks based on the AI-generated estimate and assigns them in Jira.
+        Subtasks whose normalized summary already exists under the story are
+        skipped. The rest are sent in chunks to the bulk endpoint, falling back
+        to concurrent individual creates when bulk creation is not available.
         """
 
         story_estimate = story_estimate_dict
         story_id = story_estimate["story_id"]
 
-        if story_estimate["status"] == 200 and len(story_estimate["subtasks"]) > 0:
-            for subtask in story_estimate["subtasks"]:
-                subtask_summary = subtask.get("subtask", "Unnamed Subtask")
-                subtask_estimate = subtask.get("estimation", 0)  # Estimate in minutes
-                
-                # Create each subtask
-                creation_status = self.create_subtask(story_id, subtask_summary, subtask_estimate)
-                LOGGER.info(f"Subtask creation status: {creation_status}")
-        else:
-            LOGGER.error(f"Failed to create tasks from estimate for story {story_id}.")
+        if story_estimate["status"] != 200 or not story_estimate.get("subtasks"):
+            LOGGER.error("Failed to create tasks from estimate for story %s.", story_id)
             return {"status":500,
                 "message": f"Tasks couldnot be created for story id: {story_id}"}
 
-        return {"status":200,
-                "message": f"Tasks created successfully for story id: {story_id}"}
+        subtasks = [
+            (subtask.get("subtask", "Unnamed Subtask"), subtask.get("estimation", 0))
+            for subtask in story_estimate["subtasks"]
+        ]
+
+        existing = await self._existing_subtasks(story_id)
+        if existing is None:
+            # Without the existing subtasks a retry would create duplicates, create nothing
+            return {"status": 502,
+                    "message": f"Could not read the existing subtasks of story id: {story_id}, "
+                               "no tasks were created"}
+
+        # Index of the first occurrence of each new summary, repeats in the estimate are created once
+        first_index = {}
+        duplicates = {}
+        to_create = []
+        for idx, (summary, _) in enumerate(subtasks):
+            normalized = self._normalize_summary(summary)
+            if normalized in existing:
+                continue
+            if normalized in first_index:
+                duplicates[idx] = first_index[normalized]
+                continue
+            first_index[normalized] = idx
+            to_create.append(idx)
+
+        project_key = project_key_of(story_id)
+        creation_statuses = {}
+
+        if to_create:
+            metadata = await self.get_project_metadata(project_key)
+            semaphore = asyncio.Semaphore(Constants.JIRA_CREATE_CONCURRENCY)
+
+            async def create_single(summary, estimate):
+                async with semaphore:
+                    return await self.create_subtask(story_id, summary, estimate, metadata)
+
+            async def create_chunk(chunk):
+                async with semaphore:
+                    chunk_results = await self._bulk_create_subtasks(story_id, chunk, metadata)
+                if chunk_results is None:
+                    chunk_results = await asyncio.gather(*(create_single(*subtask) for subtask in chunk))
+                return chunk_results
+
+            pending = [subtasks[idx] for idx in to_create]
+            limit = Constants.JIRA_BULK_CREATE_LIMIT
+            chunks = [pending[i:i + limit] for i in range(0, len(pending), limit)]
+            chunk_results = await asyncio.gather(*(create_chunk(chunk) for chunk in chunks))
+            creation_statuses = dict(zip(to_create, (r for chunk in chunk_results for r in chunk)))
+
+        results = []
+        for idx, (summary, estimate) in enumerate(subtasks):
+            if idx in creation_statuses:
+                creation_status = creation_statuses[idx]
+                action = "created" if creation_status["status"] == 201 else "failed"
+            elif idx in duplicates:
+                first_status = creation_statuses[duplicates[idx]]
+                if first_status["status"] == 201:
+                    creation_status = {"status": 200, "key": first_status.get("key"),
+                                       "message": "Duplicate of another subtask in the estimate"}
+                    action = "skipped"
+                else:
+                    creation_status = {"status": first_status["status"], "key": None,
+                                       "message": "Duplicate of another subtask in the estimate, "
+                                                  "which could not be created"}
+                    action = "failed"
+            else:
+                creation_status = {"status": 200, "key": existing[self._normalize_summary(summary)],
+                                   "message": "Subtask already exists"}
+                action = "skipped"
+            results.append({"subtask": summary, "estimation": estimate, "action": action, **creation_status})
+
+        created = [result["subtask"] for result in results if result["action"] == "created"]
+        skipped = [result["subtask"] for result in results if result["action"] == "skipped"]
+        LOGGER.info("Created %d and skipped %d of %d subtasks for story %s",
+                    len(created), len(skipped), len(results), story_id)
+
+        # Rejected payloads may come from a changed project layout, reload the metadata next time
+        if any(result["status"] == 400 for result in results):
+            project_metadata_cache.pop(self._metadata_cache_key(project_key))
+
+        done_count = len(created) + len(skipped)
+        if done_count == len(results):
+            status = 200
+            message = f"Tasks created successfully for story id: {story_id}"
+            if skipped:
+                message += f" ({len(created)} created, {len(skipped)} already existed)"
+        elif created:
+            status = 207
+            message = f"Created {len(created)} of {len(results)} tasks for story id: {story_id}"
+        else:
+            status = 500
+            message = f"Tasks couldnot be created for story id: {story_id}"
+
+        return {"status": status,
+                "message": message,
+                "created": created,
+                "skipped": skipped,
+                "results": results}
@@ -0,0 +1,239 @@
+import os
+import json
+import time
+import uuid
+import asyncio
+import threading
+
+from cryptography.fernet import Fernet, InvalidToken
+
+from src.constants import Constants
+from src.logger import setup_logger, request_id_var
+from src.utilities import connect_sqlite
+
+LOGGER = setup_logger(__name__)
+
+class QueueFullError(Exception):
+    """
+    Raised when the job queue already holds max_queue pending jobs.
+    """
+
+class EstimationJobQueue:
+    """
+    Background estimation jobs processed by a bounded pool of asyncio workers.
+
+    Jobs are persisted in SQLite, so queued and interrupted jobs are picked up
+    again after a restart. The Jira API token of a job is stored encrypted with
+    secret_key until the job finishes and is cleared from the row afterwards.
+    Without a secret_key every process uses a random key, its jobs then fail
+    when another process or a restart picks them up. A job is only shown to
+    callers presenting the same credentials hash it was submitted with.
+
+    Several worker processes can share the database: a job is claimed with a
+    single conditional update and records the pid running it, so only jobs
+    of processes that are gone are recovered on start.
+    """
+
+    def __init__(self, db_path: str, workers: int, max_queue: int, retention: float, secret_key: str = ""):
+        self.db_path = db_path
+        self.workers = workers
+        self.max_queue = max_queue
+        self.retention = retention
+
+        self._fernet = Fernet(secret_key or Fernet.generate_key())
+
+        self._conn = None
+        self._lock = threading.Lock()
+        self._queue = None
+        self._tasks = []
+        self._busy = set()
+        self._draining = False
+        self._handler = None
+
+    def _db(self):
+        if self._conn is None:
+            # Queued jobs hold Jira API tokens
+            self._conn = connect_sqlite(self.db_path, private=True)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id TEXT PRIMARY KEY, state TEXT NOT NULL, request TEXT, result TEXT, "
+                "created_at REAL NOT NULL, updated_at REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_state ON jobs (state)")
+            columns = [row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")]
+            if "owner" not in columns:
+                self._conn.execute("ALTER TABLE jobs ADD COLUMN owner INTEGER")
+            if "auth_hash" not in columns:
+                self._conn.execute("ALTER TABLE jobs ADD COLUMN auth_hash TEXT")
+            if "secret" not in columns:
+                self._conn.execute("ALTER TABLE jobs ADD COLUMN secret BLOB")
+        return self._conn
+
+    def _execute(self, sql, params=()):
+        with self._lock:
+            return self._db().execute(sql, params).fetchall()
+
+    async def start(self, handler):
+        """
+        Starts the workers and re-queues jobs left over from a previous run.
+
+        Args:
+            handler (callable): Coroutine function taking the job request dict
+                and returning the result dict.
+        """
+        self._handler = handler
+        self._queue = asyncio.Queue()
+        self._draining = False
+
+        now = time.time()
+        self._execute("DELETE FROM jobs WHERE state IN ('done', 'failed') AND updated_at < ?",
+                      (now - self.retention,))
+        running = self._execute("SELECT id, owner FROM jobs WHERE state = 'running'")
+        for job_id, owner in running:
+            if not _process_alive(owner):
+                self._execute("UPDATE jobs SET state = 'queued', owner = NULL, updated_at = ? "
+                              "WHERE id = ? AND state = 'running'", (now, job_id))
+
+        pending = self._execute("SELECT id FROM jobs WHERE state = 'queued' ORDER BY created_at")
+        for (job_id,) in pending:
+            self._queue.put_nowait(job_id)
+        if pending:
+            LOGGER.info("Recovered %d queued estimation jobs", len(pending))
+
+        self._tasks = [asyncio.create_task(self._worker(idx)) for idx in range(self.workers)]
+        LOGGER.info("Started %d estimation job workers", self.workers)
+
+    async def stop(self, drain_timeout: float = 0):
+        """
+        Stops the workers. Running jobs get up to drain_timeout seconds to
+        finish, the ones still running then go back to queued on the next start.
+        """
+        self._draining = True
+        deadline = time.monotonic() + drain_timeout
+        if self._busy:
+            LOGGER.info("Draining %d running estimation jobs", len(self._busy))
+        while self._busy and time.monotonic() < deadline:
+            await asyncio.sleep(0.1)
+
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def submit(self, request: dict, secret: str, auth_hash: str) -> str:
+        """
+        Persists a job and queues it.
+
+        Args:
+            request (dict): The job request, handed to the handler.
+            secret (str): The Jira API token, stored encrypted and added to the
+                request as "api_token" when the job runs.
+            auth_hash (str): Hash of the submitter's credentials, required to read the job.
+
+        Raises:
+            QueueFullError: When max_queue jobs are already waiting.
+        """
+        if self._queue is None:
+            raise RuntimeError("Job queue is not started")
+        if self._queue.qsize() >= self.max_queue:
+            raise QueueFullError(f"Estimation queue is full ({self.max_queue} jobs)")
+
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        self._execute("INSERT INTO jobs (id, state, request, auth_hash, secret, created_at, updated_at) "
+                      "VALUES (?, 'queued', ?, ?, ?, ?, ?)",
+                      (job_id, json.dumps(request), auth_hash, self._fernet.encrypt(secret.encode("utf-8")), now, now))
+        self._queue.put_nowait(job_id)
+        return job_id
+
+    def get(self, job_id: str, auth_hash: str):
+        """
+        Returns the state and result of a job, or None when it does not exist
+        or was submitted with other credentials.
+        """
+        rows = self._execute("SELECT state, result, created_at, updated_at FROM jobs WHERE id = ? AND auth_hash = ?",
+                             (job_id, auth_hash))
+        if not rows:
+            return None
+
+        state, result, created_at, updated_at = rows[0]
+        return {
+            "job_id": job_id,
+            "state": state,
+            "result": json.loads(result) if result else None,
+            "created_at": created_at,
+            "updated_at": updated_at,
+        }
+
+    def stats(self) -> dict:
+        counts = dict(self._execute("SELECT state, COUNT(*) FROM jobs GROUP BY state"))
+        counts["workers"] = len(self._tasks)
+        counts["queue_depth"] = self._queue.qsize() if self._queue is not None else 0
+        return counts
+
+    async def _worker(self, idx):
+        while not self._draining:
+            job_id = await self._queue.get()
+            if self._draining:
+                # Left queued in the database for the next start
+                break
+            self._busy.add(idx)
+            try:
+                await self._run(job_id)
+            except Exception as e:
+                LOGGER.error("Estimation job %s crashed in worker %d: %s", job_id, idx, e)
+                self._finish(job_id, "failed", {"status": 500, "message": "Estimation job failed"})
+            finally:
+                self._busy.discard(idx)
+                self._queue.task_done()
+
+    async def _run(self, job_id):
+        # Log lines of the job carry its id as correlation id
+        request_id_var.set(job_id)
+        # Claimed atomically, another process may have recovered the same job
+        rows = self._execute("UPDATE jobs SET state = 'running', owner = ?, updated_at = ? "
+                             "WHERE id = ? AND state = 'queued' RETURNING request, secret",
+                             (os.getpid(), time.time(), job_id))
+        if not rows or rows[0][0] is None:
+            return
+
+        request = json.loads(rows[0][0])
+        try:
+            request["api_token"] = self._fernet.decrypt(rows[0][1]).decode("utf-8")
+        except (InvalidToken, TypeError):
+            LOGGER.warning("Estimation job %s has credentials this process cannot decrypt", job_id)
+            self._finish(job_id, "failed", {"status": 500, "message": "The job's Jira credentials were encrypted "
+                                            "with another key (JOB_SECRET_KEY), submit the job again"})
+            return
+
+        result = await self._handler(request)
+
+        state = "done" if result.get("status") == 200 else "failed"
+        self._finish(job_id, state, result)
+        LOGGER.info("Estimation job %s %s", job_id, state)
+
+    def _finish(self, job_id, state, result):
+        # The encrypted token is dropped once the job is over
+        self._execute("UPDATE jobs SET state = ?, result = ?, request = NULL, secret = NULL, updated_at = ? "
+                      "WHERE id = ?",
+                      (state, json.dumps(result), time.time(), job_id))
+
+def _process_alive(pid) -> bool:
+    if pid is None or pid == os.getpid():
+        # Jobs without an owner predate it, a job of this pid is left from a previous run
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+job_queue = EstimationJobQueue(
+    db_path=Constants.JOB_DB,
+    workers=Constants.JOB_WORKERS,
+    max_queue=Constants.JOB_MAX_QUEUE,
+    retention=Constants.JOB_RETENTION,
+    secret_key=Constants.JOB_SECRET_KEY,
+)
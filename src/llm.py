@@ -0,0 +1,375 @@
+import time
+import asyncio
+import functools
+import threading
+import contextvars
+from collections import deque
+
+from src.constants import Constants
+from src.metrics import record_llm_tokens, LLM_PROVIDER_CALLS, LLM_HEDGES
+from src.logger import setup_logger, route_library_logger
+from src.usage_ledger import record_usage
+
+LOGGER = setup_logger(__name__)
+
+def _normalize_usage(usage: dict) -> dict:
+    # Gemini reports usage as prompt_token_count / candidates_token_count
+    return {
+        "prompt_tokens": usage.get("prompt_tokens", usage.get("prompt_token_count", 0)),
+        "completion_tokens": usage.get("completion_tokens", usage.get("candidates_token_count", 0)),
+    }
+
+class TokenTrackingMixin:
+    """
+    Reports the token usage of every call of a grollm client to the metrics,
+    per model, and to the usage recorder of the request that made the call.
+    grollm's own cumulative counters are shared by all requests, their
+    updates are serialised.
+    """
+
+    _counter_lock = threading.Lock()
+
+    def calculate_tokens(self, *args, **kwargs):
+        with self._counter_lock:
+            tokens = super().calculate_tokens(*args, **kwargs)
+        usage = _normalize_usage(kwargs)
+        record_llm_tokens(self.model, usage)
+        record_usage(self.model, usage, getattr(self, "cost_dict", None))
+        return tokens
+
+_tracked_classes = {}
+_tracked_lock = threading.Lock()
+
+def _tracked(class_name: str):
+    """
+    Returns the token tracking subclass of a grollm client class. grollm
+    imports every vendor SDK, it is only loaded when the first client is
+    created to keep it out of the worker start-up time.
+    """
+    with _tracked_lock:
+        tracked = _tracked_classes.get(class_name)
+        if tracked is None:
+            import grollm
+            for library_logger in ("grollm.openai_gro", "grollm.azureopenai_gro", "grollm.anthropic_gro",
+                                   "grollm.gemini_gro"):
+                route_library_logger(library_logger)
+            tracked = type(f"Tracked{class_name}", (TokenTrackingMixin, getattr(grollm, class_name)), {})
+            _tracked_classes[class_name] = tracked
+        return tracked
+
+def _make_openai(model):
+    client_class = _tracked("OpenAI_Grollm")
+    return client_class(model=model) if model else client_class()
+
+def _make_azure(model):
+    client_class = _tracked("AzureOpenAI_Grollm")
+    return client_class(model=model, deployment_name=model) if model else client_class()
+
+def _make_anthropic(model):
+    client_class = _tracked("Anthropic_Grollm")
+    return client_class(model=model) if model else client_class()
+
+def _make_gemini(model):
+    client_class = _tracked("Gemini_Grollm")
+    return client_class(model=model) if model else client_class()
+
+PROVIDER_FACTORIES = {
+    "openai": _make_openai,
+    "azure": _make_azure,
+    "anthropic": _make_anthropic,
+    "gemini": _make_gemini,
+}
+
+class NoProviderAvailableError(Exception):
+    pass
+
+class InvalidResponseError(ValueError):
+    """
+    Raised when a provider answer fails the validator of the request.
+    """
+
+    def __init__(self, response: str, error: Exception):
+        super().__init__(f"Invalid response: {error}")
+        self.response = response
+
+# grollm's Azure client sets the api_type and api_key of the openai module globally
+EXCLUSIVE_PROVIDER_KINDS = ({"openai", "azure"},)
+
+class LLMProvider:
+    """
+    One grollm client with its recent latencies and a circuit breaker. After
+    LLM_BREAKER_FAILURES consecutive failures the provider leaves the rotation
+    for LLM_BREAKER_COOLDOWN seconds, then a single failure takes it out again.
+    """
+
+    def __init__(self, kind: str, client):
+        self.kind = kind
+        self.client = client
+        self.model = client.model
+        self.name = f"{kind}:{client.model}"
+        self._latencies = deque(maxlen=Constants.LLM_LATENCY_WINDOW)
+        self._failures = 0
+        self._open_until = 0.0
+
+    @property
+    def available(self) -> bool:
+        return time.monotonic() >= self._open_until
+
+    @property
+    def supports_streaming(self) -> bool:
+        return self.kind == "openai"
+
+    def latency_percentile(self, percentile: float):
+        if not self._latencies:
+            return None
+        ordered = sorted(self._latencies)
+        index = min(len(ordered) - 1, int(len(ordered) * percentile / 100))
+        return ordered[index]
+
+    def hedge_delay(self) -> float:
+        """
+        Seconds to wait for this provider before hedging to the next one.
+        """
+        if len(self._latencies) < Constants.LLM_HEDGE_MIN_SAMPLES:
+            return Constants.LLM_HEDGE_DEFAULT_DELAY
+        return self.latency_percentile(Constants.LLM_HEDGE_PERCENTILE)
+
+    def record_success(self, latency: float):
+        self._latencies.append(latency)
+        self._failures = 0
+        self._open_until = 0.0
+        LLM_PROVIDER_CALLS.inc(provider=self.name, result="success")
+
+    def record_failure(self):
+        self._failures += 1
+        LLM_PROVIDER_CALLS.inc(provider=self.name, result="error")
+        if self._failures >= Constants.LLM_BREAKER_FAILURES:
+            self._open_until = time.monotonic() + Constants.LLM_BREAKER_COOLDOWN
+            LOGGER.warning("LLM provider %s taken out of rotation after %d failures", self.name, self._failures)
+
+    def _adapt(self, prompt, kwargs):
+        # Response formats are an OpenAI API feature, other vendors rely on the prompt instructions
+        if self.kind in ("anthropic", "gemini"):
+            kwargs = {k: v for k, v in kwargs.items() if k != "response_format"}
+
+        if isinstance(prompt, list) and self.kind == "anthropic":
+            system = "\n".join(m["content"] for m in prompt if m["role"] == "system")
+            prompt = [m for m in prompt if m["role"] != "system"]
+            if system:
+                kwargs["system"] = system
+        elif isinstance(prompt, list) and self.kind == "gemini":
+            prompt = "\n\n".join(m["content"] if m["role"] == "user" else f"{m['role']}: {m['content']}"
+                                 for m in prompt if m["role"] != "system")
+        return prompt, kwargs
+
+    def send_prompt(self, prompt, **kwargs) -> str:
+        prompt, kwargs = self._adapt(prompt, kwargs)
+        return self.client.send_prompt(prompt, **kwargs)
+
+    def stats(self):
+        return {
+            "model": self.model,
+            "available": self.available,
+            "consecutive_failures": self._failures,
+            "samples": len(self._latencies),
+            "p50_seconds": self.latency_percentile(50),
+            "p95_seconds": self.latency_percentile(95),
+        }
+
+class LLMProviderPool:
+    """
+    Sends prompts to the configured providers in priority order. When the
+    first provider is slower than its hedge delay a duplicate request goes to
+    the next one, the first valid answer wins and the other call is cancelled.
+    Failed calls, and answers rejected by the validator of the request, fail
+    over to the next provider.
+
+    grollm clients are synchronous, so a cancelled call only stops being
+    awaited; its worker thread runs to completion and the answer is dropped.
+
+    A pool made with from_config(..., lazy=True) creates its clients on first use.
+    """
+
+    def __init__(self, providers, executor, spec: str = None):
+        if not providers and spec is None:
+            raise NoProviderAvailableError("No LLM provider configured")
+        self._providers = providers or None
+        self.spec = spec
+        self.executor = executor
+        self._build_lock = threading.Lock()
+        self._hedges = 0
+        self._hedge_wins = 0
+
+    @classmethod
+    def from_config(cls, spec: str, executor, lazy: bool = False):
+        """
+        Builds the pool from a comma separated "kind[:model]" list. Providers
+        that cannot be created (e.g. missing credentials) are skipped.
+        """
+        kinds = set()
+        for entry in filter(None, (part.strip() for part in spec.split(","))):
+            kind = entry.partition(":")[0].lower()
+            if kind not in PROVIDER_FACTORIES:
+                raise ValueError(f"Unknown LLM provider kind '{kind}'")
+            kinds.add(kind)
+        for exclusive in EXCLUSIVE_PROVIDER_KINDS:
+            if exclusive <= kinds:
+                raise ValueError(f"LLM provider kinds {sorted(exclusive)} cannot be combined, "
+                                 "they share the openai module configuration")
+
+        pool = cls(None, executor, spec)
+        if not lazy:
+            pool.providers
+        return pool
+
+    @staticmethod
+    def _build(spec: str):
+        start = time.perf_counter()
+        providers = []
+        for entry in filter(None, (part.strip() for part in spec.split(","))):
+            kind, _, model = entry.partition(":")
+            try:
+                providers.append(LLMProvider(kind.lower(), PROVIDER_FACTORIES[kind.lower()](model or None)))
+            except Exception as e:
+                LOGGER.error("Could not create LLM provider %s: %s", entry, e)
+        if not providers:
+            raise NoProviderAvailableError("No LLM provider could be created")
+        LOGGER.info("Created %d LLM providers in %.2fs", len(providers), time.perf_counter() - start)
+        return providers
+
+    @property
+    def providers(self):
+        if self._providers is None:
+            with self._build_lock:
+                if self._providers is None:
+                    self._providers = self._build(self.spec)
+        return self._providers
+
+    @property
+    def started(self) -> bool:
+        return self._providers is not None
+
+    async def start(self):
+        """
+        Creates the clients of a lazy pool in a worker thread, importing grollm
+        takes seconds and would stall every request of the event loop.
+        """
+        if self._providers is None:
+            await asyncio.to_thread(lambda: self.providers)
+
+    @property
+    def model(self) -> str:
+        return self.providers[0].model
+
+    def streaming_provider(self):
+        """
+        Returns the first available provider that supports streaming, if any.
+        """
+        return next((p for p in self._candidates() if p.supports_streaming), None)
+
+    def _candidates(self):
+        candidates = [p for p in self.providers if p.available]
+        if not candidates:
+            # Every breaker is open, probe the provider that has been out the longest
+            candidates = [min(self.providers, key=lambda p: p._open_until)]
+        return candidates
+
+    async def _attempt(self, provider, prompt, kwargs, validator=None):
+        loop = asyncio.get_running_loop()
+        start = time.monotonic()
+        # The worker thread runs in a copy of the request context, so token usage reaches its recorder
+        context = contextvars.copy_context()
+        try:
+            response = await loop.run_in_executor(self.executor, functools.partial(
+                context.run, provider.send_prompt, prompt, **kwargs))
+            if not response or not response.strip():
+                raise ValueError("Empty response")
+            if validator is not None:
+                try:
+                    validator(response)
+                except Exception as e:
+                    raise InvalidResponseError(response, e) from e
+        except Exception:
+            provider.record_failure()
+            raise
+        provider.record_success(time.monotonic() - start)
+        return response
+
+    async def send_prompt(self, prompt, validator=None, **kwargs) -> str:
+        """
+        Sends a prompt, hedging and failing over between providers.
+
+        Args:
+            prompt: The prompt string or message list.
+            validator (callable): Optional check that raises on an unusable
+                answer, which then counts as a failure of its provider.
+
+        Returns:
+            str: The first valid response, or the last rejected one when no
+                provider gave a valid answer, so the caller can repair it.
+
+        Raises:
+            Exception: The last provider error when every provider failed.
+        """
+        await self.start()
+        candidates = self._candidates()
+        pending = {}
+        next_index = 0
+        hedge_target = None
+        last_error = None
+        rejected = None
+
+        def launch():
+            nonlocal next_index
+            provider = candidates[next_index]
+            next_index += 1
+            pending[asyncio.ensure_future(self._attempt(provider, prompt, kwargs, validator))] = provider
+
+        launch()
+        try:
+            while pending:
+                timeout = None
+                if Constants.LLM_HEDGE_ENABLED and hedge_target is None and next_index < len(candidates):
+                    timeout = candidates[next_index - 1].hedge_delay()
+
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    hedge_target = candidates[next_index]
+                    self._hedges += 1
+                    LLM_HEDGES.inc(provider=hedge_target.name)
+                    LOGGER.info("Hedging LLM request to %s", hedge_target.name)
+                    launch()
+                    continue
+
+                for task in done:
+                    provider = pending.pop(task)
+                    try:
+                        response = task.result()
+                    except Exception as e:
+                        LOGGER.warning("LLM provider %s failed: %s", provider.name, e)
+                        last_error = e
+                        if isinstance(e, InvalidResponseError):
+                            rejected = e.response
+                        continue
+                    if provider is hedge_target:
+                        self._hedge_wins += 1
+                    return response
+
+                if not pending and next_index < len(candidates):
+                    launch()
+        finally:
+            for task in pending:
+                task.cancel()
+                LLM_PROVIDER_CALLS.inc(provider=pending[task].name, result="cancelled")
+
+        if rejected is not None:
+            return rejected
+        raise last_error
+
+    def stats(self):
+        # Reading the stats does not create the clients of a lazy pool
+        return {
+            "hedged_requests": self._hedges,
+            "hedge_wins": self._hedge_wins,
+            "providers": {p.name: p.stats() for p in self._providers or []},
+        }
@@ -0,0 +1,51 @@
+from src.logger import setup_logger
+
+LOGGER = setup_logger(__name__)
+
+_client = None
+
+def get_async_client():
+    """
+    Returns the shared async OpenAI client, created on first use.
+    """
+    global _client
+    if _client is None:
+        import openai
+        _client = openai.AsyncOpenAI()
+    return _client
+
+async def stream_prompt(llm, prompt, **kwargs):
+    """
+    Streams the completion of a prompt from the provider of the given grollm
+    client, yielding text deltas as they arrive. Token usage is added to the
+    grollm counters the same way a regular send_prompt call does.
+
+    Args:
+        llm (OpenAI_Grollm): The grollm client whose model and counters are used.
+        prompt (str): The prompt text.
+        **kwargs: Extra completion arguments, e.g. response_format.
+
+    Yields:
+        str: Pieces of the completion text.
+    """
+    messages = [
+        {"role": "system", "content": "You are a helpful assistant."},
+        {"role": "user", "content": prompt}
+    ]
+
+    LOGGER.info("Sending streaming request to OpenAI API.")
+    stream = await get_async_client().chat.completions.create(
+        model=llm.model,
+        messages=messages,
+        stream=True,
+        stream_options={"include_usage": True},
+        **kwargs,
+    )
+
+    async for chunk in stream:
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
+        if chunk.usage is not None:
+            llm.calculate_tokens(**chunk.usage.to_dict())
+
+    LOGGER.info("Streaming response from OpenAI API completed.")
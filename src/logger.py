@@ -1,10 +1,144 @@
 import os
+import copy
+import json
+import queue
+import atexit
+import random
 import logging
-from logging.handlers import RotatingFileHandler
+import contextvars
+from logging.handlers import RotatingFileHandler, QueueHandler, QueueListener
+
+# Correlation id of the request (or job) being handled, added to every record
+request_id_var = contextvars.ContextVar("request_id", default="-")
+
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text").lower()
+LOG_QUEUE = os.getenv("LOG_QUEUE", "true").lower() == "true"
+LOG_MAX_MESSAGE_CHARS = int(os.getenv("LOG_MAX_MESSAGE_CHARS", "2000"))
+LOG_DEBUG_SAMPLE_RATE = float(os.getenv("LOG_DEBUG_SAMPLE_RATE", "1.0"))
+
+def _cap_message(message: str) -> str:
+    # Full prompts and responses would otherwise fill the log files
+    if len(message) > LOG_MAX_MESSAGE_CHARS:
+        dropped = len(message) - LOG_MAX_MESSAGE_CHARS
+        return f"{message[:LOG_MAX_MESSAGE_CHARS]}... [{dropped} chars truncated]"
+    return message
+
+class TextFormatter(logging.Formatter):
+    """
+    Formats records as text lines, cutting messages at LOG_MAX_MESSAGE_CHARS.
+    """
+
+    def formatMessage(self, record: logging.LogRecord) -> str:
+        record.message = _cap_message(record.message)
+        return super().formatMessage(record)
+
+class JsonFormatter(logging.Formatter):
+    """
+    Formats records as one JSON object per line, cutting messages at
+    LOG_MAX_MESSAGE_CHARS.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "request_id": getattr(record, "request_id", "-"),
+            "message": _cap_message(record.getMessage()),
+        }
+        if record.exc_info:
+            payload["exception"] = self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False)
+
+class RequestContextFilter(logging.Filter):
+    """
+    Adds the request id to records and samples DEBUG records, so dropped
+    records are never formatted.
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno <= logging.DEBUG and LOG_DEBUG_SAMPLE_RATE < 1.0 \
+                and random.random() >= LOG_DEBUG_SAMPLE_RATE:
+            return False
+        record.request_id = request_id_var.get()
+        return True
+
+class UnformattedQueueHandler(QueueHandler):
+    """
+    Queue handler that hands the listener a copy of the record as it is.
+    QueueHandler.prepare formats the message and exception on the calling
+    thread and drops exc_info; here the listener-side formatters do both.
+    The queue stays in process, so the record arguments are not flattened.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return copy.copy(record)
+
+_output_handlers = []
+_queue_handler = None
+_listener = None
+
+def _get_output_handlers():
+    # One file handler and one stream handler shared by every logger
+    if not _output_handlers:
+        if LOG_FORMAT == "json":
+            log_format = JsonFormatter()
+        else:
+            log_format = TextFormatter('%(asctime)s - %(name)s - %(levelname)s - %(request_id)s - %(message)s')
+
+        os.makedirs("logs", exist_ok=True)
+
+        # Create a rotating file handler
+        file_handler = RotatingFileHandler("logs/jira_app.log", maxBytes=1024 * 1024 * 5, backupCount=5)
+        file_handler.setFormatter(log_format)
+
+        # Create a stream handler to print logs to the console
+        stream_handler = logging.StreamHandler()
+        stream_handler.setFormatter(log_format)
+
+        _output_handlers.extend([file_handler, stream_handler])
+    return _output_handlers
+
+def _get_queue_handler():
+    # The listener thread does all formatting and I/O off the request path
+    global _queue_handler, _listener
+    if _queue_handler is None:
+        log_queue = queue.SimpleQueue()
+        _queue_handler = UnformattedQueueHandler(log_queue)
+        _queue_handler.addFilter(RequestContextFilter())
+        _listener = QueueListener(log_queue, *_get_output_handlers(), respect_handler_level=True)
+        _listener.start()
+        atexit.register(stop_logging)
+    return _queue_handler
+
+def stop_logging():
+    """
+    Flushes the queued records and stops the listener thread.
+    """
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+def get_handlers():
+    """
+    Returns the handlers to attach to a logger in the configured mode.
+    """
+    if LOG_QUEUE:
+        return [_get_queue_handler()]
+
+    handlers = _get_output_handlers()
+    for handler in handlers:
+        if not any(isinstance(f, RequestContextFilter) for f in handler.filters):
+            handler.addFilter(RequestContextFilter())
+    return handlers
 
 def setup_logger(name="jira_app", log_level: str="INFO") -> logging.Logger:
     """
-    Set up a logger with a rotating file handler and a stream handler.
+    Set up a logger writing to the rotating log file and the console. By
+    default records go through a queue and a background listener does the
+    formatting and I/O (set LOG_QUEUE=false for synchronous handlers).
+    LOG_FORMAT=json switches to structured output with request ids.
     
     Args:
         log_level (str): The logging level to set. Default is "INFO".
@@ -19,24 +153,19 @@ def setup_logger(name="jira_app", log_level: str="INFO") -> logging.Logger:
     log_level = getattr(logging, log_level.upper(), logging.INFO)
     logger.setLevel(log_level)
 
-    # Define log format
-    log_format = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-
-    os.makedirs("logs", exist_ok=True)
-    
-    # Create a rotating file handler
-    file_handler = RotatingFileHandler("logs/jira_app.log", maxBytes=1024 * 1024 * 5, backupCount=5)
-    file_handler.setLevel(log_level)
-    file_handler.setFormatter(log_format)
-    
-    # Create a stream handler to print logs to the console
-    stream_handler = logging.StreamHandler()
-    stream_handler.setLevel(log_level)
-    stream_handler.setFormatter(log_format)
-
     # Add the handlers to the logger (if not already added)
     if not logger.handlers:
-        logger.addHandler(file_handler)
-        logger.addHandler(stream_handler)
+        for handler in get_handlers():
+            logger.addHandler(handler)
 
     return logger
+
+def route_library_logger(name, log_level: str="INFO"):
+    """
+    Moves a third-party logger onto our handlers and level, used for grollm
+    which logs full prompts at DEBUG through its own synchronous handlers.
+    """
+    logger = logging.getLogger(name)
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+    setup_logger(name, log_level)
@@ -0,0 +1,156 @@
+import time
+import bisect
+import functools
+import threading
+from contextlib import contextmanager
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+def _format_labels(labelnames, values, extra=()):
+    pairs = list(zip(labelnames, values)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+class Counter:
+    """
+    Monotonic counter with labels, in the Prometheus text format.
+    """
+
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value}")
+        return lines
+
+class Histogram:
+    """
+    Cumulative histogram with labels, in the Prometheus text format.
+    """
+
+    def __init__(self, name: str, documentation: str, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][index] += 1
+            state[1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total) in sorted(self._values.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, [('le', le)])} {cumulative}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {total}")
+                lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+STAGE_LATENCY = Histogram("jira_backend_stage_seconds",
+                          "Latency of each estimation stage", ["stage"])
+STAGE_ERRORS = Counter("jira_backend_stage_errors_total",
+                       "Stages that ended with an exception", ["stage"])
+REQUESTS = Counter("jira_backend_requests_total",
+                   "HTTP requests per endpoint and response status, the body status for JSON bodies", ["method", "endpoint", "status"])
+REQUEST_ERRORS = Counter("jira_backend_request_errors_total",
+                         "HTTP requests that failed with a 4xx/5xx status or an exception", ["method", "endpoint"])
+REQUEST_LATENCY = Histogram("jira_backend_request_seconds",
+                            "HTTP request latency per endpoint", ["method", "endpoint"])
+LLM_TOKENS = Counter("jira_backend_llm_tokens_total",
+                     "LLM tokens used per model and kind", ["model", "kind"])
+CACHE_REQUESTS = Counter("jira_backend_cache_requests_total",
+                         "Cache lookups per cache and result", ["cache", "result"])
+LLM_PROVIDER_CALLS = Counter("jira_backend_llm_provider_calls_total",
+                             "LLM calls per provider and outcome", ["provider", "result"])
+LLM_HEDGES = Counter("jira_backend_llm_hedges_total",
+                     "Hedged LLM requests per provider the duplicate was sent to", ["provider"])
+
+@contextmanager
+def stage(name: str):
+    """
+    Times a pipeline stage and counts it as an error when it raises.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        STAGE_ERRORS.inc(stage=name)
+        raise
+    finally:
+        STAGE_LATENCY.observe(time.perf_counter() - start, stage=name)
+
+def timed_stage(name: str):
+    """
+    Decorator timing a coroutine function as a pipeline stage.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            with stage(name):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def record_llm_tokens(model: str, usage: dict):
+    for kind in ("prompt_tokens", "completion_tokens"):
+        if usage.get(kind):
+            LLM_TOKENS.inc(usage[kind], model=model, kind=kind.replace("_tokens", ""))
+
+def _cache_hit_ratios():
+    lookups = {}
+    with CACHE_REQUESTS._lock:
+        for (cache, result), value in CACHE_REQUESTS._values.items():
+            hits, total = lookups.get(cache, (0.0, 0.0))
+            lookups[cache] = (hits + (value if result != "miss" else 0.0), total + value)
+
+    lines = ["# HELP jira_backend_cache_hit_ratio Share of cache lookups that were hits",
+             "# TYPE jira_backend_cache_hit_ratio gauge"]
+    for cache, (hits, total) in sorted(lookups.items()):
+        lines.append(f'jira_backend_cache_hit_ratio{{cache="{cache}"}} {hits / total if total else 0.0}')
+    return lines
+
+def render_metrics() -> str:
+    """
+    Renders every metric in the Prometheus text exposition format.
+    """
+    lines = []
+    for metric in (REQUESTS, REQUEST_ERRORS, REQUEST_LATENCY, STAGE_LATENCY, STAGE_ERRORS,
+                   LLM_TOKENS, CACHE_REQUESTS, LLM_PROVIDER_CALLS, LLM_HEDGES):
+        lines.extend(metric.render())
+    lines.extend(_cache_hit_ratios())
+    return "\n".join(lines) + "\n"
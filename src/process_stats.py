@@ -0,0 +1,81 @@
+import os
+import time
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+from src.logger import setup_logger
+
+LOGGER = setup_logger(__name__)
+
+_IMPORTED_AT = time.monotonic()
+
+def process_age() -> float:
+    """
+    Seconds since the process started, read from /proc on Linux, else since
+    this module was imported.
+    """
+    try:
+        with open("/proc/self/stat") as stat_file:
+            # Fields after the command name, starttime is field 22 of the full line
+            start_ticks = int(stat_file.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as uptime_file:
+            uptime = float(uptime_file.read().split()[0])
+        return uptime - start_ticks / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError):
+        return time.monotonic() - _IMPORTED_AT
+
+def rss_bytes():
+    """
+    Current resident set size of the process, or None when it cannot be read.
+    """
+    try:
+        with open("/proc/self/statm") as statm_file:
+            return int(statm_file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+def peak_rss_bytes():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if os.uname().sysname == "Darwin" else peak * 1024
+
+def _megabytes(value):
+    return round(value / (1024 * 1024), 1) if value is not None else None
+
+class ProcessStats:
+    """
+    Start-up time and memory of the current worker process.
+    """
+
+    def __init__(self):
+        self.cold_start_seconds = None
+        self.warmup_seconds = None
+        self._ready_at = None
+
+    def mark_ready(self, warmup_seconds: float = None):
+        """
+        Records that the worker is ready to take requests.
+        """
+        self.cold_start_seconds = round(process_age(), 3)
+        self.warmup_seconds = round(warmup_seconds, 3) if warmup_seconds is not None else None
+        self._ready_at = time.monotonic()
+        LOGGER.info("Worker %d ready in %.2fs (warmup %s), RSS %s MB", os.getpid(), self.cold_start_seconds,
+                    f"{self.warmup_seconds:.2f}s" if warmup_seconds is not None else "off",
+                    _megabytes(rss_bytes()))
+
+    def stats(self) -> dict:
+        return {
+            "pid": os.getpid(),
+            "cold_start_seconds": self.cold_start_seconds,
+            "warmup_seconds": self.warmup_seconds,
+            "uptime_seconds": round(time.monotonic() - self._ready_at, 1) if self._ready_at is not None else None,
+            "rss_mb": _megabytes(rss_bytes()),
+            "peak_rss_mb": _megabytes(peak_rss_bytes()),
+        }
+
+process_stats = ProcessStats()
@@ -0,0 +1,145 @@
+import os
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+from src.constants import Constants
+from src.compaction import count_tokens
+from src.logger import setup_logger
+
+LOGGER = setup_logger(__name__)
+
+PLACEHOLDER = "{STORY_QUERY}"
+
+class PromptTemplateError(ValueError):
+    """
+    Raised for unknown template names and templates without the {STORY_QUERY} keyword.
+    """
+
+class CompiledTemplate:
+    """
+    A prompt template split around its {STORY_QUERY} keyword, so rendering is a
+    single join. The token cost of the fixed text is computed once.
+    """
+
+    def __init__(self, name: str, text: str, mtime: float = 0.0):
+        if PLACEHOLDER not in text:
+            raise PromptTemplateError("Incorrect prompt template sent, {STORY_QUERY} keyword not found in prompt template")
+
+        self.name = name
+        self.text = text
+        self.mtime = mtime
+        self.segments = text.split(PLACEHOLDER)
+        self.fixed_tokens = count_tokens("".join(self.segments))
+
+    def render(self, story_query: str) -> str:
+        return story_query.join(self.segments)
+
+class PromptRegistry:
+    """
+    Loads the versioned *.txt templates of a directory once and serves them by
+    name (the file name without extension). Files are re-read when their
+    mtime changes, checked at most every reload_interval seconds. Custom
+    templates sent by clients are compiled once and kept in a small LRU.
+    """
+
+    def __init__(self, directory: str, default_name: str, reload_interval: float = 2.0,
+                 custom_entries: int = 128):
+        self.directory = directory
+        self.default_name = default_name
+        self.reload_interval = reload_interval
+        self.custom_entries = custom_entries
+
+        self._templates = {}
+        self._custom = OrderedDict()
+        self._lock = threading.Lock()
+        self._last_scan = None
+
+    def _scan(self):
+        now = time.monotonic()
+        if self._last_scan is not None and now - self._last_scan < self.reload_interval:
+            return
+        self._last_scan = now
+
+        found = {}
+        for file_name in os.listdir(self.directory):
+            name, extension = os.path.splitext(file_name)
+            if extension == ".txt":
+                found[name] = os.path.join(self.directory, file_name)
+
+        for name in set(self._templates) - set(found):
+            LOGGER.info("Prompt template %s removed", name)
+            del self._templates[name]
+
+        for name, path in found.items():
+            mtime = os.path.getmtime(path)
+            current = self._templates.get(name)
+            if current is not None and current.mtime == mtime:
+                continue
+
+            with open(path, 'r') as f:
+                text = f.read()
+            try:
+                self._templates[name] = CompiledTemplate(name, text, mtime)
+                LOGGER.info("Prompt template %s loaded, %d fixed tokens", name, self._templates[name].fixed_tokens)
+            except PromptTemplateError:
+                LOGGER.error("Prompt template %s has no %s keyword, skipped", path, PLACEHOLDER)
+
+    def get(self, name: str = None) -> CompiledTemplate:
+        """
+        Returns the named template, or the default one when no name is given.
+
+        Raises:
+            PromptTemplateError: When no template has that name.
+        """
+        name = name or self.default_name
+        with self._lock:
+            self._scan()
+            template = self._templates.get(name)
+
+        if template is None:
+            raise PromptTemplateError(f"Prompt template {name} not found")
+        return template
+
+    def names(self) -> list:
+        with self._lock:
+            self._scan()
+            return sorted(self._templates)
+
+    def compile(self, text: str) -> CompiledTemplate:
+        """
+        Compiles a custom template sent with a request, reusing earlier compilations.
+
+        Raises:
+            PromptTemplateError: When the template lacks the {STORY_QUERY} keyword.
+        """
+        key = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        with self._lock:
+            template = self._custom.get(key)
+            if template is not None:
+                self._custom.move_to_end(key)
+                return template
+
+        template = CompiledTemplate(f"custom-{key[:12]}", text)
+
+        with self._lock:
+            self._custom[key] = template
+            while len(self._custom) > self.custom_entries:
+                self._custom.popitem(last=False)
+        return template
+
+    def resolve(self, prompt_template: str = None, template_name: str = None) -> CompiledTemplate:
+        """
+        Picks the template of a request: the custom text when given, else the
+        named template, else the default one.
+        """
+        if prompt_template is not None:
+            return self.compile(prompt_template)
+        return self.get(template_name)
+
+prompt_registry = PromptRegistry(
+    directory=Constants.PROMPT_DIR,
+    default_name=Constants.DEFAULT_PROMPT_TEMPLATE,
+    reload_interval=Constants.PROMPT_RELOAD_INTERVAL,
+)
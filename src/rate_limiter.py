@@ -0,0 +1,119 @@
+import time
+import random
+import asyncio
+from collections import OrderedDict
+from email.utils import parsedate_to_datetime
+
+from src.constants import Constants
+from src.logger import setup_logger
+
+LOGGER = setup_logger(__name__)
+
+class AdaptiveTokenBucket:
+    """
+    Token bucket for the calls to one Jira tenant. The refill rate grows
+    slowly while requests succeed and is halved when Jira answers 429/503,
+    and a Retry-After header pauses the bucket for the given time.
+    """
+
+    def __init__(self, rate: float, burst: float, min_rate: float, max_rate: float, increase: float):
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+
+        self.tokens = burst
+        self.updated_at = time.monotonic()
+        self.blocked_until = 0.0
+        self.throttled = 0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    async def acquire(self):
+        """
+        Waits until a request may be sent to the tenant.
+        """
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+
+                wait = self.blocked_until - now
+                if wait <= 0 and self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+
+                await asyncio.sleep(max(wait, (1 - self.tokens) / self.rate))
+
+    def on_success(self):
+        self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def on_throttle(self, retry_after=None):
+        """
+        Halves the rate and honours the Retry-After delay sent by Jira.
+        """
+        self.throttled += 1
+        self.rate = max(self.min_rate, self.rate / 2)
+        self.tokens = min(self.tokens, 0)
+        if retry_after:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + retry_after)
+        LOGGER.warning("JIRA throttled the request, rate lowered to %.2f/s", self.rate)
+
+    def stats(self) -> dict:
+        return {"rate": round(self.rate, 2), "throttled": self.throttled}
+
+# Least recently used tenants first, at most JIRA_MAX_LIMITERS
+_limiters = OrderedDict()
+
+def get_limiter(jira_url: str) -> AdaptiveTokenBucket:
+    """
+    Returns the token bucket of a Jira tenant, creating it on first use.
+    """
+    key = jira_url.strip().rstrip("/")
+    limiter = _limiters.get(key)
+    if limiter is not None:
+        _limiters.move_to_end(key)
+    else:
+        limiter = AdaptiveTokenBucket(
+            rate=Constants.JIRA_RATE_LIMIT,
+            burst=Constants.JIRA_RATE_BURST,
+            min_rate=Constants.JIRA_RATE_MIN,
+            max_rate=Constants.JIRA_RATE_MAX,
+            increase=Constants.JIRA_RATE_INCREASE,
+        )
+        _limiters[key] = limiter
+        while len(_limiters) > Constants.JIRA_MAX_LIMITERS:
+            _limiters.popitem(last=False)
+    return limiter
+
+def limiter_stats() -> dict:
+    return {key: limiter.stats() for key, limiter in _limiters.items()}
+
+def parse_retry_after(value):
+    """
+    Parses a Retry-After header given in seconds or as an HTTP date.
+
+    Returns:
+        float | None: Seconds to wait, capped at JIRA_BACKOFF_MAX.
+    """
+    if not value:
+        return None
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            seconds = parsedate_to_datetime(value).timestamp() - time.time()
+        except (TypeError, ValueError):
+            return None
+    return min(max(seconds, 0.0), Constants.JIRA_BACKOFF_MAX)
+
+def backoff_delay(attempt: int) -> float:
+    """
+    Exponential backoff with full jitter for the given retry attempt.
+    """
+    cap = min(Constants.JIRA_BACKOFF_MAX, Constants.JIRA_BACKOFF_BASE * 2 ** attempt)
+    return random.uniform(0, cap)
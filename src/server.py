@@ -0,0 +1,21 @@
+import uvicorn
+
+from src.constants import Constants
+
+def main():
+    """
+    Production entry point: runs WEB_CONCURRENCY worker processes of the app
+    behind one socket. On SIGTERM or SIGINT the workers stop accepting
+    connections and get GRACEFUL_TIMEOUT seconds to finish their requests
+    and running estimation jobs.
+    """
+    uvicorn.run(
+        "main:app",
+        host=Constants.HOST,
+        port=Constants.PORT,
+        workers=max(1, Constants.WEB_CONCURRENCY),
+        timeout_graceful_shutdown=int(Constants.GRACEFUL_TIMEOUT),
+    )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,257 @@
+import re
+import json
+import time
+import zlib
+import threading
+
+import numpy as np
+
+from src.constants import Constants
+from src.logger import setup_logger
+from src.utilities import connect_sqlite
+
+LOGGER = setup_logger(__name__)
+
+# MinHash permutations are computed modulo this prime, products stay below 2**62
+MERSENNE_PRIME = (1 << 31) - 1
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+def shingles(text: str):
+    """
+    Returns the word unigrams and bigrams of a text.
+    """
+    tokens = TOKEN_PATTERN.findall(text.lower())
+    return set(tokens) | {f"{first} {second}" for first, second in zip(tokens, tokens[1:])}
+
+class SimilarityIndex:
+    """
+    MinHash index over the text of estimated stories, used to find near
+    duplicates and nearest neighbours without an external service.
+
+    Signatures of all stories are held in one NumPy matrix, a query compares
+    its signature with every row at once, which stays in the millisecond
+    range for 100k stories. Rows are persisted in SQLite and loaded on first
+    use; adding a story updates both incrementally. Queries only match
+    stories of the same Jira URL and variant, the prompt template and model
+    the estimate was made with.
+
+    Worker processes share the table: rows written by the others are picked
+    up at most every refresh_interval seconds, and positions are assigned
+    inside a write transaction so two processes never take the same one.
+    """
+
+    def __init__(self, db_path: str, num_perm: int, seed: int = 1, refresh_interval: float = 1.0):
+        self.db_path = db_path
+        self.num_perm = num_perm
+        self.refresh_interval = refresh_interval
+
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, MERSENNE_PRIME, num_perm, dtype=np.uint64)[:, None]
+        self._b = rng.integers(0, MERSENNE_PRIME, num_perm, dtype=np.uint64)[:, None]
+
+        self._lock = threading.Lock()
+        self._conn = None
+        self._loaded = False
+        self._synced_at = 0.0
+        self._last_refresh = 0.0
+        self._size = 0
+        self._signatures = np.empty((0, num_perm), dtype=np.uint32)
+        self._tenant_codes = np.empty(0, dtype=np.int32)
+        self._positions = {}
+        self._tenants = {}
+        self._stats = {"queries": 0, "reused": 0, "few_shot": 0}
+
+    def _db(self):
+        if self._conn is None:
+            self._conn = connect_sqlite(self.db_path)
+            # Replaces the similar_stories table, whose rows do not record the template and model
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS similar_estimates ("
+                "position INTEGER PRIMARY KEY, jira_url TEXT NOT NULL, variant TEXT NOT NULL, "
+                "story_id TEXT NOT NULL, description TEXT NOT NULL, subtasks TEXT NOT NULL, "
+                "signature BLOB NOT NULL, updated_at REAL NOT NULL, UNIQUE (jira_url, variant, story_id))"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_similar_estimates_updated ON similar_estimates (updated_at)")
+        return self._conn
+
+    def _load(self):
+        # Called with the lock held, reads every stored signature into the matrix once
+        if self._loaded:
+            return
+        rows = self._db().execute(
+            "SELECT position, jira_url, variant, story_id, signature, updated_at FROM similar_estimates "
+            "ORDER BY position"
+        ).fetchall()
+        self._apply(rows)
+        self._loaded = True
+        self._last_refresh = time.monotonic()
+        LOGGER.info("Loaded %d stories into the similarity index", self._size)
+
+    def _apply(self, rows):
+        # Called with the lock held, copies stored rows into the matrix
+        if not rows:
+            return
+        self._grow(max(row[0] for row in rows) + 1)
+        for position, jira_url, variant, story_id, signature, updated_at in rows:
+            self._signatures[position] = np.frombuffer(signature, dtype=np.uint32)
+            self._tenant_codes[position] = self._tenant_code((jira_url, variant))
+            self._positions[(jira_url, variant, story_id)] = position
+            self._size = max(self._size, position + 1)
+            self._synced_at = max(self._synced_at, updated_at)
+
+    def _refresh(self, force=False):
+        # Called with the lock held, picks up rows added or replaced by other processes
+        now = time.monotonic()
+        if not force and now - self._last_refresh < self.refresh_interval:
+            return
+        self._last_refresh = now
+        self._apply(self._db().execute(
+            "SELECT position, jira_url, variant, story_id, signature, updated_at FROM similar_estimates "
+            "WHERE position >= ? OR updated_at >= ?", (self._size, self._synced_at)
+        ).fetchall())
+
+    def _grow(self, needed):
+        capacity = len(self._signatures)
+        if needed <= capacity:
+            return
+        capacity = max(needed, capacity * 2, 1024)
+        signatures = np.zeros((capacity, self.num_perm), dtype=np.uint32)
+        signatures[:self._size] = self._signatures[:self._size]
+        tenant_codes = np.full(capacity, -1, dtype=np.int32)
+        tenant_codes[:self._size] = self._tenant_codes[:self._size]
+        self._signatures, self._tenant_codes = signatures, tenant_codes
+
+    def _tenant_code(self, scope):
+        return self._tenants.setdefault(scope, len(self._tenants))
+
+    @staticmethod
+    def _normalize_url(jira_url: str) -> str:
+        return jira_url.strip().rstrip("/")
+
+    def signature(self, text: str):
+        """
+        Returns the MinHash signature of a text, or None when it has no words.
+        """
+        grams = shingles(text)
+        if not grams:
+            return None
+        hashes = np.fromiter((zlib.crc32(gram.encode("utf-8")) for gram in grams),
+                             dtype=np.uint64, count=len(grams)) % MERSENNE_PRIME
+        return ((self._a * hashes + self._b) % MERSENNE_PRIME).min(axis=1).astype(np.uint32)
+
+    def query(self, jira_url: str, text: str, k: int, exclude_story_id: str = None, variant: str = ""):
+        """
+        Finds the k stories most similar to a text.
+
+        Args:
+            jira_url (str): Only stories of this Jira URL are considered.
+            text (str): The story text.
+            k (int): Number of neighbours.
+            exclude_story_id (str): Story left out of the results, usually the queried one.
+            variant (str): Only estimates made with this prompt template and model are considered.
+
+        Returns:
+            list: Dictionaries with story_id, similarity (estimated Jaccard),
+            description and subtasks, most similar first.
+        """
+        signature = self.signature(text)
+        if signature is None or k <= 0:
+            return []
+
+        jira_url = self._normalize_url(jira_url)
+        with self._lock:
+            self._load()
+            self._refresh()
+            self._stats["queries"] += 1
+            tenant = self._tenants.get((jira_url, variant))
+            if tenant is None or not self._size:
+                return []
+
+            matches = np.count_nonzero(self._signatures[:self._size] == signature, axis=1)
+            similarities = matches.astype(np.float32) / self.num_perm
+            similarities[self._tenant_codes[:self._size] != tenant] = -1.0
+            excluded = self._positions.get((jira_url, variant, (exclude_story_id or "").upper()))
+            if excluded is not None:
+                similarities[excluded] = -1.0
+
+            k = min(k, self._size)
+            nearest = np.argpartition(-similarities, k - 1)[:k]
+            nearest = nearest[np.argsort(-similarities[nearest])]
+            nearest = [(int(position), float(similarities[position]))
+                       for position in nearest if similarities[position] >= 0]
+
+            if not nearest:
+                return []
+            placeholders = ",".join("?" * len(nearest))
+            rows = self._db().execute(
+                f"SELECT position, story_id, description, subtasks FROM similar_estimates "
+                f"WHERE position IN ({placeholders})", [position for position, _ in nearest]
+            ).fetchall()
+
+        by_position = {row[0]: row for row in rows}
+        return [
+            {"story_id": by_position[position][1], "similarity": similarity,
+             "description": by_position[position][2], "subtasks": json.loads(by_position[position][3])}
+            for position, similarity in nearest if position in by_position
+        ]
+
+    def add(self, jira_url: str, story_id: str, text: str, subtasks: list, variant: str = ""):
+        """
+        Adds or replaces the estimate of a story made with a variant.
+        """
+        signature = self.signature(text)
+        if signature is None:
+            return
+
+        key = (self._normalize_url(jira_url), variant, story_id.upper())
+        with self._lock:
+            self._load()
+            db = self._db()
+            db.execute("BEGIN IMMEDIATE")
+            new = False
+            try:
+                self._refresh(force=True)
+                position = self._positions.get(key)
+                new = position is None
+                if new:
+                    position = self._size
+                    self._grow(position + 1)
+                    self._size += 1
+                    self._positions[key] = position
+
+                self._signatures[position] = signature
+                self._tenant_codes[position] = self._tenant_code(key[:2])
+                # Taken inside the transaction, so timestamps follow the commit order of all processes
+                updated_at = time.time()
+                db.execute(
+                    "INSERT OR REPLACE INTO similar_estimates "
+                    "(position, jira_url, variant, story_id, description, subtasks, signature, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (position, *key, text, json.dumps(subtasks), signature.tobytes(), updated_at)
+                )
+                db.execute("COMMIT")
+            except Exception:
+                db.execute("ROLLBACK")
+                if new:
+                    self._positions.pop(key, None)
+                    self._size -= 1
+                raise
+            self._synced_at = max(self._synced_at, updated_at)
+
+    def record(self, outcome: str):
+        with self._lock:
+            self._stats[outcome] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._load()
+            stats = dict(self._stats)
+            stats["stories"] = self._size
+        return stats
+
+similarity_index = SimilarityIndex(
+    db_path=Constants.SIMILARITY_DB,
+    num_perm=Constants.SIMILARITY_NUM_PERM,
+    refresh_interval=Constants.SIMILARITY_REFRESH_INTERVAL,
+)
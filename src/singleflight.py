@@ -0,0 +1,45 @@
+import copy
+import asyncio
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls that share a key into one in-flight operation.
+
+    The operation runs as its own task, so a caller that disconnects does not
+    cancel it for the others. Every caller gets its own copy of the result.
+    """
+
+    def __init__(self):
+        self._inflight = {}
+        self._stats = {"calls": 0, "executions": 0, "deduplicated": 0}
+
+    async def do(self, key, func):
+        """
+        Runs func() unless a call with the same key is already in flight, in
+        which case its result is awaited instead.
+
+        Args:
+            key (hashable): Identity of the operation.
+            func (callable): Coroutine function starting the operation.
+
+        Returns:
+            A copy of the operation result.
+        """
+        self._stats["calls"] += 1
+
+        task = self._inflight.get(key)
+        if task is None:
+            self._stats["executions"] += 1
+            task = asyncio.ensure_future(func())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self._stats["deduplicated"] += 1
+
+        result = await asyncio.shield(task)
+        return copy.deepcopy(result)
+
+    def stats(self) -> dict:
+        stats = dict(self._stats)
+        stats["in_flight"] = len(self._inflight)
+        return stats
@@ -0,0 +1,105 @@
+import re
+import ast
+import json
+
+from src.logger import setup_logger
+from src.estimate_parser import validate_subtask, EstimateParseError
+
+LOGGER = setup_logger(__name__)
+
+TRAILING_COMMA = re.compile(r",\s*([}\]])")
+
+def parse_subtask_object(text):
+    """
+    Parses one {"subtask", "estimation"} object emitted by the LLM.
+
+    Args:
+        text (str): The object text, braces included.
+
+    Returns:
+        dict | None: The parsed object, or None when it cannot be parsed.
+    """
+    text = TRAILING_COMMA.sub(r"\1", text)
+    try:
+        return json.loads(text)
+    except ValueError:
+        pass
+
+    try:
+        value = ast.literal_eval(text)
+        return value if isinstance(value, dict) else None
+    except (ValueError, SyntaxError):
+        LOGGER.warning("Could not parse streamed subtask: %s", text)
+        return None
+
+class SubtaskStreamParser:
+    """
+    Incremental parser for the JSON array of subtasks described in
+    config/prompt_v1.txt. Text is fed as it arrives from the LLM and every
+    object of the top level array is returned as soon as its closing brace
+    has been seen. Anything before the opening bracket is ignored. Objects
+    that are not valid subtasks are dropped and counted in `invalid`.
+    """
+
+    def __init__(self):
+        self.depth = 0
+        self.in_array = False
+        self.done = False
+        self.in_string = None
+        self.escaped = False
+        self.buffer = []
+        self.invalid = 0
+
+    def feed(self, chunk):
+        """
+        Consumes a chunk of LLM output.
+
+        Args:
+            chunk (str): Newly received text.
+
+        Returns:
+            list: The subtask objects completed by this chunk.
+        """
+        completed = []
+
+        for char in chunk:
+            if self.done:
+                break
+
+            if not self.in_array:
+                if char == "[":
+                    self.in_array = True
+                continue
+
+            if self.depth > 0:
+                self.buffer.append(char)
+
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif char == "\\":
+                    self.escaped = True
+                elif char == self.in_string:
+                    self.in_string = None
+                continue
+
+            if char in "\"'" and self.depth > 0:
+                self.in_string = char
+            elif char == "{":
+                if self.depth == 0:
+                    self.buffer = [char]
+                self.depth += 1
+            elif char == "}" and self.depth > 0:
+                self.depth -= 1
+                if self.depth == 0:
+                    subtask = parse_subtask_object("".join(self.buffer))
+                    self.buffer = []
+                    try:
+                        completed.append(validate_subtask(subtask))
+                    except EstimateParseError as e:
+                        LOGGER.warning("Dropped streamed subtask: %s", e)
+                        self.invalid += 1
+            elif char == "]" and self.depth == 0:
+                self.done = True
+
+        return completed
@@ -0,0 +1,273 @@
+import time
+import asyncio
+import threading
+import contextvars
+from collections import deque
+from datetime import datetime, timezone
+
+from src.constants import Constants
+from src.logger import setup_logger
+from src.utilities import connect_sqlite
+
+LOGGER = setup_logger(__name__)
+
+class UsageRecorder:
+    """
+    Collects the LLM usage of one estimate. It is bound to the request
+    through the current_usage context variable, LLM clients add to it from
+    their worker threads. Calls are added to the parent recorder as well,
+    which lets a batch total the usage of its stories.
+    """
+
+    def __init__(self, tenant: tuple, story_id: str = None, parent: "UsageRecorder" = None):
+        self.tenant = tenant
+        self.story_id = story_id
+        self.parent = parent
+        self._lock = threading.Lock()
+        self.llm_calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cost = 0.0
+
+    def _accumulate(self, prompt_tokens, completion_tokens, cost):
+        with self._lock:
+            self.llm_calls += 1
+            self.prompt_tokens += prompt_tokens
+            self.completion_tokens += completion_tokens
+            self.cost += cost
+        if self.parent is not None:
+            self.parent._accumulate(prompt_tokens, completion_tokens, cost)
+
+    def add(self, model: str, prompt_tokens: int, completion_tokens: int, cost: float):
+        self._accumulate(prompt_tokens, completion_tokens, cost)
+        usage_ledger.record(self.tenant, self.story_id, model, prompt_tokens, completion_tokens, cost)
+
+    def summary(self, share: int = 1) -> dict:
+        """
+        Returns the usage, divided evenly when `share` stories used the same calls.
+        """
+        with self._lock:
+            return {
+                "llm_calls": self.llm_calls,
+                "prompt_tokens": self.prompt_tokens // share,
+                "completion_tokens": self.completion_tokens // share,
+                "total_tokens": (self.prompt_tokens + self.completion_tokens) // share,
+                "cost": round(self.cost / share, 8),
+            }
+
+current_usage = contextvars.ContextVar("current_usage", default=None)
+
+def record_usage(model: str, usage: dict, cost_dict: dict):
+    """
+    Adds one LLM call to the recorder of the current request, if any.
+    """
+    recorder = current_usage.get()
+    if recorder is None:
+        return
+    prompt_tokens = usage.get("prompt_tokens", 0) or 0
+    completion_tokens = usage.get("completion_tokens", 0) or 0
+    cost = (prompt_tokens * (cost_dict or {}).get("prompt_tokens", 0.0)
+            + completion_tokens * (cost_dict or {}).get("completion_tokens", 0.0))
+    recorder.add(model, prompt_tokens, completion_tokens, cost)
+
+def empty_usage() -> dict:
+    return {"llm_calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0, "cost": 0.0}
+
+class TenantBudgetExceeded(Exception):
+    """
+    Raised when a tenant may not make another LLM call right now.
+    """
+
+class UsageLedger:
+    """
+    Per-tenant LLM usage ledger. Calls are appended to an in-memory buffer
+    and written to SQLite in batches by a background task, every
+    flush_interval seconds or once flush_size calls are waiting.
+
+    Daily token and cost totals and a one minute call window are kept per
+    tenant (jira_url, username) to enforce budgets before a call is made.
+    Totals of the current day are read back from SQLite every flush_interval
+    seconds and added to the calls not yet flushed, so budgets survive
+    restarts and cover every worker process sharing the database. The call
+    window is kept per process.
+    """
+
+    def __init__(self, db_path: str, flush_interval: float, flush_size: int):
+        self.db_path = db_path
+        self.flush_interval = flush_interval
+        self.flush_size = flush_size
+
+        self._conn = None
+        self._db_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._buffer = []
+        self._tenants = {}
+        self._task = None
+        self._wakeup = None
+        self._loop = None
+        self._stats = {"recorded": 0, "flushed": 0, "rejected": 0}
+
+    def _db(self):
+        if self._conn is None:
+            self._conn = connect_sqlite(self.db_path)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_usage ("
+                "created_at REAL NOT NULL, jira_url TEXT NOT NULL, username TEXT NOT NULL, story_id TEXT, "
+                "model TEXT NOT NULL, prompt_tokens INTEGER NOT NULL, completion_tokens INTEGER NOT NULL, "
+                "cost REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_usage_tenant ON llm_usage (jira_url, username, created_at)")
+        return self._conn
+
+    @staticmethod
+    def _day_start(now: float) -> float:
+        day = datetime.fromtimestamp(now, timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+        return day.timestamp()
+
+    def _tenant_state(self, tenant, now):
+        # Called with self._lock held, returns the state with up to date "tokens" and "cost"
+        day_start = self._day_start(now)
+        state = self._tenants.get(tenant)
+        if state is None:
+            state = {"day_start": day_start, "loaded_at": None, "calls": deque(),
+                     "pending_tokens": 0, "pending_cost": 0.0}
+            self._tenants[tenant] = state
+        elif state["day_start"] != day_start:
+            state.update(day_start=day_start, loaded_at=None, pending_tokens=0, pending_cost=0.0)
+
+        if state["loaded_at"] is None or now - state["loaded_at"] >= self.flush_interval:
+            with self._db_lock:
+                state["db_tokens"], state["db_cost"] = self._db().execute(
+                    "SELECT COALESCE(SUM(prompt_tokens + completion_tokens), 0), COALESCE(SUM(cost), 0) "
+                    "FROM llm_usage WHERE jira_url = ? AND username = ? AND created_at >= ?",
+                    (tenant[0], tenant[1], day_start)
+                ).fetchone()
+            state["loaded_at"] = now
+
+        state["tokens"] = state["db_tokens"] + state["pending_tokens"]
+        state["cost"] = state["db_cost"] + state["pending_cost"]
+        return state
+
+    def check(self, tenant: tuple):
+        """
+        Verifies that a tenant may make another LLM call.
+
+        Raises:
+            TenantBudgetExceeded: When the daily token or cost budget is used
+                up or the per-minute call cap is reached.
+        """
+        token_budget = Constants.TENANT_DAILY_TOKEN_BUDGET
+        cost_budget = Constants.TENANT_DAILY_COST_BUDGET
+        calls_per_minute = Constants.TENANT_LLM_CALLS_PER_MINUTE
+        if not (token_budget or cost_budget or calls_per_minute):
+            return
+
+        now = time.time()
+        with self._lock:
+            state = self._tenant_state(tenant, now)
+            while state["calls"] and state["calls"][0] <= now - 60:
+                state["calls"].popleft()
+
+            reason = None
+            if token_budget and state["tokens"] >= token_budget:
+                reason = "Daily LLM token budget exceeded"
+            elif cost_budget and state["cost"] >= cost_budget:
+                reason = "Daily LLM cost budget exceeded"
+            elif calls_per_minute and len(state["calls"]) >= calls_per_minute:
+                reason = "LLM call rate limit reached, retry in a minute"
+
+            if reason is not None:
+                self._stats["rejected"] += 1
+                raise TenantBudgetExceeded(reason)
+            state["calls"].append(now)
+
+    def record(self, tenant, story_id, model, prompt_tokens, completion_tokens, cost):
+        now = time.time()
+        with self._lock:
+            state = self._tenant_state(tenant, now)
+            state["pending_tokens"] += prompt_tokens + completion_tokens
+            state["pending_cost"] += cost
+            self._buffer.append((now, tenant[0], tenant[1], story_id, model, prompt_tokens, completion_tokens, cost))
+            self._stats["recorded"] += 1
+            flush_now = len(self._buffer) >= self.flush_size
+
+        if flush_now and self._loop is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    def flush(self):
+        """
+        Writes the buffered calls to SQLite.
+        """
+        with self._lock:
+            rows, self._buffer = self._buffer, []
+        if not rows:
+            return
+        with self._db_lock:
+            self._db().executemany(
+                "INSERT INTO llm_usage (created_at, jira_url, username, story_id, model, prompt_tokens, "
+                "completion_tokens, cost) VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows
+            )
+        with self._lock:
+            # The rows are in the database now, totals are read back on the next use
+            for _, jira_url, username, _, _, prompt_tokens, completion_tokens, cost in rows:
+                state = self._tenants.get((jira_url, username))
+                if state is not None:
+                    state["pending_tokens"] = max(0, state["pending_tokens"] - prompt_tokens - completion_tokens)
+                    state["pending_cost"] = max(0.0, state["pending_cost"] - cost)
+                    state["loaded_at"] = None
+            self._stats["flushed"] += len(rows)
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        self._loop = None
+        self.flush()
+
+    async def _flush_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await asyncio.to_thread(self.flush)
+            except Exception as e:
+                LOGGER.error("Usage ledger flush failed: %s", e)
+
+    def tenant_usage(self, tenant: tuple) -> dict:
+        """
+        Returns today's usage of a tenant and the configured limits.
+        """
+        now = time.time()
+        with self._lock:
+            state = self._tenant_state(tenant, now)
+            calls_last_minute = sum(1 for ts in state["calls"] if ts > now - 60)
+            return {
+                "tokens_today": state["tokens"],
+                "cost_today": round(state["cost"], 8),
+                "llm_calls_last_minute": calls_last_minute,
+                "daily_token_budget": Constants.TENANT_DAILY_TOKEN_BUDGET or None,
+                "daily_cost_budget": Constants.TENANT_DAILY_COST_BUDGET or None,
+                "llm_calls_per_minute": Constants.TENANT_LLM_CALLS_PER_MINUTE or None,
+            }
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["buffered"] = len(self._buffer)
+            stats["tenants"] = len(self._tenants)
+        return stats
+
+usage_ledger = UsageLedger(
+    db_path=Constants.USAGE_DB,
+    flush_interval=Constants.USAGE_FLUSH_INTERVAL,
+    flush_size=Constants.USAGE_FLUSH_SIZE,
+)
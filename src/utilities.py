@@ -1,4 +1,6 @@
 import os
+import sqlite3
+from .constants import Constants
 from .logger import setup_logger
 
 LOGGER = setup_logger(__name__)
@@ -9,3 +11,28 @@ def make_directories(dir_list):
             continue
         os.makedirs(_dir_)
         LOGGER.info("Directory {0} created".format(_dir_))
+
+def connect_sqlite(db_path, private=False):
+    """
+    Opens a SQLite connection in WAL mode, creating the parent directory if needed.
+    The connection may be shared between threads, callers serialise access.
+
+    With private=True the database is readable by its owner only. SQLite gives
+    the -wal and -shm files it creates the mode of the database file.
+    """
+    db_dir = os.path.dirname(db_path)
+    if db_dir:
+        make_directories([db_dir])
+
+    if private:
+        os.close(os.open(db_path, os.O_CREAT | os.O_WRONLY, 0o600))
+        for path in (db_path, f"{db_path}-wal", f"{db_path}-shm"):
+            if os.path.exists(path):
+                os.chmod(path, 0o600)
+
+    conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+    # Writers of the other worker processes hold the lock for short transactions, wait for them
+    conn.execute(f"PRAGMA busy_timeout={int(Constants.SQLITE_BUSY_TIMEOUT * 1000)}")
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
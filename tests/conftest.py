@@ -0,0 +1,81 @@
+import os
+import sys
+import json
+from collections import OrderedDict
+
+import httpx
+import pytest
+
+# Tests import the `src` package from the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src import http_client, jira_handler, rate_limiter
+from src.idempotency import IdempotencyStore
+from src.issue_metadata import project_metadata_cache
+
+JIRA_URL = "http://jira.test"
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+class FakeJira:
+    """
+    Answers the Jira REST calls of a JiraHandler in process. Stories map an
+    issue key to the summaries of its existing subtasks; summaries listed in
+    `rejected` fail to be created.
+    """
+
+    def __init__(self):
+        self.stories = {}
+        self.rejected = set()
+        self.fail_reads = False
+        self.created = []
+        self.requests = []
+        self.responses = []
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append((request.method, request.url.path))
+        if self.responses:
+            return self.responses.pop(0)
+
+        path = request.url.path.rstrip("/")
+        if path.endswith("/issue/bulk"):
+            return httpx.Response(404)
+        if path.endswith("/issue") and request.method == "POST":
+            summary = json.loads(request.content)["fields"]["summary"]
+            if summary in self.rejected:
+                return httpx.Response(400, json={"errors": {"summary": "rejected"}})
+            self.created.append(summary)
+            return httpx.Response(201, json={"key": f"SUB-{len(self.created)}"})
+        if path.endswith("/issuetype"):
+            return httpx.Response(200, json=[{"id": "5", "name": "Sub-task", "subtask": True}])
+        if "/issue/" in path and request.method == "GET":
+            story_id = path.rsplit("/", 1)[1]
+            if self.fail_reads or story_id not in self.stories:
+                return httpx.Response(503 if self.fail_reads else 404)
+            subtasks = [{"key": f"OLD-{idx}", "fields": {"summary": summary}}
+                        for idx, summary in enumerate(self.stories[story_id])]
+            return httpx.Response(200, json={"fields": {"subtasks": subtasks}})
+        return httpx.Response(404)
+
+@pytest.fixture
+async def fake_jira(monkeypatch, tmp_path):
+    """
+    A FakeJira behind the pooled client of JIRA_URL, with retries off, fresh
+    rate limiters and project metadata cache and an idempotency store in tmp_path.
+    """
+    fake = FakeJira()
+    monkeypatch.setattr(jira_handler.Constants, "JIRA_MAX_RETRIES", 0)
+    monkeypatch.setattr(rate_limiter, "_limiters", OrderedDict())
+    monkeypatch.setattr(jira_handler, "idempotency_store", IdempotencyStore(str(tmp_path / "idempotency.db"), 3600))
+    project_metadata_cache.clear()
+    client = httpx.AsyncClient(base_url=JIRA_URL, transport=httpx.MockTransport(fake.handle))
+    monkeypatch.setitem(http_client._clients, JIRA_URL, client)
+    yield fake
+    await client.aclose()
+    project_metadata_cache.clear()
+
+@pytest.fixture
+def handler():
+    return jira_handler.JiraHandler("user", "token", JIRA_URL)
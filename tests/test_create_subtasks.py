@@ -0,0 +1,47 @@
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+def estimate(*summaries, story_id="PRJ-1"):
+    return {"status": 200, "story_id": story_id,
+            "subtasks": [{"subtask": summary, "estimation": 1} for summary in summaries]}
+
+async def test_existing_subtasks_are_skipped(fake_jira, handler):
+    fake_jira.stories["PRJ-1"] = ["Write the API docs."]
+
+    result = await handler.create_tasks_from_estimate(estimate("write  the api DOCS", "Add tests"))
+
+    assert fake_jira.created == ["Add tests"]
+    assert result["status"] == 200
+    assert result["skipped"] == ["write  the api DOCS"]
+    assert [r["action"] for r in result["results"]] == ["skipped", "created"]
+    assert result["results"][0]["key"] == "OLD-0"
+
+async def test_repeated_summaries_are_created_once(fake_jira, handler):
+    fake_jira.stories["PRJ-1"] = []
+
+    result = await handler.create_tasks_from_estimate(estimate("Add tests", "add tests.", "Deploy"))
+
+    assert fake_jira.created == ["Add tests", "Deploy"]
+    assert result["status"] == 200
+    duplicate = result["results"][1]
+    assert (duplicate["action"], duplicate["key"]) == ("skipped", "SUB-1")
+
+async def test_duplicate_of_a_rejected_subtask_fails_with_it(fake_jira, handler):
+    fake_jira.stories["PRJ-1"] = []
+    fake_jira.rejected.add("Add tests")
+
+    result = await handler.create_tasks_from_estimate(estimate("Add tests", "Deploy", "add tests"))
+
+    assert result["status"] == 207
+    assert [r["action"] for r in result["results"]] == ["failed", "created", "failed"]
+    assert result["results"][2]["status"] == 400
+    assert result["results"][2]["key"] is None
+
+async def test_nothing_is_created_when_existing_subtasks_cannot_be_read(fake_jira, handler):
+    fake_jira.fail_reads = True
+
+    result = await handler.create_tasks_from_estimate(estimate("Add tests"))
+
+    assert result["status"] == 502
+    assert fake_jira.created == []
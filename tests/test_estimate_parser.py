@@ -0,0 +1,71 @@
+import pytest
+
+from src.estimate_parser import parse_estimate, parse_packed_estimate, validate_subtask, EstimateParseError
+
+EXPECTED = [{"subtask": "Build API", "estimation": 2}, {"subtask": "Write tests", "estimation": 1}]
+
+def test_plain_json_is_not_repaired():
+    subtasks, repaired = parse_estimate('[{"subtask": "Build API", "estimation": 2}, '
+                                        '{"subtask": "Write tests", "estimation": 1}]')
+    assert subtasks == EXPECTED
+    assert repaired is False
+
+def test_structured_output_object():
+    subtasks, repaired = parse_estimate('{"subtasks": [{"subtask": "Build API", "estimation": 2}, '
+                                        '{"subtask": "Write tests", "estimation": 1}]}')
+    assert subtasks == EXPECTED
+    assert repaired is False
+
+@pytest.mark.parametrize("text", [
+    '```json\n[{"subtask": "Build API", "estimation": 2}, {"subtask": "Write tests", "estimation": 1}]\n```',
+    '```\n[{"subtask": "Build API", "estimation": 2}, {"subtask": "Write tests", "estimation": 1}]\n```',
+    '[{"subtask": "Build API", "estimation": 2,}, {"subtask": "Write tests", "estimation": 1},]',
+    'Here is the breakdown:\n[{"subtask": "Build API", "estimation": 2}, '
+    '{"subtask": "Write tests", "estimation": 1}]\nLet me know if it helps.',
+    "[{'subtask': 'Build API', 'estimation': 2}, {'subtask': 'Write tests', 'estimation': 1}]",
+])
+def test_repaired_inputs(text):
+    subtasks, repaired = parse_estimate(text)
+    assert subtasks == EXPECTED
+    assert repaired is True
+
+def test_strings_containing_brackets_and_braces():
+    subtasks, _ = parse_estimate('[{"subtask": "Handle [draft] {id} values", "estimation": 3}]')
+    assert subtasks == [{"subtask": "Handle [draft] {id} values", "estimation": 3}]
+
+def test_fractional_days_are_rounded_up():
+    subtasks, _ = parse_estimate('[{"subtask": "Review", "estimation": 0.5}]')
+    assert subtasks == [{"subtask": "Review", "estimation": 1}]
+
+@pytest.mark.parametrize("text", [
+    "",
+    "Sorry, I cannot estimate this story.",
+    '[{"subtask": "Build API", "estimation": "2-3"}]',
+    '[{"subtask": "Build API"}]',
+    '["Build API"]',
+    '{"answer": "none"}',
+    "[__import__('os').system('true')]",
+])
+def test_invalid_inputs_raise(text):
+    with pytest.raises(EstimateParseError):
+        parse_estimate(text)
+
+def test_validate_subtask_rejects_non_objects():
+    with pytest.raises(EstimateParseError):
+        validate_subtask(None)
+
+def test_packed_estimate_keeps_valid_entries_only():
+    text = ('{"proj-1": [{"subtask": "Build API", "estimation": 2}], '
+            '"PROJ-2": [{"subtask": "Write tests", "estimation": "soon"}], '
+            '"PROJ-9": [{"subtask": "Not asked for", "estimation": 1}]}')
+    estimates = parse_packed_estimate(text, ["PROJ-1", "PROJ-2", "PROJ-3"])
+    assert estimates == {"PROJ-1": [{"subtask": "Build API", "estimation": 2}]}
+
+def test_packed_estimate_repairs_fenced_python_literals():
+    text = "```python\n{'PROJ-1': [{'subtask': 'Build API', 'estimation': 2},],}\n```"
+    assert parse_packed_estimate(text, ["PROJ-1"]) == {"PROJ-1": [{"subtask": "Build API", "estimation": 2}]}
+
+@pytest.mark.parametrize("text", ["", "no estimate", '[{"subtask": "Build API", "estimation": 2}]'])
+def test_packed_estimate_that_is_not_an_object_raises(text):
+    with pytest.raises(EstimateParseError):
+        parse_packed_estimate(text, ["PROJ-1"])
@@ -0,0 +1,64 @@
+import time
+
+import pytest
+
+from src.idempotency import IdempotencyStore
+
+def test_store_returns_fingerprint_and_result(tmp_path):
+    store = IdempotencyStore(str(tmp_path / "idempotency.db"), ttl=60)
+    key = store.make_key(("user", "http://jira.test"), "retry-1")
+
+    assert store.get(key) is None
+    store.set(key, "abc", {"status": 200})
+    assert store.get(key) == ("abc", {"status": 200})
+    assert store.make_key(("other", "http://jira.test"), "retry-1") != key
+
+def test_store_entries_expire(tmp_path):
+    store = IdempotencyStore(str(tmp_path / "idempotency.db"), ttl=0.05)
+    store.set("key", "abc", {"status": 200})
+    time.sleep(0.06)
+    assert store.get("key") is None
+
+def test_fingerprint_ignores_key_order():
+    assert IdempotencyStore.fingerprint({"a": 1, "b": 2}) == IdempotencyStore.fingerprint({"b": 2, "a": 1})
+
+def estimate(*summaries):
+    return {"status": 200, "story_id": "PRJ-1",
+            "subtasks": [{"subtask": summary, "estimation": 1} for summary in summaries]}
+
+@pytest.mark.anyio
+async def test_retried_request_is_replayed(fake_jira, handler):
+    fake_jira.stories["PRJ-1"] = []
+
+    first = await handler.create_tasks_from_estimate(estimate("Add tests"), idempotency_key="retry-1")
+    # The stored result is replayed even though the subtask would now be skipped
+    fake_jira.stories["PRJ-1"] = ["Add tests"]
+    second = await handler.create_tasks_from_estimate(estimate("Add tests"), idempotency_key="retry-1")
+
+    assert fake_jira.created == ["Add tests"]
+    assert second == {**first, "replayed": True}
+    assert second["created"] == ["Add tests"]
+
+@pytest.mark.anyio
+async def test_reused_key_with_another_body_is_rejected(fake_jira, handler):
+    fake_jira.stories["PRJ-1"] = []
+
+    await handler.create_tasks_from_estimate(estimate("Add tests"), idempotency_key="retry-1")
+    result = await handler.create_tasks_from_estimate(estimate("Deploy"), idempotency_key="retry-1")
+
+    assert result["status"] == 422
+    assert fake_jira.created == ["Add tests"]
+
+@pytest.mark.anyio
+async def test_failed_attempt_is_not_stored(fake_jira, handler):
+    fake_jira.fail_reads = True
+    failed = await handler.create_tasks_from_estimate(estimate("Add tests"), idempotency_key="retry-1")
+
+    fake_jira.fail_reads = False
+    fake_jira.stories["PRJ-1"] = []
+    retried = await handler.create_tasks_from_estimate(estimate("Add tests"), idempotency_key="retry-1")
+
+    assert failed["status"] == 502
+    assert retried["status"] == 200
+    assert "replayed" not in retried
+    assert fake_jira.created == ["Add tests"]
@@ -0,0 +1,118 @@
+import os
+import asyncio
+import subprocess
+import sys
+
+import pytest
+from cryptography.fernet import Fernet
+
+from src.job_queue import EstimationJobQueue
+
+pytestmark = pytest.mark.anyio
+
+KEY = Fernet.generate_key().decode()
+
+def make_queue(tmp_path, secret_key=KEY):
+    return EstimationJobQueue(str(tmp_path / "jobs.db"), workers=1, max_queue=10, retention=3600,
+                              secret_key=secret_key)
+
+async def wait_for(queue, job_id, state):
+    for _ in range(100):
+        job = queue.get(job_id, "hash")
+        if job["state"] == state:
+            return job
+        await asyncio.sleep(0.01)
+    raise AssertionError(f"job stayed {job['state']}")
+
+def dead_pid():
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+async def test_job_runs_with_the_decrypted_token(tmp_path):
+    requests = []
+
+    async def handler(request):
+        requests.append(request)
+        return {"status": 200, "story_id": request["story_id"]}
+
+    queue = make_queue(tmp_path)
+    await queue.start(handler)
+    try:
+        job_id = queue.submit({"story_id": "PRJ-1"}, secret="token", auth_hash="hash")
+        job = await wait_for(queue, job_id, "done")
+    finally:
+        await queue.stop()
+
+    assert requests == [{"story_id": "PRJ-1", "api_token": "token"}]
+    assert job["result"] == {"status": 200, "story_id": "PRJ-1"}
+    assert queue.get(job_id, "other") is None
+    assert queue._execute("SELECT request, secret FROM jobs") == [(None, None)]
+
+async def test_job_is_claimed_once(tmp_path):
+    calls = []
+
+    async def handler(request):
+        calls.append(request)
+        await asyncio.sleep(0.01)
+        return {"status": 200}
+
+    queue = make_queue(tmp_path)
+    queue._queue = asyncio.Queue()
+    queue._handler = handler
+    job_id = queue.submit({"story_id": "PRJ-1"}, secret="token", auth_hash="hash")
+
+    await asyncio.gather(queue._run(job_id), queue._run(job_id))
+
+    assert len(calls) == 1
+    assert queue.get(job_id, "hash")["state"] == "done"
+
+async def test_jobs_of_a_dead_process_are_recovered(tmp_path):
+    async def handler(request):
+        return {"status": 200}
+
+    first = make_queue(tmp_path)
+    first._queue = asyncio.Queue()
+    job_id = first.submit({"story_id": "PRJ-1"}, secret="token", auth_hash="hash")
+    first._execute("UPDATE jobs SET state = 'running', owner = ? WHERE id = ?", (dead_pid(), job_id))
+
+    second = make_queue(tmp_path)
+    await second.start(handler)
+    try:
+        await wait_for(second, job_id, "done")
+    finally:
+        await second.stop()
+
+async def test_jobs_of_a_live_process_are_left_alone(tmp_path):
+    async def handler(request):
+        return {"status": 200}
+
+    first = make_queue(tmp_path)
+    first._queue = asyncio.Queue()
+    job_id = first.submit({"story_id": "PRJ-1"}, secret="token", auth_hash="hash")
+    # The parent of the test process is alive and not this process
+    first._execute("UPDATE jobs SET state = 'running', owner = ? WHERE id = ?", (os.getppid(), job_id))
+
+    second = make_queue(tmp_path)
+    await second.start(handler)
+    await second.stop()
+
+    assert second.get(job_id, "hash")["state"] == "running"
+
+async def test_job_encrypted_with_another_key_fails(tmp_path):
+    async def handler(request):
+        raise AssertionError("the handler must not run")
+
+    first = make_queue(tmp_path)
+    first._queue = asyncio.Queue()
+    job_id = first.submit({"story_id": "PRJ-1"}, secret="token", auth_hash="hash")
+
+    second = make_queue(tmp_path, secret_key=Fernet.generate_key().decode())
+    await second.start(handler)
+    try:
+        job = await wait_for(second, job_id, "failed")
+    finally:
+        await second.stop()
+
+    assert job["result"]["status"] == 500
+    assert "JOB_SECRET_KEY" in job["result"]["message"]
@@ -0,0 +1,57 @@
+import time
+from email.utils import format_datetime
+from datetime import datetime, timedelta, timezone
+
+import httpx
+import pytest
+
+from src.rate_limiter import AdaptiveTokenBucket, parse_retry_after, get_limiter
+
+def bucket(**overrides):
+    settings = {"rate": 100.0, "burst": 5.0, "min_rate": 1.0, "max_rate": 200.0, "increase": 1.0, **overrides}
+    return AdaptiveTokenBucket(**settings)
+
+@pytest.mark.parametrize("value, expected", [(None, None), ("", None), ("soon", None), ("2", 2.0), ("-3", 0.0)])
+def test_parse_retry_after_seconds(value, expected):
+    assert parse_retry_after(value) == expected
+
+def test_parse_retry_after_http_date():
+    value = format_datetime(datetime.now(timezone.utc) + timedelta(seconds=10), usegmt=True)
+    assert 8 <= parse_retry_after(value) <= 10
+
+def test_parse_retry_after_is_capped(monkeypatch):
+    monkeypatch.setattr("src.rate_limiter.Constants.JIRA_BACKOFF_MAX", 30.0)
+    assert parse_retry_after("3600") == 30.0
+
+def test_throttle_halves_the_rate_down_to_the_minimum():
+    limiter = bucket(rate=4.0, min_rate=1.5)
+    limiter.on_throttle()
+    assert limiter.rate == 2.0
+    limiter.on_throttle()
+    assert limiter.rate == 1.5
+    limiter.on_success()
+    assert limiter.rate == 2.5
+    assert limiter.throttled == 2
+
+@pytest.mark.anyio
+async def test_retry_after_pauses_the_bucket():
+    limiter = bucket()
+    limiter.on_throttle(retry_after=0.2)
+    start = time.monotonic()
+    await limiter.acquire()
+    assert time.monotonic() - start >= 0.19
+
+@pytest.mark.anyio
+async def test_throttled_request_is_retried_after_the_delay(fake_jira, handler, monkeypatch):
+    monkeypatch.setattr("src.jira_handler.Constants.JIRA_MAX_RETRIES", 1)
+    fake_jira.responses = [httpx.Response(429, headers={"Retry-After": "0.1"}), httpx.Response(200, json={})]
+    limiter = get_limiter(handler.jira_url)
+    throttled = limiter.throttled
+
+    start = time.monotonic()
+    response = await handler._request("GET", "/rest/api/2/myself")
+
+    assert response.status_code == 200
+    assert len(fake_jira.requests) == 2
+    assert time.monotonic() - start >= 0.09
+    assert limiter.throttled == throttled + 1
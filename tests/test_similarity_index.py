@@ -0,0 +1,60 @@
+from src.similarity_index import SimilarityIndex
+
+URL = "http://jira.test"
+LOGIN = "Add a login page with username and password fields and a remember me option"
+EXPORT = "Export the monthly sales report as a CSV file for the finance team"
+
+def make_index(tmp_path):
+    return SimilarityIndex(str(tmp_path / "similarity.db"), num_perm=64)
+
+def test_query_finds_the_closest_story(tmp_path):
+    index = make_index(tmp_path)
+    index.add(URL, "prj-1", LOGIN, [{"subtask": "Build the form", "estimation": 3}])
+    index.add(URL, "PRJ-2", EXPORT, [])
+
+    matches = index.query(URL, LOGIN, k=2)
+
+    assert matches[0]["story_id"] == "PRJ-1"
+    assert matches[0]["similarity"] == 1.0
+    assert matches[0]["subtasks"] == [{"subtask": "Build the form", "estimation": 3}]
+    assert matches[1]["similarity"] < 0.5
+
+def test_query_can_leave_out_the_story_itself(tmp_path):
+    index = make_index(tmp_path)
+    index.add(URL, "PRJ-1", LOGIN, [])
+    index.add(URL, "PRJ-2", LOGIN + " on mobile", [])
+
+    matches = index.query(URL, LOGIN, k=1, exclude_story_id="prj-1")
+
+    assert [match["story_id"] for match in matches] == ["PRJ-2"]
+
+def test_query_is_scoped_by_jira_url_and_variant(tmp_path):
+    index = make_index(tmp_path)
+    index.add(URL + "/", "PRJ-1", LOGIN, [], variant="v1")
+
+    assert index.query(URL, LOGIN, k=1, variant="v1")[0]["story_id"] == "PRJ-1"
+    assert index.query(URL, LOGIN, k=1, variant="v2") == []
+    assert index.query("http://other.test", LOGIN, k=1, variant="v1") == []
+
+def test_stories_are_loaded_from_the_database(tmp_path):
+    make_index(tmp_path).add(URL, "PRJ-1", LOGIN, [])
+
+    index = make_index(tmp_path)
+
+    assert index.query(URL, LOGIN, k=1)[0]["story_id"] == "PRJ-1"
+    assert index.stats()["stories"] == 1
+
+def test_replacing_a_story_keeps_one_row(tmp_path):
+    index = make_index(tmp_path)
+    index.add(URL, "PRJ-1", LOGIN, [])
+    index.add(URL, "PRJ-1", EXPORT, [])
+
+    assert index.stats()["stories"] == 1
+    assert index.query(URL, EXPORT, k=1)[0]["description"] == EXPORT
+
+def test_text_without_words_is_ignored(tmp_path):
+    index = make_index(tmp_path)
+    index.add(URL, "PRJ-1", "  ...  ", [])
+
+    assert index.stats()["stories"] == 0
+    assert index.query(URL, "!!", k=1) == []
@@ -0,0 +1,70 @@
+import asyncio
+
+import pytest
+
+from src.singleflight import SingleFlight
+
+pytestmark = pytest.mark.anyio
+
+async def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight()
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return {"subtasks": []}
+
+    results = await asyncio.gather(*(flight.do("X-1", fetch) for _ in range(5)))
+    assert len(calls) == 1
+    assert results == [{"subtasks": []}] * 5
+    assert flight.stats() == {"calls": 5, "executions": 1, "deduplicated": 4, "in_flight": 0}
+
+async def test_callers_get_their_own_copy():
+    flight = SingleFlight()
+
+    async def fetch():
+        await asyncio.sleep(0.01)
+        return {"subtasks": []}
+
+    first, second = await asyncio.gather(flight.do("X-1", fetch), flight.do("X-1", fetch))
+    first["subtasks"].append("changed")
+    assert second == {"subtasks": []}
+
+async def test_different_keys_and_later_calls_execute_again():
+    flight = SingleFlight()
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        return len(calls)
+
+    await asyncio.gather(flight.do("X-1", fetch), flight.do("X-2", fetch))
+    assert await flight.do("X-1", fetch) == 3
+
+async def test_cancelled_caller_does_not_cancel_the_others():
+    flight = SingleFlight()
+    started = asyncio.Event()
+
+    async def fetch():
+        started.set()
+        await asyncio.sleep(0.05)
+        return "done"
+
+    first = asyncio.ensure_future(flight.do("X-1", fetch))
+    await started.wait()
+    second = asyncio.ensure_future(flight.do("X-1", fetch))
+    await asyncio.sleep(0)
+    first.cancel()
+    assert await second == "done"
+
+async def test_errors_reach_every_caller():
+    flight = SingleFlight()
+
+    async def fetch():
+        await asyncio.sleep(0.01)
+        raise ValueError("Jira is down")
+
+    results = await asyncio.gather(flight.do("X-1", fetch), flight.do("X-1", fetch), return_exceptions=True)
+    assert [type(result) for result in results] == [ValueError, ValueError]
+    assert flight.stats()["in_flight"] == 0
@@ -0,0 +1,64 @@
+import pytest
+
+from src.stream_parser import SubtaskStreamParser, parse_subtask_object
+
+RESPONSE = ('Sure, here it is: [{"subtask": "Build API", "estimation": 2}, '
+            '{"subtask": "Parse \\"[x]\\" and {y}", "estimation": 1}] Anything else?')
+
+def feed_all(parser, chunks):
+    subtasks = []
+    for chunk in chunks:
+        subtasks.extend(parser.feed(chunk))
+    return subtasks
+
+@pytest.mark.parametrize("size", [1, 2, 7, len(RESPONSE)])
+def test_split_chunks_give_the_same_subtasks(size):
+    parser = SubtaskStreamParser()
+    chunks = [RESPONSE[i:i + size] for i in range(0, len(RESPONSE), size)]
+    assert feed_all(parser, chunks) == [
+        {"subtask": "Build API", "estimation": 2},
+        {"subtask": 'Parse "[x]" and {y}', "estimation": 1},
+    ]
+    assert parser.done
+    assert parser.invalid == 0
+
+def test_objects_are_returned_as_soon_as_they_close():
+    parser = SubtaskStreamParser()
+    assert parser.feed('[{"subtask": "A", "estimation": 1}, {"subtask": "B", ') == [{"subtask": "A", "estimation": 1}]
+    assert parser.feed('"estimation": 2}]') == [{"subtask": "B", "estimation": 2}]
+
+def test_python_literals_and_trailing_commas():
+    parser = SubtaskStreamParser()
+    subtasks = feed_all(parser, ["[{'subtask': 'It\\'s {done}', 'estimation': 3,},", "]"])
+    assert subtasks == [{"subtask": "It's {done}", "estimation": 3}]
+    assert parser.done
+
+def test_single_quoted_strings_with_brackets():
+    parser = SubtaskStreamParser()
+    assert parser.feed("[{'subtask': 'Map ] and }', 'estimation': 1}]") == [{"subtask": "Map ] and }", "estimation": 1}]
+
+def test_invalid_objects_are_dropped_and_counted():
+    parser = SubtaskStreamParser()
+    subtasks = feed_all(parser, ['[{"subtask": "A", "estimation": "2-3"}, {"subtask": "B"}, ',
+                                 '{"subtask": broken}, {"subtask": "C", "estimation": 4}]'])
+    assert subtasks == [{"subtask": "C", "estimation": 4}]
+    assert parser.invalid == 3
+
+def test_text_after_the_array_is_ignored():
+    parser = SubtaskStreamParser()
+    feed_all(parser, ['[]', '[{"subtask": "A", "estimation": 1}]'])
+    assert parser.done
+
+def test_no_array_is_not_done():
+    parser = SubtaskStreamParser()
+    assert parser.feed("Sorry, I cannot help with that.") == []
+    assert not parser.done
+
+@pytest.mark.parametrize("text, expected", [
+    ('{"subtask": "A", "estimation": 1}', {"subtask": "A", "estimation": 1}),
+    ('{"subtask": "A", "estimation": 1,}', {"subtask": "A", "estimation": 1}),
+    ("{'subtask': 'A', 'estimation': True}", {"subtask": "A", "estimation": True}),
+    ("{not valid}", None),
+])
+def test_parse_subtask_object(text, expected):
+    assert parse_subtask_object(text) == expected